@@ -0,0 +1,275 @@
+# coding:utf-8
+"""
+合成基金费用表 PDF 语料
+
+不依赖任何第三方库，直接写出 PDF：中文使用 PDF 标准 CJK 字体 STSong-Light
+（UniGB-UCS2-H 编码，不嵌入字体），表格为全框线表格，合并单元格不画内部框线。
+每个 PDF 旁边写一个 .tables.json，记录每页表格按 pdfplumber 约定（被合并的格子为
+None）应当识别出的内容，用于校验提取结果。
+
+    python benchmarks/corpus.py 输出文件夹
+"""
+import argparse
+import json
+import os
+import random
+import zlib
+
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4
+WIDE_PAGE_WIDTH = 1191  # A3 横向，放宽表
+MARGIN = 50
+FONT_SIZE = 9
+LINE_GAP = 3
+CELL_PADDING = 4
+
+FEE_NAMES = ['申购费', '赎回费', '认购费', '管理费(每年)', '托管费(每年)', '销售服务费', '最低认购额',
+             '最低其后申购金额', '任何赎回后的最低持有额', '业绩报酬', '转换费', '信息披露费']
+NARRATIVE = ('本基金的投资目标是在控制风险的前提下追求长期稳定的资本增值。基金管理人将根据宏观经济、'
+             '市场环境及各类资产的预期收益与风险特征，动态调整资产配置比例。投资者应认真阅读基金合同、'
+             '招募说明书等法律文件，了解基金的风险收益特征，并根据自身的投资目的、投资期限、投资经验、'
+             '资产状况等判断基金是否和投资者的风险承受能力相适应。')
+
+
+def cell(text, rowspan=1, colspan=1):
+    return {'text': text, 'rowspan': rowspan, 'colspan': colspan}
+
+
+class Table:
+    """ 表格定义：rows 中每一项为 cell()，被合并覆盖的位置不出现 """
+
+    def __init__(self, rows, col_widths):
+        self.col_widths = col_widths
+        self.cells = []  # (行, 列, cell)
+        occupied = set()
+        for r, row in enumerate(rows):
+            c = 0
+            for item in row:
+                while (r, c) in occupied:
+                    c += 1
+                self.cells.append((r, c, item))
+                for dr in range(item['rowspan']):
+                    for dc in range(item['colspan']):
+                        occupied.add((r + dr, c + dc))
+                c += item['colspan']
+        self.n_rows = max(r for r, _ in occupied) + 1
+        self.n_cols = len(col_widths)
+
+    def row_heights(self):
+        heights = [0] * self.n_rows
+        for r, _, item in self.cells:
+            lines = item['text'].count('\n') + 1
+            need = lines * (FONT_SIZE + LINE_GAP) + 2 * CELL_PADDING
+            per_row = need / item['rowspan']
+            for dr in range(item['rowspan']):
+                heights[r + dr] = max(heights[r + dr], per_row)
+        return heights
+
+    def height(self):
+        return sum(self.row_heights())
+
+    def expected(self):
+        """ pdfplumber 应当返回的二维列表 """
+        grid = [[None] * self.n_cols for _ in range(self.n_rows)]
+        for r, c, item in self.cells:
+            grid[r][c] = item['text']
+        return grid
+
+
+class Page:
+    def __init__(self, width=PAGE_WIDTH):
+        self.width = width
+        self.ops = []
+        self.tables = []
+        self.y = PAGE_HEIGHT - MARGIN  # 下一行内容的顶边（PDF 坐标）
+
+    def text(self, x, top, text):
+        """ 在 (x, top) 处写一行文字，top 为文字顶边 """
+        baseline = top - FONT_SIZE * 0.88
+        hexed = text.encode('utf-16-be').hex().upper()
+        self.ops.append(f'BT /F1 {FONT_SIZE} Tf {x:.2f} {baseline:.2f} Td <{hexed}> Tj ET')
+
+    def line(self, x0, y0, x1, y1):
+        self.ops.append(f'{x0:.2f} {y0:.2f} m {x1:.2f} {y1:.2f} l S')
+
+    def paragraph(self, text):
+        per_line = int((PAGE_WIDTH - 2 * MARGIN) // FONT_SIZE)
+        for start in range(0, len(text), per_line):
+            self.text(MARGIN, self.y, text[start:start + per_line])
+            self.y -= FONT_SIZE + LINE_GAP
+        self.y -= FONT_SIZE
+
+    def fits(self, table):
+        return self.y - table.height() > MARGIN
+
+    def table(self, table):
+        heights = table.row_heights()
+        xs = [MARGIN]
+        for width in table.col_widths:
+            xs.append(xs[-1] + width)
+        ys = [self.y]
+        for height in heights:
+            ys.append(ys[-1] - height)
+        for r, c, item in table.cells:
+            x0, x1 = xs[c], xs[c + item['colspan']]
+            y0, y1 = ys[r + item['rowspan']], ys[r]
+            self.line(x0, y1, x1, y1)
+            self.line(x0, y0, x1, y0)
+            self.line(x0, y0, x0, y1)
+            self.line(x1, y0, x1, y1)
+            top = y1 - CELL_PADDING
+            for text in item['text'].split('\n'):
+                self.text(x0 + CELL_PADDING, top, text)
+                top -= FONT_SIZE + LINE_GAP
+        self.tables.append(table.expected())
+        self.y = ys[-1] - 2 * FONT_SIZE
+
+
+def write_pdf(path, pages):
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # 页面树，最后填写
+        '<< /Type /Font /Subtype /Type0 /BaseFont /STSong-Light /Encoding /UniGB-UCS2-H '
+        '/DescendantFonts [4 0 R] >>',
+        '<< /Type /Font /Subtype /CIDFontType0 /BaseFont /STSong-Light '
+        '/CIDSystemInfo << /Registry (Adobe) /Ordering (GB1) /Supplement 2 >> /FontDescriptor 5 0 R /DW 1000 >>',
+        '<< /Type /FontDescriptor /FontName /STSong-Light /Flags 6 /FontBBox [-25 -254 1000 880] '
+        '/ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >>',
+    ]
+    kids = []
+    for page in pages:
+        content = zlib.compress('\n'.join(['0.5 w'] + page.ops).encode('ascii'))
+        objects.append((f'<< /Length {len(content)} /Filter /FlateDecode >>', content))
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page.width} {PAGE_HEIGHT}] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>')
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'
+
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        if isinstance(obj, tuple):
+            head, stream = obj
+            out += f'{number} 0 obj\n{head}\nstream\n'.encode('ascii') + stream + b'\nendstream\nendobj\n'
+        else:
+            out += f'{number} 0 obj\n{obj}\nendobj\n'.encode('ascii')
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('ascii')
+    for offset in offsets:
+        out += f'{offset:010d} 00000 n \n'.encode('ascii')
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('ascii')
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def text_width(text):
+    return max(len(line) for line in text.split('\n')) * FONT_SIZE + 2 * CELL_PADDING + 2
+
+
+def fit_widths(rows, n_cols):
+    """ 列宽取该列单列格子中最宽的文字 """
+    widths = [0] * n_cols
+    for row in rows:
+        c = 0
+        for item in row:
+            if item['colspan'] == 1 and c < n_cols:
+                widths[c] = max(widths[c], text_width(item['text']))
+            c += item['colspan']
+    return widths
+
+
+def fee_rows(rng, n_rows, n_cols):
+    rows = []
+    for i in range(n_rows):
+        name = rng.choice(FEE_NAMES)
+        if rng.random() < 0.3:
+            name += '\n(每年)'
+        rows.append([cell(name)] + [cell(f'{rng.randint(0, 300) / 100:.2f}%') for _ in range(n_cols)])
+    return rows
+
+
+def simple_table(rng, n_rows=6):
+    rows = [[cell('项目'), cell('费率')]] + fee_rows(rng, n_rows, 1)
+    return Table(rows, fit_widths(rows, 2))
+
+
+def header_table(rng, depth, n_cols, n_rows=6):
+    """ depth 层表头，上层每 2 列合并为一组，首列纵向合并 """
+    header = []
+    for level in range(depth):
+        span = 2 ** (depth - level - 1)
+        row = [cell('类别', rowspan=depth)] if level == 0 else []
+        for j in range(0, n_cols, span):
+            colspan = min(span, n_cols - j)
+            row.append(cell(f'{"ABCDEFGH"[j // span % 8]}类' if level == 0 else f'{"前后"[j // span % 2]}端{level}',
+                            colspan=colspan))
+        header.append(row)
+    rows = header + fee_rows(rng, n_rows, n_cols)
+    widths = [text_width('任何赎回后的最低持有额')] + [max(text_width('前端9'), text_width('0.00%'))] * n_cols
+    return Table(rows, widths)
+
+
+def build_document(kind, rng, n_pages):
+    """ 生成一种文档，返回页面列表 """
+    pages = []
+    for index in range(n_pages):
+        page = Page(WIDE_PAGE_WIDTH if kind == 'wide' else PAGE_WIDTH)
+        page.paragraph(NARRATIVE)
+        if kind == 'narrative' or (kind == 'long' and index % 10):
+            for _ in range(8):
+                page.paragraph(NARRATIVE)
+        else:
+            make = {
+                'simple': lambda: simple_table(rng),
+                'header2': lambda: header_table(rng, 2, 4),
+                'header3': lambda: header_table(rng, 3, 4),
+                'wide': lambda: header_table(rng, 2, 14),
+                'long': lambda: header_table(rng, 2, 4),
+            }[kind]
+            while True:
+                table = make()
+                if not page.fits(table):
+                    break
+                page.table(table)
+        pages.append(page)
+    return pages
+
+
+# 语料中的文档：名称 -> (类型, 页数)
+CORPUS = {
+    'simple': ('simple', 10),
+    'header2': ('header2', 10),
+    'header3': ('header3', 10),
+    'wide': ('wide', 10),
+    'narrative': ('narrative', 20),
+    'long': ('long', 200),
+}
+
+
+def generate(folder, corpus=CORPUS, seed=0):
+    """ 生成语料，返回 PDF 路径列表；同样的 seed 得到完全相同的文件 """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for name, (kind, n_pages) in corpus.items():
+        rng = random.Random(f'{seed}:{name}')
+        pages = build_document(kind, rng, n_pages)
+        path = os.path.join(folder, f'{name}.pdf')
+        write_pdf(path, pages)
+        with open(os.path.join(folder, f'{name}.tables.json'), 'w', encoding='utf-8') as f:
+            json.dump([page.tables for page in pages], f, ensure_ascii=False)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生成合成基金费用表 PDF 语料')
+    parser.add_argument('output', help='输出文件夹')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    for path in generate(args.output, seed=args.seed):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
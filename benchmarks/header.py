@@ -0,0 +1,131 @@
+# coding:utf-8
+"""
+表头解析基准：对比 start_execution 中原来的实现与 fundtable.header
+
+    python benchmarks/header.py [--columns 60] [--rows 200] [--repeat 20]
+
+原实现只支持 2、3 层表头，且每一行数据都会把表头重新替换一遍换行。
+"""
+import argparse
+import copy
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fundtable import engine
+
+
+def legacy_process(table, keywords):
+    """
+    原 start_execution 中复杂表格的 deepth == 2 / 3 两个分支，原样照搬（只去掉了打印表头的
+    print）：两种深度都只拼接前两行作为表头，3 层时从 table[deepth - 1:] 开始逐行处理
+    """
+    def count_consecutive_none(matrix):
+        count = 0
+        for row in matrix:
+            if row[0] is None:
+                count += 1
+        return count
+
+    def fill_empty_with_previous(lst):
+        for i in range(1, len(lst)):
+            if lst[i] is None:
+                lst[i] = lst[i-1]
+        return lst
+
+    result = []
+    deepth = count_consecutive_none(table) + 1
+    for index in range(1, len(table)):
+        if (table[index][0] == None):
+            table[index][0] = table[index - 1][0]
+    if deepth == 2:
+        table[0][1:] = fill_empty_with_previous(table[0][1:])
+        table[1][1:] = fill_empty_with_previous(table[1][1:])
+        table_head = []
+        for i in range(len(table[0][1:])):
+            table_head.append(table[0][1:][i] + table[1][1:][i])
+        for row in table[deepth:]:
+            row_data = {}
+            for i, keyword in enumerate(keywords):
+                if keyword in row[0]:
+                    row[0] = row[0].replace("\n", " ")
+                    temp = {}
+                    for j, value in enumerate(row[1:]):
+                        if value:
+                            value = value.replace("\n", " ")
+                        table_head[j] = table_head[j].replace("\n", " ")
+                        temp[table_head[j]] = str(value)
+                    row_data[row[0]] = temp if len(temp) > 1 else temp
+            if row_data:
+                result.append(row_data)
+    if deepth == 3:
+            table[0][1:] = fill_empty_with_previous(table[0][1:])
+            table[1][1:] = fill_empty_with_previous(table[1][1:])
+            table[2][1:] = fill_empty_with_previous(table[2][1:])
+            table_head = []
+            for i in range(len(table[0][1:])):
+                table_head.append(table[0][1:][i] + table[1][1:][i])
+            for row in table[deepth - 1:]:
+                row_data = {}
+                for i, keyword in enumerate(keywords):
+                    if keyword in row[0]:
+                        row[0] = row[0].replace("\n", " ")
+                        temp = {}
+                        for j, value in enumerate(row[1:]):
+                            if value:
+                                value = value.replace("\n", " ")
+                            table_head[j] = table_head[j].replace("\n", " ")
+                            temp[table_head[j]] = str(value)
+                        row_data[row[0]] = temp if len(temp) > 1 else temp
+                if row_data:
+                    result.append(row_data)
+    return result
+
+
+def make_table(depth, columns, rows):
+    """ 每层表头按 2 列一组横向合并，首列为行名 """
+    table = []
+    for level in range(depth):
+        span = 2 ** (depth - level - 1)
+        row = ['类别' if level == 0 else None]
+        for j in range(columns):
+            row.append(f'L{level}\n组{j // span}' if j % span == 0 else None)
+        table.append(row)
+    names = ['申购费', '赎回费', '认购费', '管理费(每年)', '托管费', '销售服务费']
+    for i in range(rows):
+        table.append([f'{names[i % len(names)]}\n{i}'] + [f'{i}.{j}%\n上限' for j in range(columns)])
+    return table
+
+
+def bench(func, table, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        data = copy.deepcopy(table)
+        T1 = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - T1)
+    return best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--columns', type=int, default=60)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f'{"层数":>4} {"原实现(ms)":>12} {"header(ms)":>12} {"加速":>6}')
+    for depth in (2, 3, 4):
+        table = make_table(depth, args.columns, args.rows)
+        new = bench(lambda t: engine.process_tables([t]), table, args.repeat)
+        if depth <= 3:
+            old = bench(lambda t: legacy_process(t, engine.KEYWORDS), table, args.repeat)
+            print(f'{depth:>4} {old:>12.2f} {new:>12.2f} {old / new:>5.1f}x')
+        else:
+            print(f'{depth:>4} {"不支持":>12} {new:>12.2f} {"-":>6}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+# coding:utf-8
+"""
+提取流水线基准测试
+
+在合成语料上分阶段计时，每个文档在独立子进程中运行以便统计峰值内存：
+
+    open            pdfplumber.open 并读取页数
+    extract_tables  逐页 page.extract_tables()（不做预筛）
+    grid_default    只计表格识别本身（页面对象预先解析好）：page.extract_tables()
+    grid_lattice    同上，fundtable.lattice.extract_tables()，即提取时实际使用的实现
+    header          表头解析与关键词筛选（engine.process_tables）
+    json            流式写出 JSON
+    engine          engine.extract 端到端（含预筛）
+    images          表格图片导出（--images 时）
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --compare results.json
+
+结果为 JSON，可作为基线；--compare 时任一阶段比基线慢超过 --threshold（且绝对差值超过
+--min-ms，避免几毫秒的阶段因抖动误报）即返回 1。
+"""
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pdfplumber
+
+from benchmarks import corpus
+from fundtable import engine, images, lattice, writer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def timed(func, repeat):
+    """ 返回 (最短耗时秒数, 最后一次的返回值) """
+    best = float('inf')
+    for _ in range(repeat):
+        T1 = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - T1)
+    return best, value
+
+
+def bench_document(path, repeat=1, with_images=False, image_scale=2):
+    """ 在当前进程中测一个文档，返回指标 dict """
+    stages = {}
+
+    def open_pdf():
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+
+    stages['open'], n_pages = timed(open_pdf, repeat)
+
+    def extract_tables():
+        with pdfplumber.open(path) as pdf:
+            return [page.extract_tables() for page in pdf.pages]
+
+    stages['extract_tables'], tables = timed(extract_tables, repeat)
+    n_tables = sum(len(page) for page in tables)
+
+    def grid_seconds(func):
+        """ 逐页先解析页面对象，只累计 func(page) 的耗时 """
+        best = float('inf')
+        for _ in range(repeat):
+            seconds = 0
+            result = []
+            with pdfplumber.open(path) as pdf:
+                for page in pdf.pages:
+                    page.objects
+                    T1 = time.perf_counter()
+                    result.append(func(page))
+                    seconds += time.perf_counter() - T1
+                    page.close()
+            best = min(best, seconds)
+        return best, result
+
+    stages['grid_default'], _ = grid_seconds(lambda page: page.extract_tables())
+    stages['grid_lattice'], lattice_tables = grid_seconds(lattice.extract_tables)
+
+    expected_path = Path(path).with_suffix('.tables.json')
+    tables_ok = None
+    if expected_path.exists():
+        with open(expected_path, 'r', encoding='utf-8') as f:
+            tables_ok = json.load(f) == tables
+
+    # process_tables 会原地修改表格，每次计时前先准备好副本
+    copies = [copy.deepcopy(tables) for _ in range(repeat)]
+    stages['header'], pages = timed(
+        lambda: [engine.process_tables(page, engine.KEYWORDS) for page in copies.pop()], repeat)
+    n_records = sum(len(records) for records in pages)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def write_json():
+            with writer.StreamWriter(os.path.join(tmp, 'out.json')) as out:
+                for index, records in enumerate(pages):
+                    out.write_page(index, records)
+            return os.path.getsize(os.path.join(tmp, 'out.json'))
+
+        stages['json'], json_bytes = timed(write_json, repeat)
+        stages['engine'], _ = timed(lambda: engine.extract(path), repeat)
+        if with_images:
+            stages['images'], _ = timed(
+                lambda: images.export_tables(path, os.path.join(tmp, 'images'), workers=1, scale=image_scale), repeat)
+
+    return {
+        'pages': n_pages,
+        'tables': n_tables,
+        'records': n_records,
+        'json_bytes': json_bytes,
+        'tables_ok': tables_ok,
+        'lattice_ok': lattice_tables == tables,
+        'stages': stages,
+        'pages_per_s': n_pages / stages['engine'] if stages['engine'] else None,
+        'tables_per_s': n_tables / stages['extract_tables'] if stages['extract_tables'] else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _child(path, repeat, with_images, image_scale, queue):
+    try:
+        queue.put(bench_document(path, repeat, with_images, image_scale))
+    except Exception as e:
+        queue.put({'error': repr(e)})
+
+
+def bench_isolated(path, repeat, with_images, image_scale):
+    """ 在新的子进程中测一个文档，使峰值内存互不影响 """
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_child, args=(str(path), repeat, with_images, image_scale, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def compare(current, baseline, threshold, min_ms=5):
+    """ 打印与基线的对比，返回变慢的 (文档, 阶段) 列表 """
+    regressions = []
+    print(f'{"文档":<12}{"阶段":<16}{"基线(ms)":>10}{"本次(ms)":>10}{"比值":>8}')
+    for name, doc in current['documents'].items():
+        base = baseline['documents'].get(name)
+        if not base or 'stages' not in base or 'stages' not in doc:
+            continue
+        for stage, seconds in doc['stages'].items():
+            if stage not in base['stages']:
+                continue
+            ratio = seconds / base['stages'][stage] if base['stages'][stage] else float('inf')
+            slower = (seconds - base['stages'][stage]) * 1000 > min_ms
+            flag = ' *' if ratio > 1 + threshold and slower else ''
+            if flag:
+                regressions.append((name, stage))
+            print(f'{name:<12}{stage:<16}{base["stages"][stage] * 1000:>10.1f}{seconds * 1000:>10.1f}'
+                  f'{ratio:>8.2f}{flag}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='在合成语料上测量提取流水线各阶段的性能')
+    parser.add_argument('--corpus', default=os.path.join(tempfile.gettempdir(), 'fundtable-corpus'),
+                        help='语料文件夹，不存在时自动生成')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', help='逗号分隔，只测这些文档')
+    parser.add_argument('--repeat', type=int, default=3, help='每个阶段重复次数，取最短耗时')
+    parser.add_argument('--images', action='store_true', help='同时测表格图片导出')
+    parser.add_argument('--image-scale', type=float, default=2)
+    parser.add_argument('--output', help='结果 JSON 的保存路径')
+    parser.add_argument('--compare', help='与之对比的基线 JSON')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定变慢的比例，默认 0.1 即 10%%')
+    parser.add_argument('--min-ms', type=float, default=5, help='判定变慢的最小绝对差值（毫秒）')
+    args = parser.parse_args(argv)
+
+    names = args.only.split(',') if args.only else list(corpus.CORPUS)
+    folder = Path(args.corpus)
+    if not all((folder / f'{name}.pdf').exists() for name in names):
+        corpus.generate(folder, seed=args.seed)
+
+    result = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'pdfplumber': pdfplumber.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'documents': {},
+    }
+    for name in names:
+        doc = bench_isolated(folder / f'{name}.pdf', args.repeat, args.images, args.image_scale)
+        result['documents'][name] = doc
+        if 'error' in doc:
+            print(f'{name}: 失败 {doc["error"]}', file=sys.stderr)
+            continue
+        stages = ' '.join(f'{stage}={seconds * 1000:.0f}ms' for stage, seconds in doc['stages'].items())
+        rss = f'{doc["peak_rss_mb"]:.0f}MB' if doc['peak_rss_mb'] is not None else '-'
+        print(f'{name}: {doc["pages"]} 页 {doc["tables"]} 表 {doc["pages_per_s"]:.1f} 页/秒 '
+              f'{doc["tables_per_s"]:.1f} 表/秒 峰值 {rss} 表格校验 {doc["tables_ok"]} '
+              f'快速路径一致 {doc["lattice_ok"]}  {stages}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold, args.min_ms):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
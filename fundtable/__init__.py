@@ -0,0 +1,4 @@
+# coding:utf-8
+from .engine import KEYWORDS, extract, process_tables
+
+__all__ = ['KEYWORDS', 'extract', 'process_tables']
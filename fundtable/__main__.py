@@ -0,0 +1,8 @@
+# coding:utf-8
+import sys
+
+from .cli import main
+
+# 子进程（spawn）会重新导入本模块，只在主进程中运行命令
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+# coding:utf-8
+"""
+基于内容哈希的提取结果缓存
+
+缓存分两层，均以 PDF 内容的 sha256 和页码下标为键：
+
+- tables：page.extract_tables() 的原始表格，与关键词无关
+- records：按关键词、表头逻辑版本和预筛设置处理后的记录
+
+只改关键词时会命中 tables 层，跳过最耗时的表格识别；文件和配置都没变时
+直接命中 records 层，不需要打开 PDF。数据存放在 SQLite 中，总大小超过
+上限后按最近访问时间淘汰。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+import pdfplumber
+
+from . import engine, lattice
+from .metrics import NULL_METRICS
+
+
+DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'fundtable')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def config_key(keywords, prefilter=True):
+    """ 影响记录内容的全部配置，预筛可能误跳过页，关闭预筛的结果单独保存 """
+    return json.dumps([engine.HEADER_VERSION, list(keywords), bool(prefilter)], ensure_ascii=False)
+
+
+class ResultCache:
+    """ 提取结果的磁盘缓存，可在多个进程间共享同一目录 """
+
+    def __init__(self, folder=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.folder = str(folder)
+        self.max_bytes = max_bytes
+        self.hits = {'records': 0, 'tables': 0}
+        self.misses = 0
+        self._db = None
+        self._digests = {}
+
+    def __getstate__(self):
+        # 传给子进程时不带数据库连接，由子进程自行打开
+        state = self.__dict__.copy()
+        state['_db'] = None
+        return state
+
+    @property
+    def db(self):
+        if self._db is None:
+            os.makedirs(self.folder, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.folder, 'cache.sqlite3'), timeout=30)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS entries '
+                '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, atime REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime)')
+        return self._db
+
+    def digest(self, path):
+        """ 同一进程内按 (路径, 大小, 修改时间) 记住哈希，避免重复读文件 """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._digests:
+            self._digests[key] = file_digest(path)
+        return self._digests[key]
+
+    def get(self, key):
+        row = self.db.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with self.db:
+            self.db.execute('UPDATE entries SET atime = ? WHERE key = ?', (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, value):
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                            (key, blob, len(blob), time.time()))
+        self.evict()
+
+    def evict(self):
+        """ 超过容量上限时淘汰最久未访问的条目，直到回到上限的 90% 以下 """
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self.db.execute('SELECT key, size FROM entries ORDER BY atime').fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= target:
+                break
+            stale.append((key,))
+            total -= size
+        with self.db:
+            self.db.executemany('DELETE FROM entries WHERE key = ?', stale)
+
+    def clear(self):
+        with self.db:
+            self.db.execute('DELETE FROM entries')
+        self.db.execute('VACUUM')
+
+    def page_count(self, path):
+        digest = self.digest(path)
+        count = self.get(f'count:{digest}')
+        if count is None:
+            count = engine.page_count(path)
+            self.put(f'count:{digest}', count)
+        return count
+
+    def iter_pages(self, path, keywords=engine.KEYWORDS, start=0, stop=None, prefilter=True, metrics=NULL_METRICS,
+                   memory=None):
+        """ 与 engine.iter_pages 相同，未命中的页才打开 PDF 提取 """
+        digest = self.digest(path)
+        config = config_key(keywords, prefilter)
+        pdf = None
+        try:
+            count = self.page_count(path)
+            stop = count if stop is None else min(stop, count)
+            for index in range(start, stop):
+                metrics.start_page(index)
+                records_key = f'records:{digest}:{index}:{config}'
+                with metrics.stage('cache'):
+                    records = self.get(records_key)
+                if records is not None:
+                    self.hits['records'] += 1
+                    metrics.count('cache_hits', 1)
+                    # 命中 records 层时表格数和丢弃行数未知，只记保留的行
+                    metrics.count('rows_kept', len(records))
+                    metrics.end_page()
+                    yield index, count, records
+                    continue
+                tables_key = f'tables:{digest}:{index}'
+                with metrics.stage('cache'):
+                    tables = self.get(tables_key)
+                if tables is not None:
+                    self.hits['tables'] += 1
+                    metrics.count('cache_hits', 1)
+                else:
+                    self.misses += 1
+                    if pdf is None:
+                        with metrics.stage('open'):
+                            pdf = pdfplumber.open(path)
+                    page = pdf.pages[index]
+                    # 先扫描原始内容流，没有路径的页不做版面分析
+                    with metrics.stage('prefilter'):
+                        ruled = not prefilter or engine.stream_has_paths(page)
+                    if ruled:
+                        with metrics.stage('parse'):
+                            page.objects
+                        with metrics.stage('prefilter'):
+                            ruled = not prefilter or engine.page_has_ruling(page)
+                            skip = ruled and prefilter and not engine.page_mentions(page, keywords)
+                    if not ruled:
+                        # 没有框线的页识别不到表格，与关键词无关，记在 tables 层，改关键词后不必再解析
+                        metrics.count('skipped_pages', 1)
+                        tables = []
+                        with metrics.stage('cache'):
+                            self.put(tables_key, tables)
+                    elif skip:
+                        # 关键词预筛的结果与关键词有关，只记在 records 层
+                        metrics.count('skipped_pages', 1)
+                        tables = []
+                    else:
+                        with metrics.stage('extract_tables'):
+                            tables = lattice.extract_tables(page)
+                        with metrics.stage('cache'):
+                            self.put(tables_key, tables)
+                    page.close()
+                    if memory is not None:
+                        memory.after_page(pdf)
+                # process_tables 会原地修改表格，所以先写缓存再处理
+                records = engine.process_page_tables(tables, keywords, metrics)
+                with metrics.stage('cache'):
+                    self.put(records_key, records)
+                metrics.end_page()
+                yield index, count, records
+        finally:
+            if pdf is not None:
+                pdf.close()
+
+    def stats(self):
+        entries, size = self.db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {
+            'folder': self.folder,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hits': dict(self.hits),
+            'misses': self.misses,
+        }
@@ -0,0 +1,687 @@
+# coding:utf-8
+"""
+批量提取命令行
+
+    python -m fundtable extract 输入文件夹 输出文件夹
+
+各子命令用到的模块（图片导出的 PIL、服务、监视等）在对应的处理函数中才导入，
+解析参数时也只构建所运行的子命令，批处理脚本中频繁调用的命令启动更快。
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import engine
+from .matcher import load_keywords
+from .metrics import Metrics, summary
+
+
+def iter_pdfs(folder):
+    """ 按文件名顺序列出文件夹中的 PDF """
+    return sorted(p for p in Path(folder).iterdir() if p.suffix.lower() == '.pdf')
+
+
+def output_path(args, pdf_path):
+    return Path(args.output) / f'{pdf_path.stem}.{args.format}'
+
+
+def open_cache(args):
+    if args.cache is None:
+        return None
+    from .cache import ResultCache
+    return ResultCache(args.cache, args.cache_size * 1024 * 1024)
+
+
+def print_cache_stats(result_cache, hits=True):
+    """ hits 为 False 时只汇报缓存容量：在子进程中提取时命中统计留在各子进程中，本进程的计数总是 0 """
+    stats = result_cache.stats()
+    text = f'缓存 {stats["folder"]}: {stats["entries"]} 条 {stats["bytes"] / 1024 / 1024:.1f}MB'
+    if hits:
+        text += (f'，命中记录 {stats["hits"]["records"]} 页，命中表格 {stats["hits"]["tables"]} 页，'
+                 f'未命中 {stats["misses"]} 页')
+    print(text)
+
+
+def open_index(args):
+    if not args.index:
+        return None
+    from .search import FeeIndex
+    return FeeIndex(args.index)
+
+
+def open_metrics(args):
+    """ --metrics、--profile、--trace-memory 任一开启时返回 Metrics """
+    if not (args.metrics or args.profile or args.trace_memory):
+        return None
+    return Metrics(profile=bool(args.profile), top_pages=args.profile or 5, trace_memory=args.trace_memory)
+
+
+def open_memory(args):
+    """ --low-memory 或 --max-rss 开启时返回 MemoryGuard """
+    if not (args.low_memory or args.max_rss):
+        return None
+    from . import memory
+    return memory.MemoryGuard(args.max_rss * memory.MB if args.max_rss else None)
+
+
+def print_peak_memory(guard, workers=False):
+    from . import memory
+    main = memory.peak_rss()
+    if main is None:
+        return
+    text = f'峰值内存 {main / memory.MB:.0f}MB'
+    children = memory.peak_rss(children=True) if workers else None
+    if children:
+        text += f'，工作进程最高 {children / memory.MB:.0f}MB'
+    if guard is not None and guard.max_rss:
+        text += f'（上限 {guard.max_rss / memory.MB:.0f}MB）'
+    print(text)
+
+
+def parse_keywords(args):
+    if args.keywords_file:
+        return load_keywords(args.keywords_file)
+    if args.keywords:
+        return args.keywords.split(',')
+    return engine.KEYWORDS
+
+
+def run_extract(args):
+    from . import columnar, writer
+    keywords = parse_keywords(args)
+    os.makedirs(args.output, exist_ok=True)
+    result_cache = open_cache(args)
+    metrics = open_metrics(args)
+    guard = open_memory(args)
+    fee_index = open_index(args)
+    if args.timeout or args.page_timeout:
+        return run_extract_isolated(args, keywords, result_cache, metrics, guard, fee_index)
+    if args.workers != 1:
+        if metrics is not None:
+            print('--metrics/--profile/--trace-memory 只在 -j 1 时生效', file=sys.stderr)
+        return run_extract_parallel(args, keywords, result_cache, guard, fee_index)
+    failed = 0
+    for pdf_path in iter_pdfs(args.input):
+        T1 = time.time()
+        # 加入索引的各页记录
+        kept = []
+        on_page = None if fee_index is None else lambda *page: kept.append(page)
+        try:
+            if args.format in columnar.FORMATS:
+                pages = engine.iter_pages(pdf_path, keywords, cache=result_cache, prefilter=args.prefilter,
+                                          metrics=metrics, memory=guard)
+                kept = [(index, records) for index, _, records in pages]
+                table = columnar.ColumnarTable.from_pages(kept)
+                table.save(output_path(args, pdf_path), args.format)
+                count = table.records
+            else:
+                count = writer.extract_to_file(pdf_path, output_path(args, pdf_path), args.format, keywords,
+                                               cache=result_cache, prefilter=args.prefilter, metrics=metrics,
+                                               memory=guard, on_page=on_page)
+            if fee_index is not None:
+                fee_index.add_document(pdf_path, kept)
+        except Exception as e:
+            failed += 1
+            print(f'{pdf_path.name}: 提取失败 {e}', file=sys.stderr)
+            continue
+        print(f'{pdf_path.name}: {count} 条记录 {(time.time() - T1) * 1000:.0f}ms')
+        if metrics is not None and metrics.documents:
+            print(f'  {summary(metrics.documents[-1])}')
+    if result_cache is not None:
+        print_cache_stats(result_cache)
+    if metrics is not None:
+        metrics.save(Path(args.output) / 'metrics.json')
+    if guard is not None:
+        print_peak_memory(guard)
+    return 1 if failed else 0
+
+
+def run_extract_parallel(args, keywords, result_cache, guard=None, fee_index=None):
+    pdf_paths = iter_pdfs(args.input)
+    T1 = time.time()
+    # 低内存模式下各任务的结果先写到临时文件，写出时再逐页读回
+    spill = tempfile.TemporaryDirectory(prefix='fundtable-spill-', dir=args.spill_dir) if guard else None
+    try:
+        failed = write_parallel_results(args, pdf_paths, keywords, result_cache, guard, spill and spill.name,
+                                        fee_index)
+    finally:
+        if spill is not None:
+            spill.cleanup()
+    print(f'共 {len(pdf_paths)} 个文件 {(time.time() - T1) * 1000:.0f}ms')
+    if result_cache is not None:
+        print_cache_stats(result_cache, hits=False)
+    if guard is not None:
+        print_peak_memory(guard, workers=True)
+    return 1 if failed else 0
+
+
+def run_extract_isolated(args, keywords, result_cache, metrics=None, guard=None, fee_index=None):
+    """ 每个文档在单独的子进程中提取，超出时间或内存上限的页记为空，错误写入 errors.json """
+    from . import columnar, isolate, memory, parallel, writer
+    if args.workers != 1 and metrics is not None:
+        print('--metrics/--profile/--trace-memory 只在 -j 1 时生效', file=sys.stderr)
+        metrics = None
+    extractor = isolate.IsolatedExtractor(args.timeout or None, args.page_timeout or None,
+                                          args.max_rss * memory.MB if args.max_rss else None)
+    pdf_paths = iter_pdfs(args.input)
+    errors = {pdf_path: [] for pdf_path in pdf_paths}
+
+    def extract_one(pdf_path):
+        T1 = time.time()
+        pages = extractor.iter_pages(pdf_path, keywords, result_cache, args.prefilter, metrics, guard,
+                                     errors[pdf_path].append)
+        kept = []
+        if args.format in columnar.FORMATS:
+            kept = [(index, records) for index, _, records in pages]
+            table = columnar.ColumnarTable.from_pages(kept)
+            table.save(output_path(args, pdf_path), args.format)
+            return table.records, kept, time.time() - T1
+        with writer.StreamWriter(output_path(args, pdf_path), args.format) as out:
+            for index, _, records in pages:
+                out.write_page(index, records)
+                if fee_index is not None:
+                    kept.append((index, records))
+        return out.records, kept, time.time() - T1
+
+    T1 = time.time()
+    failed = 0
+    # 子进程做实际的提取，线程只负责等待和写出
+    with ThreadPoolExecutor(max_workers=args.workers or parallel.default_workers()) as executor:
+        futures = [executor.submit(extract_one, pdf_path) for pdf_path in pdf_paths]
+        for pdf_path, future in zip(pdf_paths, futures):
+            try:
+                count, kept, seconds = future.result()
+            except Exception as e:
+                failed += 1
+                print(f'{pdf_path.name}: 提取失败 {e}', file=sys.stderr)
+                continue
+            if fee_index is not None:
+                fee_index.add_document(pdf_path, kept)
+            print(f'{pdf_path.name}: {count} 条记录 {seconds * 1000:.0f}ms')
+            for error in errors[pdf_path]:
+                pages = f'第 {error["start"] + 1} 页' if error['stop'] == error['start'] + 1 else \
+                    f'第 {error["start"] + 1}-{error["stop"]} 页'
+                print(f'  {pages}: {error["error"]}，{"重试成功" if error["recovered"] else "记为空"}',
+                      file=sys.stderr)
+    report = [error for pdf_path in pdf_paths for error in errors[pdf_path]]
+    with open(Path(args.output) / isolate.ERRORS_NAME, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'共 {len(pdf_paths)} 个文件 {(time.time() - T1) * 1000:.0f}ms，'
+          f'{sum(not error["recovered"] for error in report)} 处页面记为空')
+    if result_cache is not None:
+        print_cache_stats(result_cache, hits=False)
+    if metrics is not None:
+        metrics.save(Path(args.output) / 'metrics.json')
+    if guard is not None:
+        print_peak_memory(guard)
+    return 1 if failed else 0
+
+
+def write_parallel_results(args, pdf_paths, keywords, result_cache, guard, spill, fee_index=None):
+    """ 并行提取并写出全部结果，返回失败的文件数 """
+    from . import columnar, parallel, writer
+    results = parallel.extract_many(pdf_paths, args.workers or None, keywords, args.pages_per_task, result_cache,
+                                    args.prefilter, by_page=True, memory=guard, spill=spill)
+    failed = 0
+    for pdf_path, result in zip(pdf_paths, results):
+        if isinstance(result, Exception):
+            failed += 1
+            print(f'{pdf_path.name}: 提取失败 {result}', file=sys.stderr)
+            continue
+        if args.format in columnar.FORMATS:
+            table = columnar.ColumnarTable.from_pages(enumerate(result))
+            table.save(output_path(args, pdf_path), args.format)
+            count = table.records
+        else:
+            count = 0
+            with writer.StreamWriter(output_path(args, pdf_path), args.format) as out:
+                for index, records in enumerate(result):
+                    out.write_page(index, records)
+                    count += len(records)
+        if fee_index is not None:
+            fee_index.add_document(pdf_path, enumerate(result))
+        if isinstance(result, parallel.SpilledPages):
+            result.remove()
+        print(f'{pdf_path.name}: {count} 条记录')
+    return failed
+
+
+def run_watch(args):
+    from . import watch
+    def on_status(stats):
+        print(f'已处理 {stats["processed"]} 个（重复 {stats["duplicates"]}，失败 {stats["failed"]}），'
+              f'积压 {stats["backlog"]} 个，{stats["files_per_min"]:.1f} 个/分钟 {stats["pages_per_s"]:.1f} 页/秒')
+
+    watcher = watch.Watcher(args.input, args.output, args.workers or None, args.format, parse_keywords(args),
+                            open_cache(args), args.prefilter, args.interval, args.poll, on_status,
+                            index=open_index(args))
+    # 收到 SIGTERM 时处理完正在运行的文件再退出
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    try:
+        stats = watcher.run(lambda: bool(stopping), once=args.once)
+    except KeyboardInterrupt:
+        return 0
+    return 1 if args.once and stats['failed'] else 0
+
+
+def run_serve(args):
+    from . import service
+    extraction = service.ExtractionService(args.workers or None, args.max_pending or None, args.pages_per_task,
+                                           args.batch_pages, args.batch_size, args.batch_wait / 1000,
+                                           open_cache(args), args.root)
+
+    def ready(server):
+        # SIGTERM 时停止接受请求并关闭进程池；shutdown 需要在其他线程中调用
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+        where = args.unix or f'http://{args.host}:{server.server_address[1]}'
+        print(f'提取服务已启动 {where}，{extraction.workers} 个工作进程，最多 {extraction.max_pending} 个并发请求')
+
+    try:
+        service.serve(extraction, args.host, args.port, args.unix, args.quiet, ready)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def iter_index_sources(paths):
+    """
+    展开命令行中的文件和文件夹，文件夹中取 PDF 和 json/ndjson 结果文件
+
+    文件夹中的其他 JSON（状态、统计、错误记录、基准语料的 .tables.json 等）按内容判断后跳过。
+    """
+    from . import search
+    for path in map(Path, paths):
+        if path.is_dir():
+            for p in sorted(path.iterdir()):
+                if p.suffix.lower() == '.pdf':
+                    yield p
+                elif p.suffix.lower() in ('.json', '.ndjson') and search.is_result_file(p):
+                    yield p
+        else:
+            yield path
+
+
+def print_index_stats(fee_index):
+    stats = fee_index.stats()
+    print(f'索引 {stats["path"]}: {stats["documents"]} 个文档 {stats["cells"]} 个单元格 '
+          f'{stats["keys"]} 个行名/列名 {stats["bytes"] / 1024 / 1024:.1f}MB')
+
+
+def run_index(args):
+    from .search import FeeIndex
+    fee_index = FeeIndex(args.index)
+    for path in args.remove:
+        fee_index.remove(path)
+    keywords = parse_keywords(args)
+    result_cache = open_cache(args)
+    failed = 0
+    for path in iter_index_sources(args.paths):
+        if not args.force and fee_index.is_current(path):
+            continue
+        T1 = time.time()
+        try:
+            if path.suffix.lower() == '.pdf':
+                pages = engine.iter_pages(path, keywords, cache=result_cache, prefilter=args.prefilter)
+                count = fee_index.add_document(path, ((index, records) for index, _, records in pages))
+            else:
+                count = fee_index.add_result_file(path)
+        except Exception as e:
+            failed += 1
+            print(f'{path.name}: 索引失败 {e}', file=sys.stderr)
+            continue
+        print(f'{path.name}: {count} 个单元格 {(time.time() - T1) * 1000:.0f}ms')
+    print_index_stats(fee_index)
+    return 1 if failed else 0
+
+
+def run_query(args):
+    from .search import FeeIndex
+    fee_index = FeeIndex(args.index)
+    T1 = time.perf_counter()
+    try:
+        hits = fee_index.query(args.row, args.column, args.min, args.max, args.gt, args.lt, args.unit,
+                               args.document, args.exact, args.limit)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - T1
+    if args.json:
+        print(json.dumps(hits, ensure_ascii=False, indent=2))
+        return 0
+    for hit in hits:
+        page = '' if hit['page'] is None else f' 第 {hit["page"] + 1} 页'
+        column = f' | {hit["column"]}' if hit['column'] else ''
+        print(f'{os.path.basename(hit["document"])}{page}  {hit["row"]}{column} = {hit["value"]}')
+    print(f'{len(hits)} 条结果 {elapsed * 1000:.1f}ms', file=sys.stderr)
+    return 0
+
+
+def run_revise(args):
+    from . import revision
+    keywords = parse_keywords(args)
+    T1 = time.time()
+    try:
+        result = revision.revise(args.pdf, args.output, args.format, keywords, args.prefilter, base=args.base)
+    except Exception as e:
+        print(f'{Path(args.pdf).name}: 提取失败 {e}', file=sys.stderr)
+        return 1
+    print(f'{Path(args.pdf).name}: {result["pages"]} 页，重新提取 {len(result["extracted"])} 页，'
+          f'{result["records"]} 条记录 {(time.time() - T1) * 1000:.0f}ms')
+    diff = result['diff']
+    dumps = lambda value: json.dumps(value, ensure_ascii=False)
+    for item in diff['changed']:
+        print(f'  修改 第 {item["page"] + 1} 页 {item["row"]}: {dumps(item["before"])} -> {dumps(item["after"])}')
+    for item in diff['added']:
+        print(f'  新增 第 {item["page"] + 1} 页 {dumps(item["record"])}')
+    for item in diff['removed']:
+        print(f'  删除 原第 {item["page"] + 1} 页 {dumps(item["record"])}')
+    print(f'新增 {len(diff["added"])} 条，删除 {len(diff["removed"])} 条，修改 {len(diff["changed"])} 条')
+    if args.diff:
+        with open(args.diff, 'w', encoding='utf-8') as f:
+            json.dump(diff, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+def run_manifest(args):
+    from . import shard
+    T1 = time.time()
+    manifest = shard.build_manifest(args.input, args.workers or None)
+    shard.write_json(manifest, args.manifest)
+    documents = manifest['documents']
+    for document in documents:
+        if document['pages'] is None:
+            print(f'{document["name"]}: 无法读取页数 {document["error"]}', file=sys.stderr)
+    pages = sum(document['pages'] or 0 for document in documents)
+    print(f'共 {len(documents)} 个文件 {pages} 页 {(time.time() - T1) * 1000:.0f}ms')
+    return 0
+
+
+def shard_arg(text):
+    from . import shard
+    try:
+        return shard.parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def run_shard(args):
+    from . import shard
+    manifest = shard.load_manifest(args.manifest)
+    index, count = args.shard
+
+    def on_unit(key, result):
+        if isinstance(result, Exception):
+            print(f'{key}: 提取失败 {result}', file=sys.stderr)
+        else:
+            print(f'{key}: {result} 条记录')
+
+    T1 = time.time()
+    stats = shard.run_shard(manifest, args.output, index, count, parse_keywords(args), open_cache(args),
+                            args.prefilter, args.root, on_unit)
+    print(f'分片 {index + 1}/{count}：完成 {stats["done"]} 个区间，跳过已完成的 {stats["skipped"]} 个，'
+          f'失败 {stats["failed"]} 个 {(time.time() - T1) * 1000:.0f}ms')
+    return 1 if stats['failed'] else 0
+
+
+def run_merge(args):
+    from . import shard
+    manifest = shard.load_manifest(args.manifest)
+    T1 = time.time()
+    missing = shard.merge(manifest, args.output, args.format,
+                          lambda name, records: print(f'{name}: {records} 条记录'))
+    for name in missing:
+        print(f'{name}: 有区间尚未完成', file=sys.stderr)
+    print(f'已合并 {len(manifest["documents"]) - len(missing)} 个文件，缺失 {len(missing)} 个 '
+          f'{(time.time() - T1) * 1000:.0f}ms')
+    return 1 if missing else 0
+
+
+def run_cache(args):
+    from .cache import ResultCache
+    result_cache = ResultCache(args.cache)
+    if args.clear:
+        result_cache.clear()
+    print_cache_stats(result_cache, hits=False)
+    return 0
+
+
+def run_images(args):
+    from . import images
+    source = Path(args.input)
+    pdf_paths = iter_pdfs(source) if source.is_dir() else [source]
+    failed = 0
+    for pdf_path in pdf_paths:
+        T1 = time.time()
+        out_dir = Path(args.output) / pdf_path.stem if source.is_dir() else Path(args.output)
+        try:
+            written = images.export_tables(pdf_path, out_dir, args.workers or None, args.scale, args.target_width,
+                                           args.max_mb * 1024 * 1024, letterboxed=args.letterbox,
+                                           format=args.image_format)
+        except Exception as e:
+            failed += 1
+            print(f'{pdf_path.name}: 导出失败 {e}', file=sys.stderr)
+            continue
+        print(f'{pdf_path.name}: {len(written)} 张表格图片 {(time.time() - T1) * 1000:.0f}ms')
+    return 1 if failed else 0
+
+
+def add_extract_arguments(p):
+    from . import cache, columnar, parallel, search, writer
+    p.add_argument('input', help='PDF 所在文件夹')
+    p.add_argument('output', help='JSON 输出文件夹')
+    p.add_argument('--keywords', help='逗号分隔的关键词，默认 ' + ','.join(engine.KEYWORDS))
+    p.add_argument('--keywords-file', help='关键词文件，每行一个，优先于 --keywords')
+    p.add_argument('--no-prefilter', dest='prefilter', action='store_false',
+                   help='不做关键词预筛，对每一页都执行表格识别')
+    p.add_argument('--format', choices=writer.FORMATS + columnar.FORMATS, default='json',
+                   help='输出格式，ndjson 为每行一条记录，json/ndjson 在顺序提取时逐页写入，中断后重跑会从断点继续；'
+                        'csv/arrow/parquet 为每个单元格一行的列式结果，arrow/parquet 需要 pyarrow')
+    p.add_argument('-j', '--workers', type=int, default=1, help='工作进程数，0 表示使用全部 CPU 核心')
+    p.add_argument('--pages-per-task', type=int, default=parallel.PAGES_PER_TASK, help='每个并行任务处理的页数')
+    p.add_argument('--cache', nargs='?', const=cache.DEFAULT_DIR,
+                   help=f'使用结果缓存，可指定缓存目录，默认 {cache.DEFAULT_DIR}')
+    p.add_argument('--cache-size', type=int, default=cache.DEFAULT_MAX_BYTES // 1024 // 1024,
+                   help='缓存容量上限（MB），超出后淘汰最久未使用的条目')
+    p.add_argument('--metrics', action='store_true',
+                   help='统计各阶段耗时和行数，打印每个文件的摘要并在输出文件夹写出 metrics.json')
+    p.add_argument('--profile', type=int, metavar='N', default=0,
+                   help='逐页 cProfile，在 metrics.json 中保留最慢的 N 页的统计，开销较大')
+    p.add_argument('--trace-memory', action='store_true', help='用 tracemalloc 记录每页的内存峰值，开销较大')
+    p.add_argument('--low-memory', action='store_true',
+                   help='低内存模式：每页释放文档缓存，并行时结果先写入临时文件，结束时打印峰值内存')
+    p.add_argument('--max-rss', type=int, metavar='MB', default=0,
+                   help='每个进程的常驻内存上限（MB），释放缓存后仍超过时该文件记为失败，隐含 --low-memory')
+    p.add_argument('--spill-dir', help='低内存模式并行提取时临时文件的位置，默认为系统临时文件夹')
+    p.add_argument('--index', nargs='?', const=search.DEFAULT_PATH,
+                   help=f'提取后把结果加入费用项索引，可指定索引文件，默认 {search.DEFAULT_PATH}')
+    p.add_argument('--timeout', type=float, default=0,
+                   help='每个文档的时间上限（秒），超时后剩余各页记为空；指定该项或 --page-timeout 时每个文档在'
+                        '单独的子进程中提取，-j 为同时提取的文档数，错误写入输出文件夹的 errors.json')
+    p.add_argument('--page-timeout', type=float, default=0,
+                   help='每页的时间上限（秒），超时、超出 --max-rss 或崩溃的页用更省事的设置重试一次，仍失败则记为空')
+    p.set_defaults(func=run_extract)
+
+
+def add_watch_arguments(p):
+    from . import cache, columnar, search, writer
+    p.add_argument('input', help='监视的 PDF 文件夹')
+    p.add_argument('output', help='结果输出文件夹，处理记录和 watch-status.json 也保存在这里')
+    p.add_argument('--keywords', help='逗号分隔的关键词，默认 ' + ','.join(engine.KEYWORDS))
+    p.add_argument('--keywords-file', help='关键词文件，每行一个，优先于 --keywords')
+    p.add_argument('--no-prefilter', dest='prefilter', action='store_false', help='不做关键词预筛')
+    p.add_argument('--format', choices=writer.FORMATS + columnar.FORMATS, default='json', help='输出格式')
+    p.add_argument('-j', '--workers', type=int, default=0, help='同时提取的文件数，0 表示 CPU 核心数')
+    p.add_argument('--interval', type=float, default=2.0, help='轮询间隔（秒），inotify 不可用或 --poll 时生效')
+    p.add_argument('--poll', action='store_true', help='不使用 inotify，定时扫描文件夹')
+    p.add_argument('--once', action='store_true', help='只处理当前已有的文件，完成后退出')
+    p.add_argument('--cache', nargs='?', const=cache.DEFAULT_DIR,
+                   help=f'使用结果缓存，可指定缓存目录，默认 {cache.DEFAULT_DIR}')
+    p.add_argument('--cache-size', type=int, default=cache.DEFAULT_MAX_BYTES // 1024 // 1024,
+                   help='缓存容量上限（MB）')
+    p.add_argument('--index', nargs='?', const=search.DEFAULT_PATH,
+                   help=f'处理完的文件加入费用项索引，可指定索引文件，默认 {search.DEFAULT_PATH}')
+    p.set_defaults(func=run_watch)
+
+
+def add_serve_arguments(p):
+    from . import cache, service
+    p.add_argument('--host', default='127.0.0.1', help='监听地址')
+    p.add_argument('--port', type=int, default=service.DEFAULT_PORT, help='监听端口，0 表示随机')
+    p.add_argument('--unix', help='改为监听该路径的 Unix 套接字')
+    p.add_argument('-j', '--workers', type=int, default=0, help='工作进程数，0 表示 CPU 核心数')
+    p.add_argument('--max-pending', type=int, default=0,
+                   help='同时处理的请求数上限，超出时返回 503，默认为进程数的 4 倍')
+    p.add_argument('--pages-per-task', type=int, default=service.PAGES_PER_TASK,
+                   help='大文档每个任务的页数，也是流式返回时每次推送的最大页数')
+    p.add_argument('--batch-pages', type=int, default=service.BATCH_PAGES, help='不超过该页数的文档参与攒批')
+    p.add_argument('--batch-size', type=int, default=service.BATCH_SIZE, help='每批最多的文档数')
+    p.add_argument('--batch-wait', type=float, default=service.BATCH_WAIT * 1000, help='攒批的等待时间（毫秒）')
+    p.add_argument('--root', help='只允许按路径提取该文件夹下的文件')
+    p.add_argument('--cache', nargs='?', const=cache.DEFAULT_DIR,
+                   help=f'使用结果缓存，可指定缓存目录，默认 {cache.DEFAULT_DIR}')
+    p.add_argument('--cache-size', type=int, default=cache.DEFAULT_MAX_BYTES // 1024 // 1024,
+                   help='缓存容量上限（MB）')
+    p.add_argument('--quiet', action='store_true', help='不打印访问日志')
+    p.set_defaults(func=run_serve)
+
+
+def add_images_arguments(p):
+    from . import images
+    p.add_argument('input', help='PDF 文件或所在文件夹，文件夹时每个 PDF 输出到同名子文件夹')
+    p.add_argument('output', help='图片输出文件夹')
+    p.add_argument('--scale', type=float, help=f'渲染倍率，1 倍为 72 DPI，默认 {images.DEFAULT_SCALE}')
+    p.add_argument('--target-width', type=int, help='按每页最宽表格的目标像素宽度推算倍率，优先于 --scale')
+    p.add_argument('--max-mb', type=int, default=images.DEFAULT_MAX_BYTES // 1024 // 1024,
+                   help='单页位图的内存上限（MB），倍率会自动降低到不超过该值')
+    p.add_argument('--letterbox', action='store_true', help='将全部图片居中放到同一尺寸的画布上（取最大宽高）')
+    p.add_argument('--image-format', choices=list(images.FORMATS), default='PNG',
+                   help='图片格式，WEBP 编码更快、文件更小')
+    p.add_argument('-j', '--workers', type=int, default=0, help='工作进程数，0 表示使用全部 CPU 核心')
+    p.set_defaults(func=run_images)
+
+
+def add_index_arguments(p):
+    from . import cache, search
+    p.add_argument('paths', nargs='*', help='PDF、json/ndjson 结果文件或它们所在的文件夹')
+    p.add_argument('--index', default=search.DEFAULT_PATH, help='索引文件')
+    p.add_argument('--remove', nargs='+', default=[], metavar='PATH', help='从索引中删除这些文档')
+    p.add_argument('--force', action='store_true', help='文件未变化时也重新索引')
+    p.add_argument('--keywords', help='逗号分隔的关键词，默认 ' + ','.join(engine.KEYWORDS))
+    p.add_argument('--keywords-file', help='关键词文件，每行一个，优先于 --keywords')
+    p.add_argument('--no-prefilter', dest='prefilter', action='store_false', help='不做关键词预筛')
+    p.add_argument('--cache', nargs='?', const=cache.DEFAULT_DIR,
+                   help=f'提取 PDF 时使用结果缓存，可指定缓存目录，默认 {cache.DEFAULT_DIR}')
+    p.add_argument('--cache-size', type=int, default=cache.DEFAULT_MAX_BYTES // 1024 // 1024,
+                   help='缓存容量上限（MB）')
+    p.set_defaults(func=run_index)
+
+
+def add_query_arguments(p):
+    from . import search
+    p.add_argument('--index', default=search.DEFAULT_PATH, help='索引文件')
+    p.add_argument('--row', help='行名包含的文字，如 管理费')
+    p.add_argument('--column', help='列名包含的文字')
+    p.add_argument('--exact', action='store_true', help='行名、列名规整后须完全相同')
+    p.add_argument('--min', help='值不小于该数，可带单位，如 1.5%%')
+    p.add_argument('--max', help='值不大于该数')
+    p.add_argument('--gt', help='值大于该数')
+    p.add_argument('--lt', help='值小于该数')
+    p.add_argument('--unit', help='限定单位：%%、‰、元、份')
+    p.add_argument('--document', help='文档路径包含的文字')
+    p.add_argument('--limit', type=int, default=0, help='最多返回的条数')
+    p.add_argument('--json', action='store_true', help='以 JSON 输出')
+    p.set_defaults(func=run_query)
+
+
+def add_revise_arguments(p):
+    from . import columnar, writer
+    p.add_argument('pdf', help='新版 PDF')
+    p.add_argument('output', help='输出文件夹，每个文档的逐页结果保存在其中的 <文件名>.revision')
+    p.add_argument('--base', help='上一版的文件名，新版改了文件名时指定，默认与新版同名')
+    p.add_argument('--diff', help='把新增、删除、修改的记录写入该 JSON 文件')
+    p.add_argument('--keywords', help='逗号分隔的关键词，默认 ' + ','.join(engine.KEYWORDS))
+    p.add_argument('--keywords-file', help='关键词文件，每行一个，优先于 --keywords')
+    p.add_argument('--no-prefilter', dest='prefilter', action='store_false', help='不做关键词预筛')
+    p.add_argument('--format', choices=writer.FORMATS + columnar.FORMATS, default='json', help='输出格式')
+    p.set_defaults(func=run_revise)
+
+
+def add_manifest_arguments(p):
+    p.add_argument('input', help='PDF 所在文件夹')
+    p.add_argument('manifest', help='清单文件（JSON）')
+    p.add_argument('-j', '--workers', type=int, default=0, help='统计页数的进程数，0 表示 CPU 核心数')
+    p.set_defaults(func=run_manifest)
+
+
+def add_shard_arguments(p):
+    from . import cache
+    p.add_argument('manifest', help='manifest 命令生成的清单')
+    p.add_argument('output', help='输出文件夹，本片的中间结果写在其中的 shards/<i>-of-<n> 下')
+    p.add_argument('--shard', type=shard_arg, required=True, metavar='I/N', help='分片序号和分片数，例如 1/3')
+    p.add_argument('--root', help='本机上 PDF 所在的文件夹，默认使用清单中的路径')
+    p.add_argument('--keywords', help='逗号分隔的关键词，默认 ' + ','.join(engine.KEYWORDS))
+    p.add_argument('--keywords-file', help='关键词文件，每行一个，优先于 --keywords')
+    p.add_argument('--no-prefilter', dest='prefilter', action='store_false', help='不做关键词预筛')
+    p.add_argument('--cache', nargs='?', const=cache.DEFAULT_DIR,
+                   help=f'使用结果缓存，可指定缓存目录，默认 {cache.DEFAULT_DIR}')
+    p.add_argument('--cache-size', type=int, default=cache.DEFAULT_MAX_BYTES // 1024 // 1024,
+                   help='缓存容量上限（MB）')
+    p.set_defaults(func=run_shard)
+
+
+def add_merge_arguments(p):
+    from . import columnar, writer
+    p.add_argument('manifest', help='manifest 命令生成的清单')
+    p.add_argument('output', help='输出文件夹，各片结果在其中的 shards 下')
+    p.add_argument('--format', choices=writer.FORMATS + columnar.FORMATS, default='json', help='输出格式')
+    p.set_defaults(func=run_merge)
+
+
+def add_cache_arguments(p):
+    from . import cache
+    p.add_argument('--cache', default=cache.DEFAULT_DIR, help='缓存目录')
+    p.add_argument('--clear', action='store_true', help='清空缓存')
+    p.set_defaults(func=run_cache)
+
+
+# 子命令 -> (添加参数的函数, 帮助)
+COMMANDS = {
+    'extract': (add_extract_arguments, '提取文件夹中的全部 PDF'),
+    'watch': (add_watch_arguments, '监视文件夹，持续提取新放入或修改过的 PDF'),
+    'serve': (add_serve_arguments, '启动常驻的本地提取服务'),
+    'images': (add_images_arguments, '将 PDF 中的表格导出为图片'),
+    'index': (add_index_arguments, '把 PDF 或提取结果加入费用项索引'),
+    'query': (add_query_arguments, '在费用项索引中查询'),
+    'revise': (add_revise_arguments, '增量提取修订版文档，只重新提取内容有变化的页，并列出记录的变化'),
+    'manifest': (add_manifest_arguments, '生成分片提取用的清单，记录每个 PDF 的大小和页数'),
+    'shard': (add_shard_arguments, '按清单提取其中一片，各片页数接近，可在多台机器上分别运行，'
+                                   '一台机器上可同时运行多片'),
+    'merge': (add_merge_arguments, '把各片的结果按清单顺序合并到输出文件夹'),
+    'cache': (add_cache_arguments, '查看或清空结果缓存'),
+}
+
+
+def build_parser(command=None):
+    """ command 指定时只为该子命令添加参数，其余子命令只有名称和帮助，不导入它们用到的模块 """
+    parser = argparse.ArgumentParser(prog='fundtable', description='从 PDF 文档中批量提取基金费用表格')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (add_arguments, help_text) in COMMANDS.items():
+        p = subparsers.add_parser(name, help=help_text)
+        if command is None or name == command:
+            add_arguments(p)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    command = next((arg for arg in argv if not arg.startswith('-')), None)
+    args = build_parser(command if command in COMMANDS else None).parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,174 @@
+# coding:utf-8
+"""
+列式结果模型
+
+JSON 结果中每条记录是 {行名: {列名: 值}}，列名在每条记录里重复出现。这里把
+结果拆成一张长表，每个单元格一行：
+
+    page    页码下标
+    record  记录在文档中的序号
+    row     行名
+    column  列名
+    value   单元格的值（原始文字），合并单元格为 null
+    number  值能解析为单个数字（费率、金额、百分比）时的数值，否则为 null
+    unit    number 的单位（%、‰、元、份，万和亿已折算进数值），见 search.parse_value
+
+行名、列名、值和单位都驻留在同一个字符串池中，各列只保存整数编号，内存占用远小于
+嵌套的 dict；同一个值只解析一次。可以导出 CSV，安装了 pyarrow 时还可以导出
+Arrow IPC / Parquet（number 为 float64，其余文字列为字典编码），Arrow 文件能直接内存映射读取。
+
+JSON 输出沿用原来的 str(value)，合并单元格写成字符串 "None"；转换为列式时还原为 null。
+"""
+import csv
+import math
+from array import array
+
+from .search import parse_value
+
+
+FORMATS = ('csv', 'arrow', 'parquet')
+COLUMNS = ('page', 'record', 'row', 'column', 'value', 'number', 'unit')
+NULL = -1
+
+
+class ColumnarTable:
+    """ 一个文档的提取结果 """
+
+    def __init__(self):
+        self.strings = []
+        self._codes = {}
+        self.page = array('i')
+        self.record = array('i')
+        self.row = array('i')
+        self.column = array('i')
+        self.value = array('i')
+        self.number = array('d')  # 不是数字时为 NaN
+        self.unit = array('i')
+        self.records = 0
+        self._parsed = {}  # 值的编号 -> (数值, 单位编号)
+
+    def intern(self, text):
+        if text is None:
+            return NULL
+        code = self._codes.get(text)
+        if code is None:
+            code = self._codes[text] = len(self.strings)
+            self.strings.append(text)
+        return code
+
+    def text(self, code):
+        return None if code == NULL else self.strings[code]
+
+    def parse(self, code):
+        """ 解析值的编号对应的文字，返回 (数值或 NaN, 单位编号) """
+        parsed = self._parsed.get(code)
+        if parsed is None:
+            number, unit = parse_value(self.text(code))
+            parsed = self._parsed[code] = (math.nan if number is None else number, self.intern(unit))
+        return parsed
+
+    def append_page(self, index, records):
+        """ 追加一页的记录（engine 输出的 dict 格式） """
+        for record in records:
+            for row_name, cells in record.items():
+                row_code = self.intern(row_name)
+                # 只有行名、没有数据列的记录也占一行，列名和值为 null
+                for key, value in cells.items() or [(None, None)]:
+                    self.page.append(index)
+                    self.record.append(self.records)
+                    self.row.append(row_code)
+                    self.column.append(self.intern(key))
+                    value_code = self.intern(None if value == 'None' else value)
+                    number, unit_code = self.parse(value_code)
+                    self.value.append(value_code)
+                    self.number.append(number)
+                    self.unit.append(unit_code)
+            self.records += 1
+
+    @classmethod
+    def from_pages(cls, pages):
+        """ pages 为 (页码下标, 记录列表) 的序列 """
+        table = cls()
+        for index, records in pages:
+            table.append_page(index, records)
+        return table
+
+    def __len__(self):
+        return len(self.page)
+
+    def iter_cells(self):
+        """ 依次产出 (page, record, row, column, value, number, unit)，不是数字时 number 为 None """
+        text = self.text
+        for i in range(len(self.page)):
+            number = self.number[i]
+            yield (self.page[i], self.record[i], text(self.row[i]), text(self.column[i]), text(self.value[i]),
+                   None if math.isnan(number) else number, text(self.unit[i]))
+
+    def to_records(self):
+        """ 还原为 engine 输出的 dict 格式，与 JSON 结果一致 """
+        result = []
+        current = None
+        for _, record, row_name, key, value, _, _ in self.iter_cells():
+            if record != current:
+                current = record
+                cells = {}
+                result.append({row_name: cells})
+            if key is not None:
+                cells[key] = str(value)
+        return result
+
+    def to_csv(self, path):
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            out = csv.writer(f)
+            out.writerow(COLUMNS)
+            out.writerows(self.iter_cells())
+
+    def to_arrow(self):
+        """ 转换为 pyarrow.Table，行名、列名、值和单位使用字典编码，数值为 float64 """
+        pa = import_pyarrow()
+        dictionary = pa.array(self.strings, type=pa.string())
+
+        def encoded(codes):
+            indices = pa.array(codes, type=pa.int32(), mask=pa.array([c == NULL for c in codes]))
+            return pa.DictionaryArray.from_arrays(indices, dictionary)
+
+        return pa.table({
+            'page': pa.array(self.page, type=pa.int32()),
+            'record': pa.array(self.record, type=pa.int32()),
+            'row': encoded(self.row),
+            'column': encoded(self.column),
+            'value': encoded(self.value),
+            'number': pa.array(self.number, type=pa.float64(), mask=pa.array([math.isnan(n) for n in self.number])),
+            'unit': encoded(self.unit),
+        })
+
+    def save(self, path, format='csv'):
+        if format == 'csv':
+            self.to_csv(path)
+        elif format == 'arrow':
+            pa = import_pyarrow()
+            table = self.to_arrow()
+            with pa.OSFile(str(path), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as out:
+                    out.write_table(table)
+        elif format == 'parquet':
+            import_pyarrow()
+            import pyarrow.parquet as pq
+            pq.write_table(self.to_arrow(), str(path))
+        else:
+            raise ValueError(f'不支持的列式格式: {format}')
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise RuntimeError('导出 Arrow / Parquet 需要安装 pyarrow：pip install pyarrow') from None
+    return pyarrow
+
+
+def read_arrow(path):
+    """ 以内存映射方式打开 Arrow IPC 文件，返回 pyarrow.Table，不需要解析整个文件 """
+    pa = import_pyarrow()
+    return pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
@@ -0,0 +1,209 @@
+# coding:utf-8
+"""
+表格提取引擎
+
+从 myapp.py 的 SettingAppInterface.start_execution 中拆分出来，不依赖 Qt，
+GUI 与命令行共用同一套逻辑。
+"""
+import json
+import re
+
+import pdfplumber
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import LIT
+
+from . import lattice
+from .header import header_depth, resolve_header
+from .matcher import compile_keywords
+from .metrics import NULL_METRICS
+
+
+# 默认关注的费用关键词
+KEYWORDS = ['申购', '赎回', '认购', '管理']
+
+# 内容流中构造路径的操作符，框线、矩形和曲线都由它们画出
+PATH_OPERATORS = {b're', b'l', b'c', b'v', b'y'}
+LITERAL_STRING = re.compile(rb'\((?:\\.|[^\\)])*\)', re.S)
+TOKEN_SEPARATOR = re.compile(rb'[\s\[\]<>{}/]+')
+
+# 表头与行处理逻辑的版本号，修改 process_tables 的输出时需要加一，使缓存失效
+HEADER_VERSION = 2
+
+
+def process_rows(rows, keys, keywords):
+    """ 按关键词筛选数据行，每行输出 {行名: {列名: 值}}，keys 已由 resolve_header 规整 """
+    matcher = compile_keywords(keywords)
+    result = []
+    for row in rows:
+        if row[0] and matcher.search(row[0]):
+            # 空字符串保持原样，None 按原来的 str(value) 输出为 "None"
+            temp = {key: value.replace("\n", " ") if value else str(value) for key, value in zip(keys, row[1:])}
+            # 改为 temp[keys[0]] 可以实现赛题示例的那个效果
+            result.append({row[0].replace("\n", " "): temp})
+    return result
+
+
+def process_tables(tables, keywords=KEYWORDS):
+    """ 处理一页上 extract_tables() 得到的全部表格，简单表格即表头只有一层的情况 """
+    result = []
+    for table in tables:
+        if table:
+            keys, depth = resolve_header(table)
+            result.extend(process_rows(table[depth:], keys, keywords))
+    return result
+
+
+def stream_has_paths(page):
+    """
+    在版面分析之前扫描页面的原始内容流（以及引用的表单 XObject），是否可能画了线条或矩形
+
+    只做分词，不解释内容流，远快于 pdfminer 的版面分析。字符串和内联图片中的同名字节
+    只会让结果偏向 True（之后仍按 page_has_ruling 判断），不会漏掉真正的路径。
+    """
+    pending = list(page.page_obj.contents or ())
+    resources = [page.page_obj.resources or {}]
+    seen = set()
+    while pending or resources:
+        while resources:
+            xobjects = resolve1(resolve1(resources.pop()).get('XObject')) or {}
+            for ref in xobjects.values():
+                xobject = resolve1(ref)
+                key = getattr(ref, 'objid', id(xobject))
+                if key in seen or resolve1(xobject.get('Subtype')) is not LIT('Form'):
+                    continue
+                seen.add(key)
+                pending.append(xobject)
+                resources.append(xobject.get('Resources') or {})
+        if not pending:
+            break
+        data = resolve1(pending.pop()).get_data() or b''
+        if PATH_OPERATORS.intersection(TOKEN_SEPARATOR.split(LITERAL_STRING.sub(b' ', data))):
+            return True
+    return False
+
+
+def page_has_ruling(page):
+    """ 默认的 lines 策略只从线条和矩形中识别表格，没有任何框线的页不可能有表格，与关键词无关 """
+    return bool(page.lines or page.rects or page.curves)
+
+
+def page_mentions(page, keywords=KEYWORDS):
+    """
+    页面字符流中是否出现某个关键词
+
+    字符按内容流中的顺序拼接，大多数 PDF 按阅读顺序输出一行文字，单元格内的关键词
+    在字符流中也是相邻的；但 PDF 并不保证这一点，这只是启发式判断。
+    """
+    return bool(compile_keywords(keywords).search(''.join(char['text'] for char in page.chars)))
+
+
+def page_may_match(page, keywords=KEYWORDS):
+    """
+    表格识别前的廉价预筛，返回 False 的页跳过表格识别：要求页面有框线且出现某个关键词
+
+    框线的判断是确定的；关键词的判断是启发式的（见 page_mentions），文字顺序异常的 PDF
+    可能被误跳过，此时关闭预筛（命令行 --no-prefilter）即可，缓存按预筛设置分开保存。
+    """
+    return page_has_ruling(page) and page_mentions(page, keywords)
+
+
+def process_page_tables(tables, keywords=KEYWORDS, metrics=NULL_METRICS):
+    """ 与 process_tables 相同，另外统计表格数和数据行的保留、丢弃数 """
+    if metrics.enabled:
+        rows = sum(len(table) - header_depth(table) for table in tables if table)
+    with metrics.stage('process'):
+        records = process_tables(tables, keywords)
+    if metrics.enabled:
+        metrics.count('tables', len(tables))
+        metrics.count('rows_kept', len(records))
+        metrics.count('rows_dropped', rows - len(records))
+    return records
+
+
+def extract_page(page, keywords=KEYWORDS, prefilter=True, metrics=None, table_settings=None):
+    """ 提取单页的记录，table_settings 为 extract_tables 的表格识别设置 """
+    metrics = metrics or NULL_METRICS
+    if prefilter:
+        # 内容流中没有任何路径时连版面分析也不做
+        with metrics.stage('prefilter'):
+            skip = not stream_has_paths(page)
+        if skip:
+            metrics.count('skipped_pages', 1)
+            return []
+    # 第一次访问页面对象时 pdfminer 才解释内容流，单独计时，不算在预筛或表格识别里
+    with metrics.stage('parse'):
+        page.objects
+    if prefilter:
+        with metrics.stage('prefilter'):
+            skip = not page_may_match(page, keywords)
+        if skip:
+            metrics.count('skipped_pages', 1)
+            return []
+    with metrics.stage('extract_tables'):
+        tables = lattice.extract_tables(page, table_settings)
+    return process_page_tables(tables, keywords, metrics)
+
+
+def iter_pages(path, keywords=KEYWORDS, start=0, stop=None, cache=None, prefilter=True, metrics=None,
+               memory=None, table_settings=None):
+    """
+    逐页提取，依次产出 (页码下标, 总页数, 该页记录)，便于汇报进度或中途取消
+
+    传入 cache（fundtable.cache.ResultCache）时优先使用缓存的结果。
+    prefilter 为 True 时跳过预筛判定不含关键词的页，见 page_may_match。
+    metrics（fundtable.metrics.Metrics）用于记录各阶段耗时和计数。
+    memory（fundtable.memory.MemoryGuard）开启低内存模式并检查内存上限。
+    table_settings 为表格识别设置，缓存中是默认设置的结果，指定时不使用缓存。
+
+    每页处理完立即释放该页的缓存，否则 pdfplumber 会保留所有访问过的页的字符和
+    版面分析结果，直到文档关闭，长文档的内存占用随页数线性增长。
+    """
+    metrics = metrics or NULL_METRICS
+    metrics.start_document(path)
+    try:
+        if cache is not None and table_settings is None:
+            yield from cache.iter_pages(path, keywords, start, stop, prefilter, metrics, memory)
+            return
+        with metrics.stage('open'):
+            pdf = pdfplumber.open(path)
+            total = len(pdf.pages)
+        with pdf:
+            for index in range(start, total if stop is None else min(stop, total)):
+                metrics.start_page(index)
+                page = pdf.pages[index]
+                records = extract_page(page, keywords, prefilter, metrics, table_settings)
+                page.close()
+                if memory is not None:
+                    memory.after_page(pdf)
+                metrics.end_page()
+                yield index, total, records
+    finally:
+        metrics.end_document()
+
+
+def extract(path, keywords=KEYWORDS, cache=None, prefilter=True, metrics=None, memory=None):
+    """ 提取 PDF 中包含关键词的表格行 """
+    result = []
+    for _, _, records in iter_pages(path, keywords, cache=cache, prefilter=prefilter, metrics=metrics,
+                                    memory=memory):
+        result.extend(records)
+    return result
+
+
+def page_count(path):
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_page_range(path, start, stop, keywords=KEYWORDS, cache=None, prefilter=True, memory=None):
+    """ 提取 [start, stop) 页，返回每页的记录列表 """
+    return [records for _, _, records in iter_pages(path, keywords, start, stop, cache, prefilter, memory=memory)]
+
+
+def dumps(result):
+    return json.dumps(result, ensure_ascii=False, indent=2)
+
+
+def save(result, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(dumps(result))
@@ -0,0 +1,58 @@
+# coding:utf-8
+"""
+多层表头解析
+
+pdfplumber 把合并单元格中被合并掉的格子返回为 None。本模块把任意层数的
+表头一次性解析成列名：
+
+- 表头层数：第 2 行起连续的、首列为 None 的行都属于表头（首列纵向合并）
+- 首列中的 None 向下填充，对应行名的纵向合并
+- 表头中的 None：上一层在这一列开始新的分组时是纵向合并，沿用上一层的文字，
+  本层不再追加；否则是横向合并，沿用左边格子的文字
+- 每层文字中的换行只替换一次，列名按层顺序直接拼接，如 "A类" + "前端"
+"""
+
+
+def header_depth(table):
+    """ 表头层数 """
+    depth = 1
+    while depth < len(table) and table[depth][0] is None:
+        depth += 1
+    return depth
+
+
+def fill_down(table, column=0):
+    """ 将某一列中的 None 替换为上一行的值 """
+    for index in range(1, len(table)):
+        if table[index][column] is None:
+            table[index][column] = table[index - 1][column]
+    return table
+
+
+def resolve_header(table):
+    """ 返回 (列名列表, 表头层数)，列名不含首列 """
+    depth = header_depth(table)
+    width = len(table[0]) - 1
+    keys = [''] * width
+    # starts[j]：上一层在第 j 列开始了一个新的分组
+    starts = [True] * width
+    for level in range(depth):
+        row = table[level]
+        text = None
+        level_starts = []
+        for j in range(width):
+            cell = row[j + 1]
+            if cell is not None:
+                text = cell.replace("\n", " ")
+                level_starts.append(True)
+            elif level and starts[j] or text is None:
+                # 纵向合并：沿用上一层，本层不追加文字
+                text = ''
+                level_starts.append(True)
+            else:
+                # 横向合并：沿用左边的文字
+                level_starts.append(False)
+            keys[j] += text
+        starts = level_starts
+    fill_down(table)
+    return keys, depth
@@ -0,0 +1,166 @@
+# coding:utf-8
+"""
+表格图片导出
+
+每页只渲染一次，再从同一张位图上裁出该页的全部表格。渲染倍率可以直接指定，
+也可以由目标像素宽度或内存预算推算；多页之间用进程池并行。
+
+导出分两步：先定位每页表格的像素区域，再渲染、裁剪并编码。需要统一尺寸
+（letterbox）时，画布大小由第一步得到的全部裁剪尺寸算出，裁剪结果直接在内存中
+居中贴到画布上，每张图片只编码一次。
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+from PIL import Image
+
+from . import engine, lattice, parallel
+
+
+# 与原 extract_table_as_image 的 base = 10 一致，即 720 DPI
+DEFAULT_SCALE = 10
+# 单页位图的内存上限，按每像素 4 字节估算
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 表格边框外多保留的留白（PDF 坐标单位）
+PADDING = 1.5
+
+# 输出格式 -> (扩展名, 保存参数)；WEBP 编码更快、文件更小
+FORMATS = {
+    'PNG': ('png', {}),
+    'WEBP': ('webp', {'quality': 90, 'method': 4}),
+    'JPEG': ('jpg', {'quality': 90}),
+}
+
+
+def choose_scale(page, bboxes, scale=None, target_width=None, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    计算渲染倍率（1 倍为 72 DPI）
+
+    指定 target_width 时让该页最宽的表格裁出后达到这个像素宽度，否则使用
+    scale（默认 DEFAULT_SCALE）；两种情况都不超过 max_bytes 允许的倍率。
+    """
+    if target_width:
+        widest = max(x1 - x0 for x0, _, x1, _ in bboxes) + 2 * PADDING
+        scale = target_width / widest
+    elif scale is None:
+        scale = DEFAULT_SCALE
+    if max_bytes:
+        scale = min(scale, math.sqrt(max_bytes / 4 / (page.width * page.height)))
+    return scale
+
+
+def table_boxes(page, scale=None, target_width=None, max_bytes=DEFAULT_MAX_BYTES):
+    """ 返回 (渲染倍率, 各表格在渲染图上的像素区域)，页面没有表格时区域为空 """
+    bboxes = [table.bbox for table in lattice.find_tables(page)]
+    if not bboxes:
+        return None, []
+    scale = choose_scale(page, bboxes, scale, target_width, max_bytes)
+    left, top = page.bbox[0], page.bbox[1]
+    width, height = math.ceil(page.width * scale), math.ceil(page.height * scale)
+    boxes = []
+    for x0, y0, x1, y1 in bboxes:
+        boxes.append((
+            max(0, round((x0 - left - PADDING) * scale)),
+            max(0, round((y0 - top - PADDING) * scale)),
+            min(width, round((x1 - left + PADDING) * scale)),
+            min(height, round((y1 - top + PADDING) * scale)),
+        ))
+    return scale, boxes
+
+
+def render_tables(page, scale, boxes):
+    """ 渲染一次页面，按 boxes 的顺序返回裁剪出的 PIL.Image 列表 """
+    if not boxes:
+        return []
+    image = page.to_image(resolution=72 * scale).original
+    crops = [image.crop(box) for box in boxes]
+    image.close()
+    return crops
+
+
+def canvas_size(sizes):
+    """ 能容纳这一批图片的最小画布 """
+    sizes = list(sizes)
+    if not sizes:
+        return None
+    return max(w for w, _ in sizes), max(h for _, h in sizes)
+
+
+def letterbox(image, size, format='PNG'):
+    """ 将图片居中贴到 size 大小的画布上；JPEG 不支持透明，使用白色背景 """
+    if format == 'JPEG':
+        canvas = Image.new('RGB', size, (255, 255, 255))
+    else:
+        canvas = Image.new('RGBA', size, (0, 0, 0, 0))
+    canvas.paste(image, ((size[0] - image.width) // 2, (size[1] - image.height) // 2))
+    return canvas
+
+
+def save_image(image, path, format='PNG'):
+    if format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(path, format=format, **FORMATS[format][1])
+
+
+def image_name(page_index, table_index, format='PNG'):
+    return f'table_page_{page_index + 1}_table_{table_index + 1}.{FORMATS[format][0]}'
+
+
+def locate_page_range(path, start, stop, scale=None, target_width=None, max_bytes=DEFAULT_MAX_BYTES):
+    """ 第一步：定位 [start, stop) 页的表格，返回 [(页码下标, 倍率, 像素区域列表)] """
+    layouts = []
+    with pdfplumber.open(path) as pdf:
+        for index in range(start, stop):
+            page_scale, boxes = table_boxes(pdf.pages[index], scale, target_width, max_bytes)
+            if boxes:
+                layouts.append((index, page_scale, boxes))
+    return layouts
+
+
+def export_page_range(path, out_dir, layouts, canvas=None, format='PNG'):
+    """ 第二步：渲染并写出 layouts 中各页的表格图片，返回文件路径 """
+    written = []
+    with pdfplumber.open(path) as pdf:
+        for index, scale, boxes in layouts:
+            for table_index, crop in enumerate(render_tables(pdf.pages[index], scale, boxes)):
+                if canvas:
+                    crop = letterbox(crop, canvas, format)
+                out_path = os.path.join(out_dir, image_name(index, table_index, format))
+                save_image(crop, out_path, format)
+                written.append(out_path)
+    return written
+
+
+def export_tables(path, out_dir, workers=None, scale=None, target_width=None, max_bytes=DEFAULT_MAX_BYTES,
+                  pages_per_task=parallel.PAGES_PER_TASK, letterboxed=False, format='PNG'):
+    """
+    导出 PDF 中全部表格的图片，按页码和表格顺序返回文件路径
+
+    letterboxed 为 True 时所有图片居中放在同一尺寸的画布上，画布取这一批裁剪的最大宽高。
+    """
+    if format not in FORMATS:
+        raise ValueError(f'不支持的图片格式: {format}')
+    os.makedirs(out_dir, exist_ok=True)
+    ranges = parallel.split_ranges(engine.page_count(path), pages_per_task)
+    executor = None if workers == 1 else ProcessPoolExecutor(max_workers=workers or parallel.default_workers())
+
+    def run(func, tasks):
+        if executor is None:
+            return [func(*task) for task in tasks]
+        return [future.result() for future in [executor.submit(func, *task) for task in tasks]]
+
+    try:
+        located = run(locate_page_range, [(path, start, stop, scale, target_width, max_bytes)
+                                          for start, stop in ranges])
+        canvas = None
+        if letterboxed:
+            canvas = canvas_size((x1 - x0, y1 - y0) for layouts in located
+                                 for _, _, boxes in layouts for x0, y0, x1, y1 in boxes)
+        results = run(export_page_range, [(path, out_dir, layouts, canvas, format)
+                                          for layouts in located if layouts])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return [out_path for written in results for out_path in written]
@@ -0,0 +1,193 @@
+# coding:utf-8
+"""
+在隔离的子进程中提取，限制时间和内存
+
+个别畸形或超大的 PDF 会让 extract_tables 在一页上卡住几分钟，甚至让进程崩溃，
+整批任务和界面都被它拖住。这里每个文档在单独的子进程中逐页提取，父进程逐页接收
+结果并检查限制：
+
+- 单页超过 page_timeout 秒、子进程常驻内存超过 max_rss、页内出错或子进程崩溃时，
+  结束子进程，该页用更省事的识别设置（RETRY_SETTINGS）在新的子进程中重试一次，
+  仍然失败则该页记为空，再从下一页起启动新的子进程继续
+- 整个文档超过 timeout 秒时结束子进程，剩余各页记为空
+
+失败的页通过 on_error 回调得到一条错误记录，结果文件仍然完整，只是缺少这些页的记录。
+"""
+import math
+import multiprocessing
+import time
+
+from . import engine, memory
+from .metrics import NULL_METRICS, Metrics
+
+
+# 重试时的表格识别设置：忽略短于 12pt 的线段。畸形页面通常是由成千上万条细碎的
+# 曲线、短线构成的图形，交点数随线段数平方增长；费用表的框线都远长于此
+RETRY_SETTINGS = {'edge_min_length': 12}
+
+# 父进程检查超时、内存和取消的间隔（秒）
+POLL_INTERVAL = 0.1
+
+# 错误记录的汇总文件名，与结果文件放在同一文件夹
+ERRORS_NAME = 'errors.json'
+
+
+def default_context():
+    """
+    默认用 forkserver 启动子进程：预先导入 pdfplumber 后每个子进程只需约 10ms，
+    在多线程的进程中也能安全使用；不支持时（Windows）用 spawn
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['fundtable.engine'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _run(conn, path, keywords, start, total, cache, prefilter, table_settings, guard, stop, with_metrics):
+    """ 子进程：逐页提取 [start, stop) 并把结果发给父进程 """
+    try:
+        if total is None:
+            total = cache.page_count(path) if cache is not None else engine.page_count(path)
+            conn.send(('open', total))
+        pages = []
+        metrics = Metrics([lambda event, data: pages.append(data) if event == 'page' else None]) \
+            if with_metrics else None
+        for index, _, records in engine.iter_pages(path, keywords, start, stop, cache, prefilter, metrics, guard,
+                                                   table_settings):
+            conn.send(('page', index, records, pages.pop() if pages else None))
+        conn.send(('done',))
+    except Exception as e:
+        conn.send(('failed', str(e) or type(e).__name__))
+    finally:
+        conn.close()
+
+
+class IsolatedExtractor:
+    """
+    逐个文档在子进程中提取
+
+    timeout 为每个文档的时间上限（秒），page_timeout 为每页的时间上限，max_rss 为子进程的
+    常驻内存上限（字节），均为 None 时不限制。retry_settings 为 None 时失败的页不重试。
+    在多线程程序（例如 GUI）中可以传入 mp_context=multiprocessing.get_context('spawn')。
+    """
+
+    def __init__(self, timeout=None, page_timeout=None, max_rss=None, retry_settings=RETRY_SETTINGS,
+                 mp_context=None):
+        self.timeout = timeout
+        self.page_timeout = page_timeout
+        self.max_rss = max_rss
+        self.retry_settings = retry_settings
+        self.context = mp_context or default_context()
+
+    def _start(self, *args):
+        receiver, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(target=_run, args=(sender,) + args, daemon=True)
+        process.start()
+        sender.close()
+        return process, receiver
+
+    @staticmethod
+    def _stop(process, receiver):
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    def _receive(self, process, receiver, deadline, should_stop):
+        """ 等待子进程的下一条消息，超出限制、子进程退出或取消时返回对应的 ('failed', 原因) 等消息 """
+        page_deadline = time.monotonic() + self.page_timeout if self.page_timeout else math.inf
+        while True:
+            if should_stop is not None and should_stop():
+                return 'cancelled',
+            wait = min(page_deadline, deadline) - time.monotonic()
+            if receiver.poll(max(0, min(POLL_INTERVAL, wait))):
+                try:
+                    return receiver.recv()
+                except EOFError:
+                    process.join()
+                    return 'failed', f'工作进程异常退出（退出码 {process.exitcode}）'
+            now = time.monotonic()
+            if now >= deadline:
+                return 'timeout',
+            if now >= page_deadline:
+                return 'failed', f'单页超过 {self.page_timeout:g} 秒'
+            if self.max_rss:
+                current = memory.rss(process.pid)
+                if current is not None and current > self.max_rss:
+                    return 'failed', f'内存占用 {current / memory.MB:.0f}MB 超过上限 {self.max_rss / memory.MB:.0f}MB'
+
+    def _retry(self, path, keywords, index, total, prefilter, guard, deadline, should_stop):
+        """ 用 retry_settings 在新的子进程中重新提取一页，返回记录列表，失败时返回 None """
+        process, receiver = self._start(path, keywords, index, total, None, prefilter, self.retry_settings, guard,
+                                        index + 1, False)
+        try:
+            message = self._receive(process, receiver, deadline, should_stop)
+            return message[2] if message[0] == 'page' else None
+        finally:
+            self._stop(process, receiver)
+
+    def iter_pages(self, path, keywords=engine.KEYWORDS, cache=None, prefilter=True, metrics=None, guard=None,
+                   on_error=None, should_stop=None):
+        """
+        与 engine.iter_pages 相同，逐页产出 (页码下标, 总页数, 该页记录)，失败的页记录为空
+
+        on_error(错误 dict) 在页失败时调用，dict 含 path、start、stop（失败的页码区间，
+        不含 stop）、error 和 recovered（重试是否成功，成功时该页有记录）。
+        should_stop() 返回 True 时结束子进程并停止产出。guard（memory.MemoryGuard）传给
+        子进程，开启低内存模式。打不开的文档直接抛出异常。
+        """
+        metrics = metrics or NULL_METRICS
+        deadline = time.monotonic() + self.timeout if self.timeout else math.inf
+
+        def report(start, stop, error, recovered=False):
+            if on_error is not None:
+                on_error({'path': str(path), 'start': start, 'stop': stop, 'error': error, 'recovered': recovered})
+
+        metrics.start_document(path)
+        try:
+            index = 0
+            total = None
+            while total is None or index < total:
+                process, receiver = self._start(path, keywords, index, total, cache, prefilter, None, guard, None,
+                                                metrics.enabled)
+                try:
+                    while True:
+                        message = self._receive(process, receiver, deadline, should_stop)
+                        if message[0] == 'open':
+                            total = message[1]
+                        elif message[0] == 'page':
+                            _, index, records, page = message
+                            if page is not None:
+                                metrics.add_page(page)
+                            yield index, total, records
+                            index += 1
+                        elif message[0] == 'done':
+                            index = total
+                            break
+                        elif message[0] == 'cancelled':
+                            return
+                        else:
+                            break
+                finally:
+                    self._stop(process, receiver)
+                if message[0] == 'done':
+                    break
+                if total is None:
+                    raise RuntimeError('超时' if message[0] == 'timeout' else message[1])
+                if message[0] == 'timeout':
+                    report(index, total, f'文档超过 {self.timeout:g} 秒')
+                    for rest in range(index, total):
+                        yield rest, total, []
+                    return
+                # 这一页失败，重试后继续下一页
+                records = None
+                if self.retry_settings is not None:
+                    records = self._retry(path, keywords, index, total, prefilter, guard, deadline, should_stop)
+                    if should_stop is not None and should_stop():
+                        return
+                report(index, index + 1, message[1], records is not None)
+                yield index, total, records or []
+                index += 1
+        finally:
+            metrics.end_document()
@@ -0,0 +1,180 @@
+# coding:utf-8
+"""
+有框线表格的快速识别
+
+基金费用表几乎都是框线完整的网格，page.extract_tables() 的默认（lines）策略中
+最慢的两步是：
+
+- intersections_to_cells：对每个交点在其余全部交点中查找正下方和正右方的点，
+  并反复把相交的线段转换成集合比较，交点数的平方级
+- Table.extract：每一行扫描整页字符，每个格子再扫描该行字符，再对每个格子做
+  通用的分行、分词
+
+这里沿用 pdfplumber 的线段合并、交点和分表逻辑，只替换这几步：交点按所在的列、
+行分组，线段集合每个交点只算一次；字符按中点用二分查找落到网格的格子里，
+每个字符 O(log 格子数)；只有一行一个词的格子（费率表中的绝大多数）直接拼接字符。
+判定条件与 pdfplumber 完全相同，输出逐字节一致。
+页面上没有可用的框线时直接返回空列表（默认策略同样找不到表格）；pdfplumber
+内部接口不可用时退回 page.extract_tables()。
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from operator import itemgetter
+
+try:
+    from pdfplumber import utils
+    from pdfplumber.table import Table, TableFinder, TableSettings, cells_to_tables, edges_to_intersections
+    from pdfplumber.utils.text import DEFAULT_X_TOLERANCE, DEFAULT_Y_TOLERANCE, LIGATURES
+except ImportError:  # pdfplumber 版本不兼容时只使用默认实现
+    TableFinder = None
+
+# 快速拼接文字时允许的 extract_text 参数，其余参数一律走 utils.extract_text
+SIMPLE_TEXT_SETTINGS = {'x_tolerance', 'y_tolerance'}
+
+
+def find_cells(intersections):
+    """ 与 pdfplumber.table.intersections_to_cells 相同：每个交点右下方最小的格子 """
+    v_sets = {}
+    h_sets = {}
+    columns = defaultdict(list)
+    rows = defaultdict(list)
+    # 按 (x, y) 排序后，同一列的点按 y 递增，同一行的点按 x 递增
+    for point in sorted(intersections):
+        v_sets[point] = set(map(utils.obj_to_bbox, intersections[point]['v']))
+        h_sets[point] = set(map(utils.obj_to_bbox, intersections[point]['h']))
+        columns[point[0]].append(point)
+        rows[point[1]].append(point)
+    column_index = {point: i for points in columns.values() for i, point in enumerate(points)}
+    row_index = {point: i for points in rows.values() for i, point in enumerate(points)}
+
+    cells = []
+    for point in sorted(intersections):
+        x, y = point
+        below = columns[x][column_index[point] + 1:]
+        # 右侧与当前点有同一条横线相连的点，顺序与原实现的内层循环一致
+        right = [p for p in rows[y][row_index[point] + 1:] if not h_sets[point].isdisjoint(h_sets[p])]
+        if not right:
+            continue
+        cell = None
+        for below_point in below:
+            if v_sets[point].isdisjoint(v_sets[below_point]):
+                continue
+            for right_point in right:
+                corner = (right_point[0], below_point[1])
+                if (corner in intersections and not v_sets[corner].isdisjoint(v_sets[right_point])
+                        and not h_sets[corner].isdisjoint(h_sets[below_point])):
+                    cell = (x, y, corner[0], corner[1])
+                    break
+            if cell is not None:
+                break
+        if cell is not None:
+            cells.append(cell)
+    return cells
+
+
+class LatticeFinder(TableFinder or object):
+    """ 与 pdfplumber.table.TableFinder 相同，格子查找换成 find_cells """
+
+    def __init__(self, page, settings=None):
+        self.page = page
+        self.settings = TableSettings.resolve(settings)
+        self.edges = self.get_edges()
+        self.intersections = edges_to_intersections(
+            self.edges, self.settings.intersection_x_tolerance, self.settings.intersection_y_tolerance)
+        self.cells = find_cells(self.intersections)
+        self.tables = [Table(self.page, group) for group in cells_to_tables(self.cells)]
+
+
+def assign_chars(cells, chars):
+    """
+    按字符中点把字符分到格子里，返回与 cells 对应的字符列表，保持字符在页面中的顺序
+
+    判定与 Table.extract 相同：中点 x 在 [x0, x1)、y 在 [top, bottom) 内。格子的边
+    把表格切成网格，先用二分查找定位中点所在的网格，再查这一网格属于哪些格子。
+    """
+    xs = sorted({cell[0] for cell in cells} | {cell[2] for cell in cells})
+    ys = sorted({cell[1] for cell in cells} | {cell[3] for cell in cells})
+    x_slot = {x: i for i, x in enumerate(xs)}
+    y_slot = {y: i for i, y in enumerate(ys)}
+    owners = defaultdict(list)
+    for number, (x0, top, x1, bottom) in enumerate(cells):
+        for i in range(x_slot[x0], x_slot[x1]):
+            for j in range(y_slot[top], y_slot[bottom]):
+                owners[i, j].append(number)
+
+    left, right, upper, lower = xs[0], xs[-1], ys[0], ys[-1]
+    buckets = [[] for _ in cells]
+    for char in chars:
+        h_mid = (char['x0'] + char['x1']) / 2
+        v_mid = (char['top'] + char['bottom']) / 2
+        if not (left <= h_mid < right and upper <= v_mid < lower):
+            continue
+        for number in owners.get((bisect_right(xs, h_mid) - 1, bisect_right(ys, v_mid) - 1), ()):
+            buckets[number].append(char)
+    return buckets
+
+
+def cell_text(chars, **kwargs):
+    """
+    与 utils.extract_text 相同
+
+    字符都是正向、非空白，顶边相差不超过 y_tolerance（只有一行），按 x0 排序后相邻
+    字符的间距都不超过 x_tolerance（只有一个词）时，结果就是按 x0 排序后的字符拼接。
+    """
+    if kwargs.keys() <= SIMPLE_TEXT_SETTINGS:
+        x_tolerance = kwargs.get('x_tolerance', DEFAULT_X_TOLERANCE)
+        y_tolerance = kwargs.get('y_tolerance', DEFAULT_Y_TOLERANCE)
+        tops = [char['top'] for char in chars]
+        if max(tops) - min(tops) <= y_tolerance and \
+                all(char['upright'] and char['text'] and not char['text'].isspace() for char in chars):
+            ordered = sorted(chars, key=itemgetter('x0'))
+            if all(curr['x0'] <= prev['x1'] + x_tolerance for prev, curr in zip(ordered, ordered[1:])):
+                return ''.join(LIGATURES.get(char['text'], char['text']) for char in ordered)
+    return utils.extract_text(chars, **kwargs)
+
+
+def extract_table(table, **kwargs):
+    """ 与 Table.extract 相同 """
+    rows = table.rows
+    cells = [cell for row in rows for cell in row.cells if cell is not None]
+    if not cells:
+        return [[None] * len(row.cells) for row in rows]
+    buckets = dict(zip(cells, assign_chars(cells, table.page.chars)))
+    result = []
+    for row in rows:
+        values = []
+        for cell in row.cells:
+            if cell is None:
+                values.append(None)
+                continue
+            cell_chars = buckets[cell]
+            if not cell_chars:
+                values.append('')
+                continue
+            if 'layout' in kwargs:
+                kwargs['layout_width'] = cell[2] - cell[0]
+                kwargs['layout_height'] = cell[3] - cell[1]
+                kwargs['layout_bbox'] = cell
+            values.append(cell_text(cell_chars, **kwargs))
+        result.append(values)
+    return result
+
+
+def find_tables(page, settings=None):
+    """ 与 page.find_tables() 相同 """
+    if TableFinder is None:
+        return page.find_tables(settings)
+    return LatticeFinder(page, settings).tables
+
+
+def extract_tables(page, settings=None):
+    """ 与 page.extract_tables() 相同 """
+    if TableFinder is None:
+        return page.extract_tables(settings)
+    settings = TableSettings.resolve(settings)
+    if not (page.lines or page.rects or page.curves) and settings.vertical_strategy != 'text' \
+            and settings.horizontal_strategy != 'text' and not settings.explicit_vertical_lines \
+            and not settings.explicit_horizontal_lines:
+        # 没有任何框线，找不到网格
+        return []
+    return [extract_table(table, **(settings.text_settings or {})) for table in LatticeFinder(page, settings).tables]
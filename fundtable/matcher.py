@@ -0,0 +1,92 @@
+# coding:utf-8
+"""
+多关键词匹配
+
+用 Aho-Corasick 自动机把全部关键词编译成一个状态机，对文本只扫描一遍，
+耗时与关键词数量无关，适合数百个费用术语的配置。
+"""
+from collections import deque
+from functools import lru_cache
+
+
+class KeywordMatcher:
+    """ 编译后的关键词集合 """
+
+    def __init__(self, keywords):
+        self.keywords = [k for k in keywords if k]
+        # goto[state][char] -> state；output[state] 为在该状态结束的关键词
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for keyword in self.keywords:
+            self._add(keyword)
+        self._build()
+
+    def _add(self, keyword):
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(keyword)
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def _scan(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                yield output[state]
+
+    def search(self, text):
+        """ text 中是否出现任一关键词 """
+        for _ in self._scan(text):
+            return True
+        return False
+
+    def findall(self, text):
+        """ 按出现顺序返回 text 中匹配到的关键词（可重叠） """
+        found = []
+        for keywords in self._scan(text):
+            found.extend(keywords)
+        return found
+
+
+@lru_cache(maxsize=32)
+def _compile(keywords):
+    return KeywordMatcher(keywords)
+
+
+def compile_keywords(keywords):
+    """ 相同关键词列表只编译一次 """
+    return _compile(tuple(keywords))
+
+
+def load_keywords(path):
+    """ 从文本文件读取关键词，每行一个，忽略空行和 # 开头的注释 """
+    keywords = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                keywords.append(line)
+    return keywords
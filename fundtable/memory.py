@@ -0,0 +1,97 @@
+# coding:utf-8
+"""
+内存占用的监控与限制
+
+每页处理完后 pdfplumber 的页面缓存（字符、版面分析结果等）都会释放，见 engine.iter_pages。
+低内存模式下另外清空 pdfminer 的文档级对象缓存，并把内存归还给操作系统；指定 RSS
+上限时每页结束检查一次，超过上限先释放缓存再检查，仍然超过则抛出 MemoryLimitError，
+由调用方记为失败，而不是等到被系统 OOM 杀掉。
+"""
+import ctypes
+import gc
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+MB = 1024 * 1024
+
+
+class MemoryLimitError(MemoryError):
+    pass
+
+
+def rss(pid=None):
+    """ 当前进程（或 pid 进程）的常驻内存（字节），无法获取时返回 None """
+    try:
+        with open(f'/proc/{pid or "self"}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None if pid else peak_rss()
+
+
+def peak_rss(children=False):
+    """ 进程（或已结束的子进程中最大的）峰值常驻内存（字节） """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _load_malloc_trim():
+    # 只有 glibc 提供 malloc_trim；CDLL(None) 即当前进程已加载的符号，不用再查找 libc
+    try:
+        return ctypes.CDLL(None).malloc_trim
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+_malloc_trim = _load_malloc_trim()
+
+
+def trim():
+    """ 回收垃圾并让 glibc 把空闲的堆内存还给系统 """
+    gc.collect()
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+
+def release_document(pdf):
+    """ 清空 pdfminer 已解析对象的缓存，之后用到时会重新从文件读取 """
+    doc = getattr(pdf, 'doc', None)
+    for name in ('_cached_objs', '_parsed_objs'):
+        cached = getattr(doc, name, None)
+        if cached is not None:
+            cached.clear()
+
+
+class MemoryGuard:
+    """ 低内存模式：每页结束时释放文档缓存，检查 RSS 上限，记录峰值 """
+
+    def __init__(self, max_rss=None, trim_every=16):
+        self.max_rss = max_rss
+        self.trim_every = trim_every
+        self.peak = 0
+        self.pages = 0
+
+    def after_page(self, pdf):
+        self.pages += 1
+        if pdf is not None:
+            release_document(pdf)
+        if self.pages % self.trim_every == 0:
+            trim()
+        current = rss()
+        if current is None:
+            return
+        if self.max_rss and current > self.max_rss:
+            trim()
+            current = rss()
+            if current > self.max_rss:
+                self.peak = max(self.peak, current)
+                raise MemoryLimitError(f'内存占用 {current / MB:.0f}MB 超过上限 {self.max_rss / MB:.0f}MB')
+        self.peak = max(self.peak, current)
@@ -0,0 +1,207 @@
+# coding:utf-8
+"""
+提取过程的计时与计数
+
+Metrics 记录文档级和页级的各阶段耗时（open / parse / prefilter / extract_tables / process /
+cache / write）与计数（表格数、数据行数、保留与丢弃的行数、写出字节数），
+每页结束和文档结束时调用注册的回调，最后可以导出 JSON 报告。
+
+开启 profile 后每页单独用 cProfile 采样，只保留最慢的若干页的统计；开启
+trace_memory 时用 tracemalloc 记录每页的内存峰值和最慢页的主要分配位置。
+两者都有明显开销，只在排查问题时使用。
+
+不需要统计时各函数的 metrics 参数为 None，内部使用 NULL_METRICS，不产生开销。
+"""
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class NullMetrics:
+    """ 不做任何记录 """
+
+    enabled = False
+
+    def stage(self, name):
+        return nullcontext()
+
+    def start_document(self, path):
+        pass
+
+    def end_document(self):
+        pass
+
+    def start_page(self, index):
+        pass
+
+    def end_page(self, **counters):
+        pass
+
+    def add_page(self, page):
+        pass
+
+    def count(self, name, value, index=None):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class Metrics:
+    """ 一次运行的统计，可以跨多个文档使用 """
+
+    enabled = True
+
+    def __init__(self, hooks=(), profile=False, top_pages=5, trace_memory=False):
+        self.hooks = list(hooks)
+        self.profile = profile
+        self.top_pages = top_pages
+        self.trace_memory = trace_memory
+        self.documents = []
+        self.document = None
+        self.page = None
+        self._profiler = None
+        self._page_start = None
+        # 只停止自己启动的 tracemalloc，调用方已经开启的跟踪保持不变
+        self._started_tracing = False
+
+    def add_hook(self, hook):
+        """ hook(event, data)：event 为 'page' 或 'document'，data 为对应的统计 dict """
+        self.hooks.append(hook)
+
+    def _emit(self, event, data):
+        for hook in self.hooks:
+            hook(event, data)
+
+    @contextmanager
+    def stage(self, name):
+        """ 计时一个阶段，累加到当前页，不在页内时累加到文档 """
+        T1 = time.perf_counter()
+        try:
+            yield
+        finally:
+            target = self.page if self.page is not None else self.document
+            if target is not None:
+                stages = target['stages']
+                stages[name] = stages.get(name, 0) + time.perf_counter() - T1
+
+    def count(self, name, value, index=None):
+        """ 累加计数到当前页；index 指定页码时记到那一页（例如页面产出后才写盘） """
+        if index is not None and self.document is not None:
+            target = self.document['pages'].get(index, self.document)
+        else:
+            target = self.page if self.page is not None else self.document
+        if target is not None:
+            target['counters'][name] = target['counters'].get(name, 0) + value
+
+    def start_document(self, path):
+        self.document = {
+            'path': str(path),
+            'stages': {},
+            'counters': {},
+            'pages': {},
+            'slowest': [],
+        }
+        self._document_start = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def end_document(self):
+        document = self.document
+        if document is None:
+            return
+        self.end_page()
+        document['seconds'] = time.perf_counter() - self._document_start
+        totals = {}
+        for page in document['pages'].values():
+            for name, value in page['counters'].items():
+                totals[name] = totals.get(name, 0) + value
+            for name, value in page['stages'].items():
+                document['stages'][name] = document['stages'].get(name, 0) + value
+        for name, value in totals.items():
+            document['counters'][name] = document['counters'].get(name, 0) + value
+        document['slowest'].sort(key=lambda item: -item['seconds'])
+        document['pages'] = [document['pages'][index] for index in sorted(document['pages'])]
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self.documents.append(document)
+        self.document = None
+        self._emit('document', document)
+
+    def start_page(self, index):
+        self.end_page()
+        self.page = {'page': index, 'stages': {}, 'counters': {}}
+        if self.document is not None:
+            self.document['pages'][index] = self.page
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._page_start = time.perf_counter()
+
+    def end_page(self, **counters):
+        page = self.page
+        if page is None:
+            return
+        page['seconds'] = time.perf_counter() - self._page_start
+        for name, value in counters.items():
+            page['counters'][name] = page['counters'].get(name, 0) + value
+        if self._profiler is not None:
+            self._profiler.disable()
+        memory = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            page['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            memory = tracemalloc.take_snapshot()
+        self._keep_if_slow(page, self._profiler, memory)
+        self._profiler = None
+        self.page = None
+        self._emit('page', page)
+
+    def add_page(self, page):
+        """ 加入在其他进程中统计好的一页（例如隔离运行的子进程），page 为 'page' 事件的数据 """
+        self.end_page()
+        if self.document is not None:
+            self.document['pages'][page['page']] = page
+        self._emit('page', page)
+
+    def _keep_if_slow(self, page, profiler, memory):
+        """ 只为最慢的 top_pages 页保留 profile 和内存分配详情 """
+        if self.document is None or (profiler is None and memory is None):
+            return
+        slowest = self.document['slowest']
+        if len(slowest) >= self.top_pages and page['seconds'] <= slowest[-1]['seconds']:
+            return
+        detail = {'page': page['page'], 'seconds': page['seconds']}
+        if profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(20)
+            detail['profile'] = out.getvalue()
+        if memory is not None:
+            detail['allocations'] = [str(stat) for stat in memory.statistics('lineno')[:10]]
+        slowest.append(detail)
+        slowest.sort(key=lambda item: -item['seconds'])
+        del slowest[self.top_pages:]
+
+    def report(self):
+        return {'documents': self.documents}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+def summary(document):
+    """ 一行文字的文档统计 """
+    counters = document['counters']
+    stages = ' '.join(f'{name}={seconds * 1000:.0f}ms' for name, seconds in
+                      sorted(document['stages'].items(), key=lambda item: -item[1]))
+    return (f'{len(document["pages"])} 页 {counters.get("tables", 0)} 表 '
+            f'保留 {counters.get("rows_kept", 0)} 行 丢弃 {counters.get("rows_dropped", 0)} 行 '
+            f'缓存命中 {counters.get("cache_hits", 0)} 页 写出 {counters.get("bytes", 0)} 字节 用时 {document["seconds"] * 1000:.0f}ms  {stages}')
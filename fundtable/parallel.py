@@ -0,0 +1,132 @@
+# coding:utf-8
+"""
+多进程并行提取
+
+任务同时按文档和页码区间切分，交给进程池执行，结果再按
+(文档, 页码, 表格) 的原始顺序合并，与顺序执行的输出完全一致。
+
+指定 spill 文件夹时，各任务把结果逐页写入该文件夹下的临时文件，主进程只保存文件路径，
+合并时再按顺序逐页读回，全部文档的结果不必同时留在内存中。
+"""
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import engine
+
+
+# 每个任务处理的页数，太小时进程间调度开销占比高，太大时负载不均
+PAGES_PER_TASK = 8
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def split_ranges(count, size=PAGES_PER_TASK):
+    """ 将 count 页切成若干 [start, stop) 区间 """
+    return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+def spill_page_range(folder, path, start, stop, keywords=engine.KEYWORDS, cache=None, prefilter=True,
+                     memory=None):
+    """ 与 engine.extract_page_range 相同，但每页的记录写成 folder 下临时文件中的一行，返回文件路径 """
+    fd, spill_path = tempfile.mkstemp(suffix='.ndjson', dir=folder)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for _, _, records in engine.iter_pages(path, keywords, start, stop, cache, prefilter, memory=memory):
+            f.write(json.dumps(records, ensure_ascii=False) + '\n')
+    return spill_path
+
+
+class SpilledPages:
+    """ 按页码顺序逐页读回临时文件中的记录 """
+
+    def __init__(self, files):
+        self.files = files
+
+    def __iter__(self):
+        for spill_path in self.files:
+            with open(spill_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+
+    def remove(self):
+        for spill_path in self.files:
+            os.remove(spill_path)
+
+
+def extract_many(paths, workers=None, keywords=engine.KEYWORDS, pages_per_task=PAGES_PER_TASK, cache=None,
+                 prefilter=True, by_page=False, memory=None, spill=None):
+    """
+    并行提取多个 PDF，返回与 paths 一一对应的结果列表
+
+    某个文档出错时，对应位置是该异常对象而不是记录列表。by_page 为 True 时每个
+    文档的结果是按页排列的记录列表，而不是合并后的记录。memory 传给每个任务，
+    内存上限对每个工作进程分别生效。指定 spill 文件夹时每个文档的结果是 SpilledPages，
+    逐页产出记录列表（忽略 by_page），用完后调用 remove 删除临时文件。
+    """
+    paths = list(paths)
+    workers = workers or default_workers()
+    results = [None] * len(paths)
+    pages = [dict() for _ in paths]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if cache is not None:
+            # 先在主进程算好文件哈希，随 cache 一起传给子进程，避免每个任务重复读文件
+            for path in paths:
+                cache.digest(path)
+        counter = engine.page_count if cache is None else cache.page_count
+        counts = {executor.submit(counter, path): doc for doc, path in enumerate(paths)}
+        ranges = {}
+        for future in as_completed(counts):
+            doc = counts[future]
+            try:
+                count = future.result()
+            except Exception as e:
+                results[doc] = e
+                continue
+            for start, stop in split_ranges(count, pages_per_task):
+                if spill is None:
+                    task = executor.submit(engine.extract_page_range, paths[doc], start, stop, keywords, cache,
+                                           prefilter, memory)
+                else:
+                    task = executor.submit(spill_page_range, spill, paths[doc], start, stop, keywords, cache,
+                                           prefilter, memory)
+                ranges[task] = (doc, start)
+
+        for future in as_completed(ranges):
+            doc, start = ranges[future]
+            if isinstance(results[doc], Exception):
+                continue
+            try:
+                pages[doc][start] = future.result()
+            except Exception as e:
+                results[doc] = e
+
+    for doc in range(len(paths)):
+        if spill is not None:
+            files = [pages[doc][start] for start in sorted(pages[doc])]
+            if results[doc] is None:
+                results[doc] = SpilledPages(files)
+            else:
+                SpilledPages(files).remove()
+        elif results[doc] is None:
+            result = []
+            for start in sorted(pages[doc]):
+                for records in pages[doc][start]:
+                    if by_page:
+                        result.append(records)
+                    else:
+                        result.extend(records)
+            results[doc] = result
+    return results
+
+
+def extract(path, workers=None, keywords=engine.KEYWORDS, pages_per_task=PAGES_PER_TASK, cache=None,
+            prefilter=True):
+    """ 按页码区间并行提取单个 PDF """
+    result = extract_many([path], workers, keywords, pages_per_task, cache, prefilter)[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
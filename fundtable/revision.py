@@ -0,0 +1,222 @@
+# coding:utf-8
+"""
+修订版文档的逐页增量提取
+
+    python -m fundtable revise 新版.pdf 输出文件夹 --diff diff.json
+
+招募说明书经常重新发布，每次只改几页。每页按内容计算指纹：解码后的内容流、页面
+尺寸、旋转，以及页面用到的字体、图片等资源的内容（按内容而不是对象编号计算，
+重新生成的 PDF 对象编号变化也不影响）。提取结果按页保存在输出文件夹的
+<文件名>.revision 中，下一版只对指纹没见过的页做表格识别和表头、关键词处理，
+其余页直接沿用，插入或删除页后位置变化的页同样沿用。
+
+每次输出完整的合并结果（与重新提取得到的文件逐字节一致），以及相对上一版新增、
+删除、修改的记录。第一次对某个文档运行时完整提取，全部记录都算新增。
+"""
+import hashlib
+import json
+import os
+
+import pdfplumber
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+from pdfminer.psparser import PSLiteral
+
+from . import engine, writer
+from .cache import config_key
+from .metrics import NULL_METRICS
+
+
+STATE_VERSION = 1
+STATE_SUFFIX = '.revision'
+
+# 页面中影响提取结果的属性，Resources/MediaBox/CropBox/Rotate 可以从页面树继承，PDFPage 已经合并
+PAGE_KEYS = ('Contents', 'Resources', 'MediaBox', 'CropBox', 'Rotate')
+
+# 指向其他对象的反向引用和编号，不影响页面内容，而且插入一页后会整体变化
+SKIPPED_KEYS = {'Parent', 'P', 'StructParent', 'StructParents'}
+
+
+class Fingerprinter:
+    """ 按内容计算 PDF 对象的哈希，同一文档中每个间接对象只计算一次 """
+
+    def __init__(self):
+        self.digests = {}
+
+    def reference(self, ref):
+        if ref.objid not in self.digests:
+            # 先占位，循环引用时用对象编号代替
+            self.digests[ref.objid] = f'cycle:{ref.objid}'.encode()
+            h = hashlib.sha256()
+            self.feed(h, ref.resolve())
+            self.digests[ref.objid] = h.digest()
+        return self.digests[ref.objid]
+
+    def feed(self, h, obj):
+        if isinstance(obj, PDFObjRef):
+            h.update(b'R' + self.reference(obj))
+        elif isinstance(obj, PDFStream):
+            h.update(b'S')
+            self.feed(h, {key: value for key, value in obj.attrs.items()
+                          if key not in ('Length', 'Filter', 'DecodeParms')})
+            try:
+                data = obj.get_data()
+            except Exception:  # 无法解码的数据按原始字节计算
+                data = obj.rawdata or b''
+            h.update(len(data).to_bytes(8, 'big') + data)
+        elif isinstance(obj, dict):
+            h.update(b'D')
+            for key in sorted(obj):
+                if key not in SKIPPED_KEYS:
+                    h.update(key.encode('utf-8') + b'\0')
+                    self.feed(h, obj[key])
+            h.update(b'E')
+        elif isinstance(obj, (list, tuple)):
+            h.update(b'L')
+            for item in obj:
+                self.feed(h, item)
+            h.update(b'E')
+        elif isinstance(obj, PSLiteral):
+            h.update(b'/' + str(obj.name).encode('utf-8') + b'\0')
+        elif isinstance(obj, bytes):
+            h.update(b'B' + len(obj).to_bytes(8, 'big') + obj)
+        else:
+            h.update(repr(obj).encode('utf-8') + b'\0')
+
+    def page(self, page):
+        h = hashlib.sha256()
+        self.feed(h, {key: page.attrs[key] for key in PAGE_KEYS if key in page.attrs})
+        return h.hexdigest()
+
+
+def page_fingerprints(path):
+    """ 文档每一页的内容指纹，只解析对象，不解释内容流，远快于提取 """
+    fingerprinter = Fingerprinter()
+    with pdfplumber.open(path) as pdf:
+        return [fingerprinter.page(page) for page in PDFPage.create_pages(pdf.doc)]
+
+
+def state_path(output, pdf_path):
+    return os.path.join(output, os.path.splitext(os.path.basename(pdf_path))[0] + STATE_SUFFIX)
+
+
+def load_state(path, keywords=engine.KEYWORDS, prefilter=True):
+    """ 上一版每页的 (指纹, 记录)，不存在或关键词、预筛设置不同时返回 None """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('version') != STATE_VERSION or state.get('config') != config_key(keywords, prefilter):
+        return None
+    return [(page['fingerprint'], page['records']) for page in state['pages']]
+
+
+def save_state(path, fingerprints, pages, keywords=engine.KEYWORDS, prefilter=True):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': STATE_VERSION,
+            'config': config_key(keywords, prefilter),
+            'pages': [{'fingerprint': fingerprint, 'records': records}
+                      for fingerprint, records in zip(fingerprints, pages)],
+        }, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def extract_changed(path, previous=None, keywords=engine.KEYWORDS, prefilter=True, metrics=None):
+    """
+    提取新版文档，返回 (指纹列表, 按页排列的记录, 重新提取的页码下标列表)
+
+    previous 为上一版的 [(指纹, 记录)]，指纹相同的页直接沿用上一版的记录；新版中内容
+    相同的页（例如重复的页眉页、空白页）也只提取一次。
+    """
+    metrics = metrics or NULL_METRICS
+    metrics.start_document(path)
+    try:
+        with metrics.stage('fingerprint'):
+            fingerprints = page_fingerprints(path)
+        known = dict(previous or ())
+        changed = []
+        for index, fingerprint in enumerate(fingerprints):
+            if fingerprint not in known:
+                known[fingerprint] = None
+                changed.append(index)
+        if changed:
+            with metrics.stage('open'):
+                pdf = pdfplumber.open(path)
+            with pdf:
+                for index in changed:
+                    metrics.start_page(index)
+                    page = pdf.pages[index]
+                    known[fingerprints[index]] = engine.extract_page(page, keywords, prefilter, metrics)
+                    page.close()
+                    metrics.end_page()
+        return fingerprints, [known[fingerprint] for fingerprint in fingerprints], changed
+    finally:
+        metrics.end_document()
+
+
+def record_key(record):
+    """ 记录按 (行名, 列名) 对应，同一表头下的同名行视为同一项 """
+    (row, value), = record.items()
+    return row, tuple(value) if isinstance(value, dict) else ()
+
+
+def diff_pages(old_pages, new_pages):
+    """
+    比较两版按页排列的记录，返回 {'added', 'removed', 'changed'}
+
+    行名、列名相同的记录先两两去掉完全相同的，剩下的按出现顺序配对为修改，多出的
+    为新增或删除。新增和修改带新版的页码下标，删除带旧版的页码下标。
+    """
+    def group(pages):
+        groups = {}
+        for index, records in enumerate(pages):
+            for record in records:
+                groups.setdefault(record_key(record), []).append((index, record))
+        return groups
+
+    old_groups = group(old_pages)
+    new_groups = group(new_pages)
+    added, removed, changed = [], [], []
+    for key in sorted(old_groups.keys() | new_groups.keys(), key=lambda key: json.dumps(key, ensure_ascii=False)):
+        old_items = list(old_groups.get(key, ()))
+        new_items = []
+        for index, record in new_groups.get(key, ()):
+            same = next((i for i, (_, old) in enumerate(old_items) if old == record), None)
+            if same is None:
+                new_items.append((index, record))
+            else:
+                del old_items[same]
+        for (old_index, old), (index, new) in zip(old_items, new_items):
+            changed.append({'page': index, 'previous_page': old_index, 'row': key[0],
+                            'before': old[key[0]], 'after': new[key[0]]})
+        removed.extend({'page': index, 'record': record} for index, record in old_items[len(new_items):])
+        added.extend({'page': index, 'record': record} for index, record in new_items[len(old_items):])
+    for items in (added, removed, changed):
+        items.sort(key=lambda item: item['page'])
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+def revise(path, output, format='json', keywords=engine.KEYWORDS, prefilter=True, metrics=None, base=None):
+    """
+    增量提取 path 的新版，写出合并结果并更新 .revision，返回摘要 dict
+
+    base 为上一版的文件名，新版改了文件名时指定，默认与 path 同名。摘要含 out_path、
+    pages、extracted（重新提取的页码下标）、records 和 diff（见 diff_pages）。
+    """
+    os.makedirs(output, exist_ok=True)
+    saved = state_path(output, path)
+    previous = load_state(state_path(output, base or path), keywords, prefilter)
+    fingerprints, pages, changed = extract_changed(path, previous, keywords, prefilter, metrics)
+    out_path = os.path.join(output, f'{os.path.splitext(os.path.basename(path))[0]}.{format}')
+    count = writer.save_pages(pages, out_path, format)
+    save_state(saved, fingerprints, pages, keywords, prefilter)
+    return {
+        'out_path': out_path,
+        'pages': len(pages),
+        'extracted': changed,
+        'records': count,
+        'diff': diff_pages([records for _, records in previous or ()], pages),
+    }
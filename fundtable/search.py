@@ -0,0 +1,270 @@
+# coding:utf-8
+"""
+全语料的费用项索引
+
+提取结果按单元格存入 SQLite：每个单元格记录所在文档、页码、记录序号、行名、列名和值。
+行名、列名规整后（全角转半角、去掉空白、小写）存入 keys 表，单元格只保存键的编号，
+查询时先在数量很少的键中找出匹配的行名、列名，再按编号走索引取出单元格，全语料的
+查询也只需几毫秒。
+
+值能解析为单个数字时另存数值和单位（百分比、千分比、元、份，万和亿折算进数值），
+用于范围查询，例如“管理费高于 1.5% 的基金”：
+
+    index.query(row='管理费', gt='1.5%')
+
+同一文档再次加入时替换原有的单元格；文件大小和修改时间未变时 is_current 返回 True，
+可以跳过。索引可以在多个进程间共享同一文件。
+"""
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+from .cache import DEFAULT_DIR
+
+
+DEFAULT_PATH = os.path.join(DEFAULT_DIR, 'index.sqlite3')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY, source TEXT UNIQUE, size INTEGER, mtime_ns INTEGER, cells INTEGER, indexed REAL);
+CREATE TABLE IF NOT EXISTS keys (id INTEGER PRIMARY KEY, key TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS cells (
+    document INTEGER, page INTEGER, record INTEGER, row_key INTEGER, column_key INTEGER,
+    row TEXT, column TEXT, value TEXT, number REAL, unit TEXT);
+CREATE INDEX IF NOT EXISTS cells_row ON cells (row_key, number);
+CREATE INDEX IF NOT EXISTS cells_column ON cells (column_key, number);
+CREATE INDEX IF NOT EXISTS cells_document ON cells (document);
+'''
+
+# 单位 -> (规整后的单位, 倍数)
+UNITS = {
+    '%': ('%', 1), '‰': ('‰', 1),
+    '元': ('元', 1), '万元': ('元', 1e4), '亿元': ('元', 1e8),
+    '份': ('份', 1), '万份': ('份', 1e4), '亿份': ('份', 1e8),
+}
+VALUE_PATTERN = re.compile(r'([+-]?\d+(?:,\d{3})*(?:\.\d+)?)(%|‰|万元|亿元|元|万份|亿份|份)?')
+
+
+def normalize(text):
+    """ 行名、列名的规整形式：全角转半角，去掉空白，小写 """
+    return ''.join(unicodedata.normalize('NFKC', text).split()).lower()
+
+
+def parse_value(text):
+    """ 把 "1.50%"、"1,000 元"、"5万元" 解析为 (数值, 单位)，不是单个数字时返回 (None, None) """
+    if text is None:
+        return None, None
+    match = VALUE_PATTERN.fullmatch(normalize(text))
+    if match is None:
+        return None, None
+    unit, scale = UNITS.get(match.group(2), (None, 1))
+    return float(match.group(1).replace(',', '')) * scale, unit
+
+
+def iter_cells(records):
+    """ 把一页的记录展开为 (记录序号, 行名, 列名, 值)，合并单元格的 "None" 还原为 None """
+    for number, record in enumerate(records):
+        for row, cells in record.items():
+            for column, value in cells.items() or [('', None)]:
+                yield number, row, column, None if value == 'None' else value
+
+
+def is_result_file(path):
+    """ 是否为提取结果文件：ndjson，或每项都是 {行名: {列名: 值}} 的 JSON 数组 """
+    if str(path).endswith('.ndjson'):
+        return True
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return isinstance(data, list) and all(
+        isinstance(record, dict) and len(record) == 1 and isinstance(next(iter(record.values())), dict)
+        for record in data)
+
+
+def read_result_file(path):
+    """ 读取 json / ndjson 结果文件，返回记录列表（文件中没有页码） """
+    with open(path, 'r', encoding='utf-8') as f:
+        if str(path).endswith('.ndjson'):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+class FeeIndex:
+    """ 费用项倒排索引 """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = str(path)
+        self._db = None
+        self._keys = {}
+
+    def __getstate__(self):
+        # 传给子进程时不带数据库连接，由子进程自行打开
+        state = self.__dict__.copy()
+        state['_db'] = None
+        state['_keys'] = {}
+        return state
+
+    @property
+    def db(self):
+        if self._db is None:
+            folder = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            # WAL 模式下断电最多丢失最后几次提交，索引可以从结果重建，换取更快的逐文档提交
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def key_id(self, text):
+        key = normalize(text)
+        if key not in self._keys:
+            self.db.execute('INSERT OR IGNORE INTO keys (key) VALUES (?)', (key,))
+            self._keys[key] = self.db.execute('SELECT id FROM keys WHERE key = ?', (key,)).fetchone()[0]
+        return self._keys[key]
+
+    def is_current(self, source):
+        """ 文档已索引且文件大小、修改时间都未变化 """
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return False
+        row = self.db.execute('SELECT size, mtime_ns FROM documents WHERE source = ?',
+                              (os.path.abspath(source),)).fetchone()
+        return row is not None and tuple(row) == (stat.st_size, stat.st_mtime_ns)
+
+    def add_document(self, source, pages):
+        """
+        加入或替换一个文档，pages 为 (页码下标, 该页记录) 序列，页码未知时为 None；返回单元格数
+
+        整个文档在一个事务中写入，查询方不会看到只写了一半的文档。
+        """
+        source = os.path.abspath(source)
+        stat = os.stat(source)
+        try:
+            return self._add(source, stat, pages)
+        except BaseException:
+            # 事务已回滚，本次新增的键编号不再有效
+            self._keys.clear()
+            raise
+
+    def _add(self, source, stat, pages):
+        with self.db:
+            self._delete(source)
+            document = self.db.execute(
+                'INSERT INTO documents (source, size, mtime_ns, cells, indexed) VALUES (?, ?, ?, 0, ?)',
+                (source, stat.st_size, stat.st_mtime_ns, time.time())).lastrowid
+            rows = []
+            offset = 0
+            for page, records in pages:
+                for number, row, column, value in iter_cells(records):
+                    rows.append((document, page, offset + number, self.key_id(row), self.key_id(column),
+                                 row, column, value, *parse_value(value)))
+                offset += len(records)
+            self.db.executemany('INSERT INTO cells VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.db.execute('UPDATE documents SET cells = ? WHERE id = ?', (len(rows), document))
+        return len(rows)
+
+    def copy_document(self, source, target):
+        """ 内容相同的文件直接复制 source 已有的单元格，source 未索引时返回 None，否则返回单元格数 """
+        source, target = os.path.abspath(source), os.path.abspath(target)
+        stat = os.stat(target)
+        with self.db:
+            row = self.db.execute('SELECT id, cells FROM documents WHERE source = ?', (source,)).fetchone()
+            if row is None:
+                return None
+            self._delete(target)
+            document = self.db.execute(
+                'INSERT INTO documents (source, size, mtime_ns, cells, indexed) VALUES (?, ?, ?, ?, ?)',
+                (target, stat.st_size, stat.st_mtime_ns, row[1], time.time())).lastrowid
+            self.db.execute('INSERT INTO cells SELECT ?, page, record, row_key, column_key, row, column, value, '
+                            'number, unit FROM cells WHERE document = ?', (document, row[0]))
+        return row[1]
+
+    def add_result_file(self, path):
+        """ 加入一个 json / ndjson 结果文件，文档即该文件本身 """
+        return self.add_document(path, [(None, read_result_file(path))])
+
+    def _delete(self, source):
+        row = self.db.execute('SELECT id FROM documents WHERE source = ?', (source,)).fetchone()
+        if row is not None:
+            self.db.execute('DELETE FROM cells WHERE document = ?', row)
+            self.db.execute('DELETE FROM documents WHERE id = ?', row)
+
+    def remove(self, source):
+        with self.db:
+            self._delete(os.path.abspath(source))
+
+    def match_keys(self, text, exact=False):
+        """ 规整后包含 text（exact 时等于 text）的键的编号 """
+        if exact:
+            rows = self.db.execute('SELECT id FROM keys WHERE key = ?', (normalize(text),))
+        else:
+            rows = self.db.execute('SELECT id FROM keys WHERE instr(key, ?) > 0', (normalize(text),))
+        return [key for key, in rows]
+
+    def query(self, row=None, column=None, ge=None, le=None, gt=None, lt=None, unit=None, document=None,
+              exact=False, limit=None):
+        """
+        查询单元格，返回 dict 列表，按文档、页码、记录排序
+
+        row、column 匹配规整后的行名、列名（默认包含即可，exact 时要求相等）；ge、le
+        为闭区间，gt、lt 为开区间，可以是数字或 "1.5%" 这样带单位的文字，带单位时同时
+        限定单位；document 匹配文档路径中的一段。
+        """
+        conditions = []
+        params = []
+        for name, text in (('row_key', row), ('column_key', column)):
+            if text is not None:
+                keys = self.match_keys(text, exact)
+                if not keys:
+                    return []
+                conditions.append(f'{name} IN ({",".join("?" * len(keys))})')
+                params.extend(keys)
+        for op, bound in (('>=', ge), ('<=', le), ('>', gt), ('<', lt)):
+            if bound is None:
+                continue
+            if isinstance(bound, str):
+                number, bound_unit = parse_value(bound)
+                if number is None:
+                    raise ValueError(f'无法解析的数值: {bound}')
+                unit = unit or bound_unit
+                bound = number
+            conditions.append(f'number {op} ?')
+            params.append(bound)
+        if unit is not None:
+            conditions.append('unit = ?')
+            params.append(UNITS.get(unit, (unit,))[0])
+        if document is not None:
+            conditions.append('instr(documents.source, ?) > 0')
+            params.append(document)
+        sql = ('SELECT source, page, record, row, column, value, number, unit FROM cells '
+               'JOIN documents ON documents.id = cells.document')
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY source, page, record'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        names = ('document', 'page', 'record', 'row', 'column', 'value', 'number', 'unit')
+        return [dict(zip(names, item)) for item in self.db.execute(sql, params)]
+
+    def stats(self):
+        documents, cells = self.db.execute('SELECT COUNT(*), COALESCE(SUM(cells), 0) FROM documents').fetchone()
+        keys = self.db.execute('SELECT COUNT(*) FROM keys').fetchone()[0]
+        return {
+            'path': self.path,
+            'documents': documents,
+            'cells': cells,
+            'keys': keys,
+            'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
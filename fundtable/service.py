@@ -0,0 +1,379 @@
+# coding:utf-8
+"""
+本地提取服务
+
+常驻进程持有一个预热过的进程池（子进程启动时就导入好 pdfplumber），通过 HTTP 或
+Unix 套接字接收请求：
+
+    POST /extract?path=/data/in.pdf          提取本机上的文件
+    POST /extract  （请求体为 PDF 内容）       上传并提取
+    GET  /status                              队列深度、吞吐等统计
+
+返回的记录与 engine.extract 完全相同（JSON 格式与 engine.save 逐字节一致）。加上
+stream=1 时按页返回 NDJSON，每行 {"page": 页码下标, "pages": 总页数, "records": [...]}，
+按页码顺序在对应页完成后立即发送。可选参数 keywords（逗号分隔）和 prefilter=0。
+
+同时处理的请求数有上限，超出时直接返回 503 和 Retry-After，由调用方稍后重试，
+而不是在服务内无限排队。大文档按页码区间拆成多个任务并行；页数很少的文档在
+很短的时间窗口内攒成一批，在一个任务中依次提取，减少进程间调度的开销。
+"""
+import json
+import os
+import queue
+import socketserver
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import engine, parallel
+
+
+DEFAULT_PORT = 8765
+# 每个任务的页数，流式返回时即每次推送的最大页数
+PAGES_PER_TASK = 4
+# 不超过这么多页的文档参与攒批
+BATCH_PAGES = 4
+BATCH_SIZE = 16
+BATCH_WAIT = 0.005
+MAX_UPLOAD_BYTES = 256 * 1024 * 1024
+
+
+def warm_up():
+    """ 进程池初始化：提前导入 pdfplumber 及其依赖 """
+    import pdfplumber  # noqa: F401
+
+
+def ping():
+    return os.getpid()
+
+
+def extract_batch(items, cache=None):
+    """ 在一个任务中依次提取多个小文档，返回与 items 对应的按页记录列表，出错的文档对应异常对象 """
+    results = []
+    for path, keywords, prefilter in items:
+        try:
+            results.append(engine.extract_page_range(path, 0, None, keywords, cache, prefilter))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class ExtractionService:
+    """ 预热的进程池 + 有界的请求队列 + 小文档攒批 """
+
+    def __init__(self, workers=None, max_pending=None, pages_per_task=PAGES_PER_TASK, batch_pages=BATCH_PAGES,
+                 batch_size=BATCH_SIZE, batch_wait=BATCH_WAIT, cache=None, root=None):
+        self.workers = workers or parallel.default_workers()
+        self.max_pending = max_pending or self.workers * 4
+        self.pages_per_task = pages_per_task
+        self.batch_pages = batch_pages
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.cache = cache
+        self.root = os.path.realpath(root) if root else None
+        self.executor = None
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.batches = queue.Queue()
+        self.batcher = None
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'rejected': 0, 'errors': 0, 'pages': 0, 'batches': 0,
+                         'batched_documents': 0, 'pending': 0}
+        self.started = time.time()
+
+    def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+        # 每个进程先执行一个空任务，服务开始接受请求时进程都已启动并完成导入
+        for future in [self.executor.submit(ping) for _ in range(self.workers)]:
+            future.result()
+        self.batcher = threading.Thread(target=self._batch_loop, daemon=True)
+        self.batcher.start()
+
+    def close(self):
+        self.batches.put(None)
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def admit(self):
+        """ 占用一个请求名额，已满时返回 False """
+        if not self.slots.acquire(blocking=False):
+            self.count('rejected')
+            return False
+        self.count('requests')
+        self.count('pending')
+        return True
+
+    def release(self):
+        self.count('pending', -1)
+        self.slots.release()
+
+    def check_path(self, path):
+        """ 指定了 root 时只允许提取 root 下的文件 """
+        real = os.path.realpath(path)
+        if self.root and os.path.commonpath([self.root, real]) != self.root:
+            raise PermissionError(f'不允许访问 {path}')
+        if not os.path.isfile(real):
+            raise FileNotFoundError(f'文件不存在: {path}')
+        return real
+
+    def page_count(self, path):
+        return engine.page_count(path) if self.cache is None else self.cache.page_count(path)
+
+    def iter_pages(self, path, keywords=engine.KEYWORDS, prefilter=True):
+        """
+        按页码顺序产出 (页码下标, 总页数, 该页记录)，每页所在的任务完成后立即产出
+
+        页数在调用时就读取，文件无法打开时在这里直接抛出，而不是开始产出之后。
+        """
+        return self._iter_pages(path, self.page_count(path), keywords, prefilter)
+
+    def _iter_pages(self, path, count, keywords, prefilter):
+        if count <= self.batch_pages:
+            future = Future()
+            self.batches.put((path, list(keywords), prefilter, future))
+            for index, records in enumerate(future.result()):
+                self.count('pages')
+                yield index, count, records
+            return
+        ranges = parallel.split_ranges(count, self.pages_per_task)
+        futures = [self.executor.submit(engine.extract_page_range, path, start, stop, keywords, self.cache, prefilter)
+                   for start, stop in ranges]
+        try:
+            for (start, _), future in zip(ranges, futures):
+                for offset, records in enumerate(future.result()):
+                    self.count('pages')
+                    yield start + offset, count, records
+        finally:
+            # 客户端断开或出错时不再执行排队中的区间
+            for future in futures:
+                future.cancel()
+
+    def _batch_loop(self):
+        while True:
+            item = self.batches.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.batches.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.batches.put(None)
+                    break
+                batch.append(item)
+            self.count('batches')
+            self.count('batched_documents', len(batch))
+            try:
+                task = self.executor.submit(extract_batch, [item[:3] for item in batch], self.cache)
+            except RuntimeError as e:  # 进程池已关闭
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+            task.add_done_callback(lambda task, batch=batch: self._distribute(task, batch))
+
+    def _distribute(self, task, batch):
+        try:
+            results = task.result()
+        except BaseException as e:
+            results = [e] * len(batch)
+        for (*_, future), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        elapsed = max(time.time() - self.started, 1e-9)
+        stats.update({
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'queued_batches': self.batches.qsize(),
+            'pages_per_s': stats['pages'] / elapsed,
+            'uptime': elapsed,
+        })
+        return stats
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'fundtable'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def address_string(self):
+        # Unix 套接字没有客户端地址
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def send_json(self, status, value, headers=()):
+        body = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, content in headers:
+            self.send_header(name, content)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, data):
+        self.wfile.write(f'{len(data):X}\r\n'.encode('ascii') + data + b'\r\n')
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/status':
+            self.send_json(200, self.service.stats())
+        else:
+            self.send_json(404, {'error': f'未知路径 {self.path}'})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/extract':
+            self.close_connection = True
+            return self.send_json(404, {'error': f'未知路径 {self.path}'})
+        if not self.service.admit():
+            # 未读取的请求体留在连接里，直接关闭连接
+            self.close_connection = True
+            return self.send_json(503, {'error': '请求过多，请稍后重试'}, [('Retry-After', '1')])
+        upload = None
+        try:
+            params = parse_qs(url.query)
+            keywords = params['keywords'][0].split(',') if 'keywords' in params else engine.KEYWORDS
+            prefilter = params.get('prefilter', ['1'])[0] != '0'
+            if 'path' in params:
+                self.discard_body()
+                path = self.service.check_path(params['path'][0])
+            else:
+                path = upload = self.receive_upload()
+            pages = self.service.iter_pages(path, keywords, prefilter)
+            if params.get('stream', ['0'])[0] == '1':
+                self.stream(pages)
+            else:
+                result = []
+                for _, _, records in pages:
+                    result.extend(records)
+                body = engine.dumps(result).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        except (ValueError, PermissionError) as e:
+            self.fail(400, e)
+        except FileNotFoundError as e:
+            self.fail(404, e)
+        except Exception as e:
+            self.fail(500, e)
+        finally:
+            self.service.release()
+            if upload is not None:
+                os.remove(upload)
+
+    def fail(self, status, error):
+        self.service.count('errors')
+        self.close_connection = True
+        self.send_json(status, {'error': str(error)})
+
+    def discard_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        while length > 0:
+            length -= len(self.rfile.read(min(length, 1024 * 1024)))
+
+    def receive_upload(self):
+        """ 把请求体写入临时文件，返回路径 """
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0:
+            raise ValueError('请求体为空，需要上传 PDF 或指定 path 参数')
+        if length > self.server.max_upload:
+            raise ValueError(f'上传的文件超过 {self.server.max_upload // 1024 // 1024}MB')
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                remaining = length
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        raise ValueError('请求体不完整')
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    def stream(self, pages):
+        """ 分块传输，每页一行 NDJSON；开始发送后出错时在最后一行给出 error """
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for index, total, records in pages:
+                line = {'page': index, 'pages': total, 'records': records}
+                self.send_chunk(json.dumps(line, ensure_ascii=False).encode('utf-8') + b'\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pages.close()
+            self.close_connection = True
+            return
+        except Exception as e:
+            self.service.count('errors')
+            self.send_chunk(json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.send_chunk(b'')
+
+
+class ServiceServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, address, service, quiet=False, max_upload=MAX_UPLOAD_BYTES):
+        self.service = service
+        self.quiet = quiet
+        self.max_upload = max_upload
+        super().__init__(address, ServiceHandler)
+
+
+class UnixServiceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, path, service, quiet=False, max_upload=MAX_UPLOAD_BYTES):
+        self.service = service
+        self.quiet = quiet
+        self.max_upload = max_upload
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, ServiceHandler)
+
+
+def serve(service, host='127.0.0.1', port=DEFAULT_PORT, unix=None, quiet=False, ready=None):
+    """ 启动进程池并一直处理请求，直到 KeyboardInterrupt；ready(server) 在开始监听后调用 """
+    service.start()
+    server = UnixServiceServer(unix, service, quiet) if unix else ServiceServer((host, port), service, quiet)
+    if ready is not None:
+        ready(server)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+        if unix and os.path.exists(unix):
+            os.remove(unix)
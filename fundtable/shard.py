@@ -0,0 +1,301 @@
+# coding:utf-8
+"""
+多机分片批量提取
+
+    python -m fundtable manifest 输入文件夹 manifest.json
+    python -m fundtable shard manifest.json 输出文件夹 --shard 1/3     # 每台机器运行其中一片
+    python -m fundtable merge manifest.json 输出文件夹
+
+清单记录每个 PDF 的文件名、大小和页数。分片以页码区间为单位：页数超过平均每片页数
+的文档先切成几段，再按页数从多到少依次分给当前页数最少的一片，各片页数接近。
+分配只由清单决定，各节点独立计算得到同样的结果。
+
+每片的结果写在 输出文件夹/shards/<i>-of-<n>/ 中，每个区间一个 .pages 文件，每行是
+一页的记录，逐页追加，本身就是检查点；区间完成后记入该目录下的 progress.state。
+中断后重跑同一命令会跳过已完成的区间，未完成的区间从最后一个完整的页继续。
+合并时按清单顺序把各区间的页拼起来，写成指定格式的结果，与单机运行 extract 得到
+的文件逐字节一致；有区间未完成时列出缺失的文档并返回失败。
+"""
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from . import engine, parallel, writer
+from .cache import config_key
+
+
+MANIFEST_VERSION = 1
+SHARDS_DIR = 'shards'
+PROGRESS_NAME = 'progress.state'
+
+
+def list_pdfs(folder):
+    """ 按文件名顺序列出文件夹中的 PDF，与命令行 extract 的顺序相同 """
+    return sorted(entry.name for entry in os.scandir(folder)
+                  if entry.is_file() and entry.name.lower().endswith('.pdf'))
+
+
+def describe(path):
+    return {'name': os.path.basename(path), 'size': os.path.getsize(path), 'pages': engine.page_count(path)}
+
+
+def build_manifest(folder, workers=None):
+    """ 统计文件夹中每个 PDF 的大小和页数，无法打开的文件页数记为 None """
+    folder = os.path.abspath(folder)
+    paths = [os.path.join(folder, name) for name in list_pdfs(folder)]
+    documents = []
+    with ProcessPoolExecutor(max_workers=workers or parallel.default_workers()) as executor:
+        futures = [executor.submit(describe, path) for path in paths]
+        for path, future in zip(paths, futures):
+            try:
+                documents.append(future.result())
+            except Exception as e:
+                documents.append({'name': os.path.basename(path), 'size': os.path.getsize(path), 'pages': None,
+                                  'error': str(e)})
+    return {'version': MANIFEST_VERSION, 'root': folder, 'documents': documents}
+
+
+def write_json(data, path):
+    """ 先写临时文件再改名 """
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f'不支持的清单版本: {manifest.get("version")}')
+    return manifest
+
+
+def manifest_digest(manifest):
+    """ 清单内容的哈希，不含 root，各节点的输入路径可以不同 """
+    text = json.dumps(manifest['documents'], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def parse_shard(text):
+    """ "2/3" -> (1, 3)，返回从 0 开始的分片下标和分片数 """
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f'分片应写成 i/n，例如 1/3: {text}') from None
+    if not 1 <= index <= count:
+        raise ValueError(f'分片序号应在 1 到 {count} 之间: {text}')
+    return index - 1, count
+
+
+def split_units(documents, count):
+    """
+    把文档切成 (文档下标, 起始页, 结束页) 区间，按清单顺序排列
+
+    页数超过平均每片页数的文档均分成几段，其余文档整体作为一个区间；页数未知的
+    文档结束页为 None。
+    """
+    target = max(1, math.ceil(sum(document['pages'] or 1 for document in documents) / count))
+    units = []
+    for number, document in enumerate(documents):
+        pages = document['pages']
+        if pages is None:
+            units.append((number, 0, None))
+            continue
+        parts = max(1, math.ceil(pages / target))
+        bounds = [pages * part // parts for part in range(parts + 1)]
+        units.extend((number, start, stop) for start, stop in zip(bounds, bounds[1:]))
+    return units
+
+
+def unit_size(unit):
+    return 1 if unit[2] is None else unit[2] - unit[1]
+
+
+def assign(documents, count):
+    """
+    把区间分成 count 片，返回每片的区间列表（按清单顺序）
+
+    按页数从多到少（页数相同时按清单顺序）依次分给当前页数最少的一片，页数未知的
+    文档按 1 页计。
+    """
+    loads = [0] * count
+    shards = [[] for _ in range(count)]
+    for unit in sorted(split_units(documents, count), key=lambda unit: (-unit_size(unit), unit)):
+        target = min(range(count), key=lambda shard: (loads[shard], shard))
+        shards[target].append(unit)
+        loads[target] += unit_size(unit)
+    return [sorted(shard) for shard in shards]
+
+
+def shard_dir(output, index, count):
+    return os.path.join(output, SHARDS_DIR, f'{index + 1}-of-{count}')
+
+
+def unit_key(document, start, stop):
+    return f'{document["name"]}:{start}-{"" if stop is None else stop}'
+
+
+def unit_path(folder, document, start, stop):
+    return os.path.join(folder, f'{os.path.splitext(document["name"])[0]}.{start}-{stop}.pages')
+
+
+class ShardProgress:
+    """ 一片中已完成的区间，保存在该片目录的 progress.state 中 """
+
+    def __init__(self, folder, manifest, index, count, keywords, prefilter=True):
+        self.path = os.path.join(folder, PROGRESS_NAME)
+        self.header = {
+            'manifest': manifest_digest(manifest),
+            'shard': index + 1,
+            'count': count,
+            'config': config_key(keywords, prefilter),
+        }
+        self.units = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        # 清单、关键词或预筛设置变化后以前的结果作废
+        if all(saved.get(key) == value for key, value in self.header.items()):
+            self.units = saved['units']
+
+    def done(self, key):
+        return self.units.get(key, {}).get('status') == 'done'
+
+    def record(self, key, status, records=None, error=None):
+        self.units[key] = {'status': status, 'records': records, 'error': error}
+        write_json(dict(self.header, units=self.units), self.path)
+
+
+def read_lines(path):
+    """ .pages 文件中完整的行，忽略末尾写了一半的行 """
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                return
+            yield line
+
+
+def read_pages(path):
+    """ 逐页读出 .pages 文件中的记录 """
+    for line in read_lines(path):
+        yield json.loads(line)
+
+
+def extract_unit(path, out_path, start, stop, keywords, cache, prefilter):
+    """ 提取一个区间，每页一行追加到 out_path，已有的完整页不再提取，返回记录数 """
+    done = 0
+    offset = 0
+    records = 0
+    if os.path.exists(out_path):
+        for line in read_lines(out_path):
+            done += 1
+            offset += len(line)
+            records += len(json.loads(line))
+    with open(out_path, 'ab') as f:
+        f.truncate(offset)
+        pages = engine.iter_pages(path, keywords, start + done, stop, cache=cache, prefilter=prefilter)
+        for _, _, page in pages:
+            f.write(json.dumps(page, ensure_ascii=False).encode('utf-8') + b'\n')
+            f.flush()
+            records += len(page)
+    return records
+
+
+def run_shard(manifest, output, index, count, keywords=engine.KEYWORDS, cache=None, prefilter=True, root=None,
+              on_unit=None):
+    """
+    提取分给第 index 片（从 0 开始）的区间，返回 {'done', 'skipped', 'failed'} 计数
+
+    root 为本机上 PDF 所在的文件夹，默认使用清单中的路径。on_unit(区间名, 记录数或异常)
+    在每个区间完成后调用。
+    """
+    root = root or manifest['root']
+    folder = shard_dir(output, index, count)
+    os.makedirs(folder, exist_ok=True)
+    progress = ShardProgress(folder, manifest, index, count, keywords, prefilter)
+    stats = {'done': 0, 'skipped': 0, 'failed': 0}
+    for number, start, stop in assign(manifest['documents'], count)[index]:
+        document = manifest['documents'][number]
+        key = unit_key(document, start, stop)
+        if progress.done(key):
+            stats['skipped'] += 1
+            continue
+        path = os.path.join(root, document['name'])
+        try:
+            if os.path.getsize(path) != document['size']:
+                raise ValueError('文件与清单中的大小不一致，请重新生成清单')
+            result = extract_unit(path, unit_path(folder, document, start, stop), start, stop, keywords, cache,
+                                  prefilter)
+        except Exception as e:
+            result = e
+            stats['failed'] += 1
+            progress.record(key, 'failed', error=str(e))
+        else:
+            stats['done'] += 1
+            progress.record(key, 'done', result)
+        if on_unit is not None:
+            on_unit(key, result)
+    return stats
+
+
+def find_progress(output):
+    """ 输出文件夹中各片的进度，返回 {(下标, 片数): 进度 dict} """
+    found = {}
+    base = os.path.join(output, SHARDS_DIR)
+    if not os.path.isdir(base):
+        return found
+    for entry in os.scandir(base):
+        try:
+            with open(os.path.join(entry.path, PROGRESS_NAME), 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            continue
+        found[saved['shard'] - 1, saved['count']] = saved
+    return found
+
+
+def merge(manifest, output, format='json', on_document=None):
+    """
+    按清单顺序把各片的结果合并成 output 中每个 PDF 一个结果文件，返回缺失的文档名列表
+
+    只使用与清单一致的分片结果；有多种片数的结果时（例如改过 n 重跑），取完成区间
+    最多的一种。on_document(文档名, 记录数) 在每个文档写出后调用。
+    """
+    documents = manifest['documents']
+    digest = manifest_digest(manifest)
+    found = {key: saved for key, saved in find_progress(output).items() if saved['manifest'] == digest}
+    if not found:
+        return [document['name'] for document in documents]
+    completed = {}
+    for (_, count), saved in found.items():
+        completed[count] = completed.get(count, 0) + sum(unit['status'] == 'done' for unit in saved['units'].values())
+    count = max(sorted(completed), key=completed.get)
+    if len({saved['config'] for (_, n), saved in found.items() if n == count}) > 1:
+        raise ValueError('各分片使用的关键词或预筛设置不一致，不能合并')
+
+    # 每个文档的各区间文件，未完成的区间为 None
+    parts = [[] for _ in documents]
+    for index, units in enumerate(assign(documents, count)):
+        progress = found.get((index, count), {'units': {}})['units']
+        for number, start, stop in units:
+            document = documents[number]
+            done = progress.get(unit_key(document, start, stop), {}).get('status') == 'done'
+            path = unit_path(shard_dir(output, index, count), document, start, stop)
+            parts[number].append((start, path if done and os.path.exists(path) else None))
+
+    missing = []
+    for document, units in zip(documents, parts):
+        files = [path for _, path in sorted(units)]
+        if None in files:
+            missing.append(document['name'])
+            continue
+        out_path = os.path.join(output, f'{os.path.splitext(document["name"])[0]}.{format}')
+        records = writer.save_pages((page for path in files for page in read_pages(path)), out_path, format)
+        if on_document is not None:
+            on_document(document['name'], records)
+    return missing
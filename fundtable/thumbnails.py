@@ -0,0 +1,142 @@
+# coding:utf-8
+"""
+表格图片的缩略图磁盘缓存
+
+缩略图按原图路径、大小和修改时间定位，原图变化后自动重新生成。同一张原图只解码一次，
+从大到小依次缩放，一次写出全部尺寸；原图本来就不大于某一档时，为该档写一个
+空的标记文件，之后直接返回原图。缓存总大小超过上限后按最近使用时间淘汰。
+"""
+import hashlib
+import os
+import tempfile
+
+from PIL import Image
+
+from .cache import DEFAULT_DIR
+
+
+# 缩略图的最长边（像素）
+SIZES = (256, 512, 1024)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def choose_size(pixels, sizes=SIZES):
+    """ 不小于 pixels 的最小尺寸，都不够时取最大的一档 """
+    for size in sorted(sizes):
+        if size >= pixels:
+            return size
+    return max(sizes)
+
+
+class ThumbnailCache:
+    """ 缩略图文件缓存，可以在多个线程、进程间共享同一目录 """
+
+    def __init__(self, folder=os.path.join(DEFAULT_DIR, 'thumbnails'), sizes=SIZES, max_bytes=DEFAULT_MAX_BYTES):
+        self.folder = str(folder)
+        self.sizes = tuple(sorted(sizes, reverse=True))
+        self.max_bytes = max_bytes
+        self._bytes = None
+
+    def key(self, source):
+        stat = os.stat(source)
+        text = f'{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}'
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def path(self, key, size):
+        return os.path.join(self.folder, key[:2], f'{key}_{size}.png')
+
+    def marker(self, key, size):
+        """ 原图不大于 size 时的标记文件 """
+        return os.path.join(self.folder, key[:2], f'{key}_{size}.src')
+
+    def get(self, source, size):
+        """ 返回最长边不超过 size 的缩略图路径，原图本来就不大于 size 时返回原图路径 """
+        if size not in self.sizes:
+            raise ValueError(f'不支持的缩略图尺寸: {size}')
+        key = self.key(source)
+        path = self.path(key, size)
+        if os.path.exists(path):
+            # 修改时间即最近使用时间，淘汰时先删最旧的
+            os.utime(path)
+            return path
+        marker = self.marker(key, size)
+        if os.path.exists(marker):
+            os.utime(marker)
+            return str(source)
+        return self.generate(source, key)[size]
+
+    def generate(self, source, key):
+        """ 解码一次原图，写出还没有的尺寸，返回 {尺寸: 路径} """
+        paths = {}
+        written = 0
+        with Image.open(source) as image:
+            for size in self.sizes:
+                if max(image.size) <= size:
+                    marker = self.marker(key, size)
+                    if not os.path.exists(marker):
+                        os.makedirs(os.path.dirname(marker), exist_ok=True)
+                        open(marker, 'wb').close()
+                    paths[size] = str(source)
+                    continue
+                # thumbnail 原地缩小，下一档从这一档继续缩，不必再处理原图
+                image.thumbnail((size, size))
+                path = self.path(key, size)
+                # 已有的尺寸（例如其他线程刚生成的）不再重写，也不重复计入总大小
+                if not os.path.exists(path):
+                    written += self._write(image, path)
+                paths[size] = path
+        if written:
+            self._add_bytes(written)
+        return paths
+
+    def _write(self, image, path):
+        """ 先写临时文件再改名，并发生成同一张缩略图时不会读到写了一半的文件 """
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix='.png', dir=folder)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                # 缩略图读多写少，压缩级别取低一些以加快生成
+                image.save(f, format='PNG', compress_level=1)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return os.path.getsize(path)
+
+    def _files(self):
+        if not os.path.isdir(self.folder):
+            return []
+        files = []
+        for entry in os.scandir(self.folder):
+            if entry.is_dir():
+                files.extend(os.scandir(entry.path))
+        return [f for f in files if f.name.endswith(('.png', '.src'))]
+
+    def _add_bytes(self, size):
+        if self._bytes is None:
+            self._bytes = sum(f.stat().st_size for f in self._files())
+        else:
+            self._bytes += size
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """ 超过容量上限时删除最久未使用的缩略图，直到回到上限的 90% 以下 """
+        files = sorted(((f.stat().st_mtime, f.stat().st_size, f.path) for f in self._files()))
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._bytes = total
+
+    def clear(self):
+        for f in self._files():
+            os.remove(f.path)
+        self._bytes = 0
@@ -0,0 +1,387 @@
+# coding:utf-8
+"""
+监视文件夹，持续提取新放入或修改过的 PDF
+
+Linux 上用 inotify 等待文件写完或移入（IN_CLOSE_WRITE / IN_MOVED_TO），其他平台或
+inotify 不可用时定时扫描，文件大小和修改时间在相邻两次扫描间不变才认为已经写完。
+
+处理记录保存在输出文件夹的 .fundtable-watch.sqlite3 中，按 (路径, 大小, 修改时间, 配置)
+判断文件是否需要处理，重启后未变化的文件不会重新提取。内容相同的文件（按 sha256）
+只提取一次，其余直接复制已有的结果。提取在有界的进程池中进行，结果先写到输出
+文件夹中的隐藏临时文件，完成后再改名，输出文件夹中不会出现写了一半的结果。
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import shutil
+import sqlite3
+import struct
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import columnar, engine, parallel, writer
+from .cache import config_key, file_digest
+from .metrics import Metrics
+
+
+STATE_NAME = '.fundtable-watch.sqlite3'
+STATUS_NAME = 'watch-status.json'
+TEMP_SUFFIX = '.tmp'
+
+
+class Inotify:
+    """ 通过 ctypes 调用 Linux inotify，只报告写完和移入的文件名 """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, folder):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify 只在 Linux 上可用')
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'无法监视 {folder}')
+
+    def wait(self, timeout):
+        """ 最多等待 timeout 秒，返回这段时间内写完或移入的文件名列表 """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WatchState:
+    """ 已处理文件的记录 """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, '
+            'digest TEXT, config TEXT, output TEXT, status TEXT, error TEXT, time REAL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS files_digest ON files (digest)')
+
+    def unchanged(self, path, size, mtime, config):
+        """ 文件未变化且已经成功处理过；提取失败的文件重启后重新处理 """
+        row = self.db.execute('SELECT size, mtime, config, status FROM files WHERE path = ?', (path,)).fetchone()
+        return row == (size, mtime, config, 'done')
+
+    def output_for(self, digest, config):
+        """ 同样内容、同样配置已经提取过时返回 (现存的结果文件, 对应的 PDF) """
+        rows = self.db.execute(
+            "SELECT output, path FROM files WHERE digest = ? AND config = ? AND status = 'done'",
+            (digest, config)).fetchall()
+        for output, path in rows:
+            if os.path.exists(output):
+                return output, path
+        return None
+
+    def record(self, path, size, mtime, digest, config, output, status, error=None):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            (path, size, mtime, digest, config, output, status, error, time.time()))
+
+    def close(self):
+        self.db.close()
+
+
+def temp_path(target):
+    """ 与 target 同目录的隐藏临时文件名，改名到 target 是原子操作 """
+    folder, name = os.path.split(target)
+    return os.path.join(folder, f'.{name}.{uuid.uuid4().hex[:8]}{TEMP_SUFFIX}')
+
+
+def atomic_copy(source, target):
+    tmp = temp_path(target)
+    try:
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def process_file(path, out_path, format='json', keywords=engine.KEYWORDS, cache=None, prefilter=True, index=None):
+    """
+    提取一个 PDF，先写隐藏的临时文件再改名为 out_path，返回 (页数, 记录数)
+
+    传入 index（fundtable.search.FeeIndex）时结果写出后同时加入索引。
+    """
+    tmp = temp_path(out_path)
+    metrics = Metrics()
+    kept = []
+    try:
+        if format in columnar.FORMATS:
+            table = columnar.ColumnarTable()
+            for page, _, records in engine.iter_pages(path, keywords, cache=cache, prefilter=prefilter,
+                                                      metrics=metrics):
+                table.append_page(page, records)
+                kept.append((page, records))
+            table.save(tmp, format)
+            count = table.records
+        else:
+            count = writer.extract_to_file(path, tmp, format, keywords, resume=False, cache=cache,
+                                           prefilter=prefilter, metrics=metrics,
+                                           on_page=None if index is None else lambda *page: kept.append(page))
+        os.replace(tmp, out_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if index is not None:
+        index.add_document(path, kept)
+    return len(metrics.documents[-1]['pages']), count
+
+
+class Watcher:
+    """
+    监视 input 文件夹，把提取结果写到 output 文件夹
+
+    on_status(stats) 在每处理完一个文件后调用；stats 同时写入 output 中的 watch-status.json。
+    在多线程程序（例如 GUI）中使用时应传入 mp_context=multiprocessing.get_context('spawn')。
+    传入 index（fundtable.search.FeeIndex）时每个处理完的文件都加入索引。
+    """
+
+    def __init__(self, input, output, workers=None, format='json', keywords=engine.KEYWORDS, cache=None,
+                 prefilter=True, interval=2.0, poll=False, on_status=None, mp_context=None, index=None):
+        self.input = os.path.abspath(input)
+        self.output = os.path.abspath(output)
+        self.workers = workers or parallel.default_workers()
+        self.format = format
+        self.keywords = list(keywords)
+        self.cache = cache
+        self.prefilter = prefilter
+        self.interval = interval
+        self.poll = poll
+        self.on_status = on_status
+        self.mp_context = mp_context
+        self.index = index
+        self.config = json.dumps([format, config_key(keywords, prefilter)], ensure_ascii=False)
+
+        self.queue = deque()  # 等待处理的路径
+        self.queued = set()
+        self.running = {}  # future -> (路径, 大小, 修改时间, 哈希)
+        self.waiting = {}  # 正在提取的哈希 -> 等待复制结果的 [(路径, 大小, 修改时间)]
+        self.seen = {}  # 轮询模式下上一次扫描到的 (大小, 修改时间)
+        self.failed = {}  # 本次运行中提取失败的文件 -> (大小, 修改时间)，文件变化前不再重试
+        self.counters = {'processed': 0, 'duplicates': 0, 'failed': 0, 'pages': 0, 'records': 0}
+        self.recent = deque()  # 最近一分钟处理完的 (时间, 页数)
+        self.started = time.time()
+        self.inotify = None
+        self.state = None
+
+    def output_path(self, path):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.output, f'{stem}.{self.format}')
+
+    def _stat(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def scan(self, stable=True):
+        """ 扫描输入文件夹；stable 为 False 时只有两次扫描间没有变化的文件才入队 """
+        for entry in sorted(os.scandir(self.input), key=lambda e: e.name):
+            if entry.is_file() and entry.name.lower().endswith('.pdf'):
+                self.offer(entry.path, stable)
+
+    def offer(self, path, stable=True):
+        """ 文件需要处理时加入队列 """
+        if path in self.queued or not path.lower().endswith('.pdf'):
+            return
+        stat = self._stat(path)
+        if stat is None or self.failed.get(path) == stat or self.state.unchanged(path, *stat, self.config):
+            self.seen.pop(path, None)
+            return
+        if not stable and self.seen.get(path) != stat:
+            # 文件可能还在复制中，等下一次扫描确认
+            self.seen[path] = stat
+            return
+        self.seen.pop(path, None)
+        self.queue.append(path)
+        self.queued.add(path)
+
+    def dispatch(self, executor):
+        """ 把队列中的文件交给进程池，同时在运行的任务不超过进程数 """
+        while self.queue and len(self.running) < self.workers:
+            path = self.queue.popleft()
+            stat = self._stat(path)
+            if stat is None:
+                self.queued.discard(path)
+                continue
+            try:
+                digest = file_digest(path)
+            except OSError:
+                self.queued.discard(path)
+                continue
+            if digest in self.waiting:
+                self.waiting[digest].append((path, *stat))
+                continue
+            existing = self.state.output_for(digest, self.config)
+            # 开启索引前处理过的文件不在索引中，需要重新提取
+            if existing is not None and (self.index is None or self.index.is_current(existing[1])):
+                self._copy_result(*existing, path, stat, digest)
+                continue
+            future = executor.submit(process_file, path, self.output_path(path), self.format, self.keywords,
+                                     self.cache, self.prefilter, self.index)
+            self.running[future] = (path, *stat, digest)
+            self.waiting[digest] = []
+
+    def _copy_result(self, existing, source, path, stat, digest):
+        """ 内容与 source 相同的文件直接复制它的结果文件和索引 """
+        out_path = self.output_path(path)
+        try:
+            if os.path.abspath(existing) != out_path:
+                atomic_copy(existing, out_path)
+            if self.index is not None and self.index.copy_document(source, path) is None:
+                raise OSError(f'{source} 不在索引中')
+        except (OSError, sqlite3.Error) as e:
+            self._finish(path, stat, digest, 'failed', error=str(e))
+            return
+        self.counters['duplicates'] += 1
+        self._finish(path, stat, digest, 'done', out_path)
+
+    def collect(self):
+        """ 处理已经完成的任务，返回完成的个数 """
+        done = [future for future in self.running if future.done()]
+        for future in done:
+            path, size, mtime, digest = self.running.pop(future)
+            duplicates = self.waiting.pop(digest, [])
+            try:
+                pages, records = future.result()
+            except Exception as e:
+                self.counters['failed'] += 1
+                self._finish(path, (size, mtime), digest, 'failed', error=str(e))
+                print(f'{os.path.basename(path)}: 提取失败 {e}', file=sys.stderr)
+                # 内容相同的文件重新排队，由它们各自提取
+                for duplicate, *_ in duplicates:
+                    self.queue.append(duplicate)
+                continue
+            self.counters['processed'] += 1
+            self.counters['pages'] += pages
+            self.counters['records'] += records
+            self.recent.append((time.time(), pages))
+            out_path = self.output_path(path)
+            self._finish(path, (size, mtime), digest, 'done', out_path)
+            for duplicate, *stat in duplicates:
+                self._copy_result(out_path, path, duplicate, tuple(stat), digest)
+        if done:
+            self.report()
+        return len(done)
+
+    def _finish(self, path, stat, digest, status, output=None, error=None):
+        self.queued.discard(path)
+        if status == 'failed':
+            self.failed[path] = tuple(stat)
+        else:
+            self.failed.pop(path, None)
+        self.state.record(path, *stat, digest, self.config, output, status, error)
+        # 处理期间文件又被修改时，事件已因文件在队列中被忽略，这里补查一次
+        self.offer(path, stable=self.inotify is not None)
+
+    def stats(self):
+        now = time.time()
+        while self.recent and self.recent[0][0] < now - 60:
+            self.recent.popleft()
+        elapsed = max(now - self.started, 1e-9)
+        return dict(self.counters, **{
+            'queued': len(self.queue),
+            'running': len(self.running),
+            'backlog': len(self.queued),
+            'files_per_min': self.counters['processed'] / elapsed * 60,
+            'pages_per_s': self.counters['pages'] / elapsed,
+            'recent_pages_per_s': sum(pages for _, pages in self.recent) / 60,
+            'uptime': elapsed,
+            'mode': 'poll' if self.inotify is None else 'inotify',
+        })
+
+    def report(self):
+        stats = self.stats()
+        path = os.path.join(self.output, STATUS_NAME)
+        tmp = temp_path(path)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        if self.on_status is not None:
+            self.on_status(stats)
+
+    def _remove_stale_temp(self):
+        """ 上次异常退出时留下的临时文件 """
+        for entry in os.scandir(self.output):
+            if entry.name.startswith('.') and (entry.name.endswith(TEMP_SUFFIX) or
+                                               entry.name.endswith(TEMP_SUFFIX + '.part')):
+                os.remove(entry.path)
+
+    def run(self, stop=None, once=False):
+        """
+        持续处理直到 stop() 返回 True
+
+        once 为 True 时只处理启动时已有的文件，处理完即返回。
+        """
+        stop = stop or (lambda: False)
+        os.makedirs(self.output, exist_ok=True)
+        self._remove_stale_temp()
+        self.state = WatchState(os.path.join(self.output, STATE_NAME))
+        if not (self.poll or once):
+            try:
+                self.inotify = Inotify(self.input)
+            except OSError as e:
+                print(f'inotify 不可用，改为每 {self.interval} 秒扫描一次：{e}', file=sys.stderr)
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=self.mp_context) as executor:
+                self.scan()
+                self.report()
+                last_scan = time.time()
+                while not stop():
+                    self.dispatch(executor)
+                    self.collect()
+                    if once and not self.queued:
+                        break
+                    # 有任务在运行时缩短等待，及时收集结果
+                    timeout = 0.1 if self.running else self.interval
+                    if self.inotify is not None:
+                        for name in self.inotify.wait(timeout):
+                            self.offer(os.path.join(self.input, name))
+                    else:
+                        time.sleep(min(timeout, max(0, last_scan + self.interval - time.time())))
+                        if not once and time.time() - last_scan >= self.interval:
+                            self.scan(stable=False)
+                            last_scan = time.time()
+                for future in self.running:
+                    future.cancel()
+            # 退出进程池时会等待正在运行的任务，记下它们的结果，重启后不必重做
+            self.collect()
+        finally:
+            if self.inotify is not None:
+                self.inotify.close()
+                self.inotify = None
+            self.report()
+            self.state.close()
+        return self.stats()
@@ -0,0 +1,164 @@
+# coding:utf-8
+"""
+流式结果写入
+
+每页的记录提取出来后立即写入文件并刷盘，内存中不再保留整份结果。
+支持两种格式：
+
+- json：标准 JSON 数组，内容与 engine.save 的输出逐字节一致
+- ndjson：每行一条记录
+
+写入过程中会在输出文件旁维护一个 .part 检查点，记录已完成的页码和对应的
+文件偏移，以及输入文件和提取配置（关键词、预筛开关）。进程意外退出后以
+resume=True 重新打开，会截掉最后一页写了一半的内容，从下一页继续提取；输入或
+配置变化时从头开始，避免把两种配置的结果拼在一起。正常结束时删除检查点。
+"""
+import json
+import os
+
+from . import columnar, engine
+from .cache import config_key
+from .metrics import NULL_METRICS
+
+
+FORMATS = ('json', 'ndjson')
+
+
+def source_fingerprint(path):
+    """ 用文件大小和修改时间判断输入是否变化，变化后检查点作废 """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class StreamWriter:
+    """ 逐页写入提取结果 """
+
+    def __init__(self, path, format='json', source=None, resume=False, config=None):
+        if format not in FORMATS:
+            raise ValueError(f'不支持的输出格式: {format}')
+        self.path = str(path)
+        self.format = format
+        self.checkpoint_path = self.path + '.part'
+        self.fingerprint = source_fingerprint(source) if source else None
+        # 影响记录内容的配置，可以是任意能写成 JSON 的值
+        self.config = config
+        self.next_page = 0
+        self.records = 0
+
+        checkpoint = self._load_checkpoint() if resume else None
+        if checkpoint:
+            self.file = open(self.path, 'r+b')
+            self.file.truncate(checkpoint['offset'])
+            self.file.seek(checkpoint['offset'])
+            self.next_page = checkpoint['page'] + 1
+            self.records = checkpoint['records']
+        else:
+            self.file = open(self.path, 'wb')
+            if self.format == 'json':
+                self.file.write(b'[')
+            self._save_checkpoint(-1)
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (checkpoint.get('format') != self.format or checkpoint.get('source') != self.fingerprint
+                or checkpoint.get('config') != self.config):
+            return None
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < checkpoint['offset']:
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, page):
+        checkpoint = {
+            'format': self.format,
+            'source': self.fingerprint,
+            'config': self.config,
+            'page': page,
+            'offset': self.file.tell(),
+            'records': self.records,
+        }
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _encode(self, record):
+        if self.format == 'ndjson':
+            return json.dumps(record, ensure_ascii=False) + '\n'
+        text = ',\n' if self.records else '\n'
+        # 不能用 textwrap.indent：它按 str.splitlines 分行，会把值中的 \u2028、\x85 等字符也当作换行
+        return text + '  ' + json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+
+    def write_page(self, index, records):
+        """ 写入一页的记录并刷盘，之后即使进程退出这一页也不会丢失；返回写入的字节数 """
+        written = 0
+        for record in records:
+            written += self.file.write(self._encode(record).encode('utf-8'))
+            self.records += 1
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self._save_checkpoint(index)
+        self.next_page = index + 1
+        return written
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.format == 'json':
+            self.file.write(b'\n]' if self.records else b']')
+        self.file.close()
+        os.remove(self.checkpoint_path)
+
+    def abort(self):
+        """ 出错时只关闭文件，保留检查点以便之后续写 """
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def extract_to_file(path, out_path, format='json', keywords=engine.KEYWORDS, resume=True, cache=None,
+                    prefilter=True, metrics=None, memory=None, on_page=None):
+    """ 边提取边写入，返回写入的记录数；on_page(页码下标, 该页记录) 在每页写入后调用 """
+    metrics = metrics or NULL_METRICS
+    config = config_key(keywords, prefilter)
+    with StreamWriter(out_path, format, source=path, resume=resume, config=config) as writer:
+        pages = engine.iter_pages(path, keywords, writer.next_page, cache=cache, prefilter=prefilter,
+                                  metrics=metrics, memory=memory)
+        for index, total, records in pages:
+            with metrics.stage('write'):
+                metrics.count('bytes', writer.write_page(index, records), index)
+            if on_page is not None:
+                on_page(index, records)
+        return writer.records
+
+
+def save(result, out_path, format='json'):
+    """ 将已在内存中的结果按指定格式写入 """
+    with StreamWriter(out_path, format) as writer:
+        writer.write_page(0, result)
+
+
+def save_pages(pages, out_path, format='json'):
+    """ 把按页排列的记录写成与 extract 相同的文件（含列式格式），先写临时文件再改名，返回记录数 """
+    tmp = f'{out_path}.tmp'
+    if format in columnar.FORMATS:
+        table = columnar.ColumnarTable.from_pages(enumerate(pages))
+        table.save(tmp, format)
+        count = table.records
+    else:
+        with StreamWriter(tmp, format) as writer:
+            for index, records in enumerate(pages):
+                writer.write_page(index, records)
+        count = writer.records
+    os.replace(tmp, out_path)
+    return count
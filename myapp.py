@@ -1,13 +1,16 @@
 # coding:utf-8
 import sys
 from pathlib import Path
-import pdfplumber
-import json
 import os
 import time
 
-from PySide6.QtCore import Qt, QPoint, QSize, QUrl, QRect, QPropertyAnimation,QTimer,QRegularExpression
-from PySide6.QtGui import QIcon, QFont, QColor, QPainter,QPixmap,QSyntaxHighlighter, QTextCharFormat
+# 启动计时从模块加载开始，到主窗口第一次绘制为止
+STARTUP_T0 = time.perf_counter()
+# 首屏绘制的耗时预算（秒），可以用环境变量 FUNDTABLE_STARTUP_BUDGET 修改
+STARTUP_BUDGET = float(os.environ.get('FUNDTABLE_STARTUP_BUDGET', 1.0))
+
+from PySide6.QtCore import Qt, QPoint, QSize, QUrl, QRect, QPropertyAnimation,QTimer,QRegularExpression,QThread,Signal,QObject,QThreadPool
+from PySide6.QtGui import QIcon, QFont, QColor, QPainter,QPixmap,QSyntaxHighlighter, QTextCharFormat,QImage
 from PySide6.QtWidgets import QApplication, QWidget, QHBoxLayout, QVBoxLayout, QGraphicsOpacityEffect,QLabel
 
 from qfluentwidgets import (CardWidget, setTheme, Theme, IconWidget, BodyLabel, CaptionLabel, PushButton,
@@ -15,11 +18,167 @@ from qfluentwidgets import (CardWidget, setTheme, Theme, IconWidget, BodyLabel,
                             ImageLabel, isDarkTheme, FlowLayout, MSFluentTitleBar, SimpleCardWidget,
                             HeaderCardWidget, InfoBarIcon, HyperlinkLabel, HorizontalFlipView,
                             PrimaryPushButton, TitleLabel, PillPushButton, setFont, SingleDirectionScrollArea,StateToolTip,
-                            VerticalSeparator, FluentWindow, NavigationItemPosition,FolderListDialog,PrimaryPushButton,PushButton,TextEdit,IndeterminateProgressBar)
+                            VerticalSeparator, FluentWindow, NavigationItemPosition,FolderListDialog,PrimaryPushButton,PushButton,TextEdit,IndeterminateProgressBar,ProgressBar)
 
 from qfluentwidgets.components.widgets.acrylic_label import AcrylicBrush
 
+import json
+import threading
+from collections import OrderedDict
+
+# fundtable 会导入 pdfplumber，只在开始提取时才在工作线程中导入，见 ExtractWorker.run
+
+
+TABLE_IMAGES = ['resource/1_square.png', 'resource/2_square.png', 'resource/3_square.png', 'resource/4_square.png']
+
+
+class ThumbnailProvider(QObject):
+    """
+    图片的内存 LRU 缓存，GalleryCard 与 LightBox 共用
+
+    pixels 为需要的最长边像素数，缩略图由 fundtable.thumbnails 在磁盘上生成和缓存，
+    pixels 为 0 时读取原图。解码在线程池中进行，完成后发出 loaded。
+    """
+
+    loaded = Signal(str, int, QImage)  # 原图路径, pixels, 图片
+
+    def __init__(self, max_bytes=96 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()
+        self.bytes = 0
+        self.pending = set()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.disk = None
+        self.diskLock = threading.Lock()
+        # 先于各个视图连接，视图收到信号时图片已经进入缓存
+        self.loaded.connect(self._store)
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+
+    def shutdown(self):
+        """ 退出前丢弃排队的任务并等待正在解码的完成 """
+        self.pool.clear()
+        self.pool.waitForDone()
+
+    def get(self, path, pixels):
+        """ 已缓存时返回 QImage，否则开始加载并返回 None """
+        key = (path, pixels)
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+            return image
+        if key not in self.pending:
+            self.pending.add(key)
+            self.pool.start(lambda: self._load(path, pixels))
+        return None
+
+    def _load(self, path, pixels):
+        # 在工作线程中执行，QImage 可以跨线程使用
+        source = path
+        if pixels:
+            from fundtable.thumbnails import ThumbnailCache, choose_size
+            with self.diskLock:
+                if self.disk is None:
+                    self.disk = ThumbnailCache()
+            try:
+                source = self.disk.get(path, choose_size(pixels))
+            except OSError:
+                source = path
+        self.loaded.emit(path, pixels, QImage(source))
+
+    def _store(self, path, pixels, image):
+        key = (path, pixels)
+        self.pending.discard(key)
+        if image.isNull():
+            return
+        self.images[key] = image
+        self.bytes += image.sizeInBytes()
+        while self.bytes > self.max_bytes and len(self.images) > 1:
+            _, old = self.images.popitem(last=False)
+            self.bytes -= old.sizeInBytes()
+
+
+THUMBNAILS = None
+
+
+def thumbnails():
+    global THUMBNAILS
+    if THUMBNAILS is None:
+        THUMBNAILS = ThumbnailProvider()
+    return THUMBNAILS
+
+
+class LazyFlipView(HorizontalFlipView):
+    """ 只解码当前和相邻的图片，其余位置为空白占位，翻走后释放 """
+
+    def __init__(self, fullSize=False, parent=None):
+        super().__init__(parent)
+        self.fullSize = fullSize
+        self.paths = []
+        # 空的 QImage 会让 HorizontalFlipView 按路径读取，占位用 1x1 的透明图片
+        self.placeholder = QImage(1, 1, QImage.Format_ARGB32)
+        self.placeholder.fill(Qt.transparent)
+        self.currentIndexChanged.connect(self.loadAround)
+        thumbnails().loaded.connect(self._onImageLoaded)
+
+    def setPaths(self, paths):
+        self.clear()
+        self.paths = list(paths)
+        self.addImages([self.placeholder] * len(self.paths))
+        if self.paths:
+            self.scrollToIndex(0)
+            self.loadAround(0)
+
+    def pixels(self):
+        """ 需要的图片最长边，灯箱显示原图 """
+        if self.fullSize:
+            return 0
+        size = self.getItemSize()
+        return round(max(size.width(), size.height()) * self.devicePixelRatioF())
+
+    def loadAround(self, index):
+        pixels = self.pixels()
+        for i in range(self.count()):
+            if abs(i - index) <= 1:
+                image = thumbnails().get(self.paths[i], pixels)
+                if image is not None:
+                    self.setItemImage(i, image)
+            elif self.image(i).cacheKey() != self.placeholder.cacheKey():
+                self.setItemImage(i, self.placeholder)
+
+    def _onImageLoaded(self, path, pixels, image):
+        if pixels != self.pixels():
+            return
+        index = self.currentIndex()
+        for i in range(max(0, index - 1), min(self.count(), index + 2)):
+            if self.paths[i] == path:
+                self.setItemImage(i, image)
+
+
+class LazyInterface(QWidget):
+    """ 子页面占位，第一次切换到该页时才创建真正的界面 """
+
+    built = Signal(QWidget)
+
+    def __init__(self, factory, objectName, parent=None):
+        super().__init__(parent)
+        self.factory = factory
+        self.interface = None
+        self.setObjectName(objectName)
+        self.vBoxLayout = QVBoxLayout(self)
+        self.vBoxLayout.setContentsMargins(0, 0, 0, 0)
+
+    def build(self):
+        if self.interface is None:
+            self.interface = self.factory(self)
+            self.vBoxLayout.addWidget(self.interface)
+            self.built.emit(self.interface)
+        return self.interface
 
+    def showEvent(self, e):
+        self.build()
+        super().showEvent(e)
 
 
 class LightBox(QWidget):
@@ -41,7 +200,7 @@ class LightBox(QWidget):
 
         self.vBoxLayout = QVBoxLayout(self)
         self.closeButton = TransparentToolButton(FluentIcon.CLOSE, self)
-        self.flipView = HorizontalFlipView(self)
+        self.flipView = LazyFlipView(True, self)
         self.nameLabel = BodyLabel('表格图片 1', self)
         self.pageNumButton = PillPushButton('1 / 4', self)
 
@@ -60,10 +219,6 @@ class LightBox(QWidget):
         self.vBoxLayout.addSpacing(10)
         self.vBoxLayout.addWidget(self.pageNumButton, 0, Qt.AlignHCenter)
 
-        self.flipView.addImages([
-            'resource/1_square.png', 'resource/2_square.png',
-            'resource/3_square.png', 'resource/4_square.png',
-        ])
         self.flipView.currentIndexChanged.connect(self.setCurrentIndex)
 
     def setCurrentIndex(self, index: int):
@@ -119,16 +274,13 @@ class GalleryCard(HeaderCardWidget):
         super().__init__(parent)
         self.setTitle('对应表格图片')
 
-        self.flipView = HorizontalFlipView(self)
+        self.flipView = LazyFlipView(False, self)
 
         self.expandButton = TransparentToolButton(
             FluentIcon.CHEVRON_RIGHT_MED, self)
         self.expandButton.setFixedSize(32, 32)
         self.expandButton.setIconSize(QSize(12, 12))
 
-        images = ['resource/1_square.png', 'resource/2_square.png', 'resource/3_square.png', 'resource/4_square.png']
-
-        self.flipView.addImages(images)
         self.flipView.setBorderRadius(8)
         self.flipView.setSpacing(10)
 
@@ -152,6 +304,10 @@ class DescriptionCard(HeaderCardWidget):
 
 
 class JsonHighlighter(QSyntaxHighlighter):
+
+    # 字符串内允许转义的引号，避免懒惰匹配 ".*?" 的回溯
+    STRING = r'"(?:[^"\\]|\\.)*"'
+
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
@@ -163,34 +319,131 @@ class JsonHighlighter(QSyntaxHighlighter):
         bracket_format = QTextCharFormat()
         bracket_format.setForeground(QColor(30, 144, 255))  # 深蓝色
 
+        # 正则只在这里编译一次，highlightBlock 中直接复用
         self.highlighting_rules = [
-            (r'".*?"\s*(?=:)', key_format),  # 匹配key并高亮为浅蓝色
-            (r'(?<=:)\s*(".*?")', value_format),  # 匹配冒号后的value并高亮为橘黄色
-            (r'[{}]', bracket_format)  # 匹配大括号并高亮为深蓝色
+            (QRegularExpression(self.STRING + r'(?=\s*:)'), 0, key_format),  # 匹配key并高亮为浅蓝色
+            (QRegularExpression(r':\s*(' + self.STRING + ')'), 1, value_format),  # 匹配冒号后的value并高亮为橘黄色
+            (QRegularExpression(r'[{}]'), 0, bracket_format)  # 匹配大括号并高亮为深蓝色
         ]
 
     def highlightBlock(self, text):
-        for pattern, char_format in self.highlighting_rules:
-            expression = QRegularExpression(pattern)
-            match = expression.match(text)
-            while match.hasMatch():
-                length = match.capturedLength()
-                self.setFormat(match.capturedStart(), length, char_format)
-                match = expression.match(text, match.capturedEnd())
+        for expression, group, char_format in self.highlighting_rules:
+            matches = expression.globalMatch(text)
+            while matches.hasNext():
+                match = matches.next()
+                self.setFormat(match.capturedStart(group), match.capturedLength(group), char_format)
+
+
+class LinePager:
+    """ 按行分页读取结果文件，只为已经翻到的页建立偏移索引，首屏耗时与文件大小无关 """
+
+    def __init__(self, path, page_lines=400):
+        self.path = path
+        self.page_lines = page_lines
+        self.reload()
+
+    def reload(self):
+        self.offsets = [0]
+        self.at_end = False
+
+    def read(self, index):
+        """ 读取第 index 页的文本，页码超出时返回 None """
+        while len(self.offsets) <= index:
+            if self.at_end or self.read(len(self.offsets) - 1) is None:
+                return None
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offsets[index])
+                lines = [f.readline() for _ in range(self.page_lines)]
+                end = f.tell()
+                more = bool(f.read(1))
+        except OSError:
+            return None
+        lines = [line for line in lines if line]
+        if not lines and index:
+            return None
+        if more and len(self.offsets) == index + 1:
+            self.offsets.append(end)
+        self.at_end = not more
+        return b''.join(lines).decode('utf-8', errors='replace').rstrip('\n')
+
+    def has_next(self, index):
+        return len(self.offsets) > index + 1
 
 
 class LineEditCard(HeaderCardWidget):
+    """ 分页浏览 JSON 结果，每次只加载一页 """
 
     def __init__(self,parent=None):
         super().__init__(parent)
         self.textEdit = TextEdit(self)
-        with open('output.json', 'r',encoding="utf-8") as file:
-            jsonCode = file.read()
-        self.textEdit.setPlainText(jsonCode)
+        self.textEdit.setReadOnly(True)
         self.json_highlighter = JsonHighlighter(self.textEdit.document())
+        self.pager = LinePager('output.json')
+        self.pageIndex = 0
+
+        self.pageLayout = QHBoxLayout()
+        self.prevButton = PushButton("上一页", self, FluentIcon.LEFT_ARROW)
+        self.nextButton = PushButton("下一页", self, FluentIcon.RIGHT_ARROW)
+        self.pageLabel = CaptionLabel('', self)
+        self.prevButton.clicked.connect(lambda: self.showPage(self.pageIndex - 1))
+        self.nextButton.clicked.connect(lambda: self.showPage(self.pageIndex + 1))
+        self.pageLayout.addWidget(self.prevButton)
+        self.pageLayout.addWidget(self.pageLabel, 1, Qt.AlignCenter)
+        self.pageLayout.addWidget(self.nextButton)
+
         self.viewLayout.addWidget(self.textEdit)
+        self.viewLayout.addLayout(self.pageLayout)
         self.setTitle("JSON识别结果浏览")
-
+        self.recordCount = 0
+        self.liveLines = 0
+
+        self.showPage(0)
+
+    def showPage(self, index):
+        if index < 0:
+            return
+        text = self.pager.read(index)
+        if text is None:
+            if index:
+                return
+            text = ''
+        self.pageIndex = index
+        self.textEdit.setPlainText(text)
+        self.prevButton.setEnabled(index > 0)
+        self.nextButton.setEnabled(self.pager.has_next(index))
+        self.pageLabel.setText(f'第 {index + 1} 页')
+
+    def startRecords(self):
+        """ 新一轮提取开始，清空旧结果 """
+        self.recordCount = 0
+        self.liveLines = 1
+        self.textEdit.setPlainText('[')
+        self.prevButton.setEnabled(False)
+        self.nextButton.setEnabled(False)
+        self.pageLabel.setText('正在提取…')
+
+    def appendRecords(self, records):
+        """ 提取过程中把记录追加到第一页，超过一页后只更新计数 """
+        text = ''
+        for record in records:
+            self.recordCount += 1
+            if self.liveLines >= self.pager.page_lines:
+                continue
+            # 只在真正的换行处缩进，值中的 \u2028 等字符不能当作换行
+            block = '  ' + json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+            text += (',\n' if self.recordCount > 1 else '\n') + block
+            self.liveLines += block.count('\n') + 1
+        if text:
+            cursor = self.textEdit.textCursor()
+            cursor.movePosition(cursor.MoveOperation.End)
+            cursor.insertText(text)
+        self.pageLabel.setText(f'正在提取… 已有 {self.recordCount} 条记录')
+
+    def finishRecords(self):
+        """ 提取结束后从结果文件重新分页，只读取第一页 """
+        self.pager.reload()
+        self.showPage(0)
 
 
 class ViewAppInterface(SingleDirectionScrollArea):
@@ -205,9 +458,10 @@ class ViewAppInterface(SingleDirectionScrollArea):
         self.descriptionCard = DescriptionCard(self)
         self.lineEdit=LineEditCard(self)
 
-        self.lightBox = LightBox(self)
-        self.lightBox.hide()
+        # 灯箱在第一次点开图片时才创建
+        self.lightBox = None
         self.galleryCard.flipView.itemClicked.connect(self.showLightBox)
+        self.setImages(TABLE_IMAGES)
 
         self.setWidget(self.view)
         self.setWidgetResizable(True)
@@ -223,22 +477,114 @@ class ViewAppInterface(SingleDirectionScrollArea):
         self.setStyleSheet("QScrollArea {border: none; background:transparent}")
         self.view.setStyleSheet('QWidget {background:transparent}')
 
+    def setImages(self, paths):
+        """ 更换展示的表格图片，只保存路径，图片在翻到附近时才加载 """
+        self.imagePaths = list(paths)
+        self.galleryCard.flipView.setPaths(self.imagePaths)
+        if self.lightBox is not None:
+            self.lightBox.flipView.setPaths(self.imagePaths)
+
     def showLightBox(self):
+        if self.lightBox is None:
+            self.lightBox = LightBox(self)
+            self.lightBox.resize(self.size())
+            self.lightBox.flipView.setPaths(self.imagePaths)
         index = self.galleryCard.flipView.currentIndex()
         self.lightBox.setCurrentIndex(index)
         self.lightBox.fadeIn()
 
     def resizeEvent(self, e):
         super().resizeEvent(e)
-        self.lightBox.resize(self.size())
+        if self.lightBox is not None:
+            self.lightBox.resize(self.size())
+
+
+class ExtractWorker(QThread):
+    """ 在后台线程中逐页提取并逐页写入结果文件，避免阻塞界面 """
+
+    pageExtracted = Signal(int, int, list)  # 页码下标, 总页数, 该页记录
+    extractFinished = Signal(int, str)  # 记录总数, 统计摘要
+    extractFailed = Signal(str)
+
+    def __init__(self, path, out_path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.out_path = out_path
+
+    # 单页的时间上限（秒），超时的页用更省事的设置重试，仍失败则记为空
+    PAGE_TIMEOUT = 60
+
+    def run(self):
+        import multiprocessing
+        from fundtable.cache import ResultCache
+        from fundtable.isolate import IsolatedExtractor
+        from fundtable.metrics import Metrics, summary
+        from fundtable.writer import StreamWriter
+
+        metrics = Metrics()
+        errors = []
+        # 在子进程中逐页提取，卡住或崩溃的页不会拖住界面；界面进程有多个线程，子进程用 spawn 启动
+        extractor = IsolatedExtractor(page_timeout=self.PAGE_TIMEOUT, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            with StreamWriter(self.out_path, source=self.path) as writer:
+                # 缓存在本线程内创建，SQLite 连接不能跨线程使用
+                pages = extractor.iter_pages(self.path, cache=ResultCache(), metrics=metrics, on_error=errors.append,
+                                             should_stop=self.isInterruptionRequested)
+                for index, total, records in pages:
+                    with metrics.stage('write'):
+                        metrics.count('bytes', writer.write_page(index, records), index)
+                    self.pageExtracted.emit(index, total, records)
+                    if self.isInterruptionRequested():
+                        break
+                if self.isInterruptionRequested():
+                    writer.abort()
+                    return
+        except Exception as e:
+            self.extractFailed.emit(str(e))
+            return
+        stats = summary(metrics.documents[-1])
+        failed = [error for error in errors if not error['recovered']]
+        if failed:
+            stats += f'  {len(failed)} 页超时或出错，已记为空'
+        self.extractFinished.emit(writer.records, stats)
+
+
+class WatchWorker(QThread):
+    """ 在后台线程中监视输入文件夹，持续提取新放入或修改过的 PDF """
+
+    statusChanged = Signal(dict)
+    watchFailed = Signal(str)
+
+    def __init__(self, input_folder, output_folder, parent=None):
+        super().__init__(parent)
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+
+    def run(self):
+        import multiprocessing
+        from fundtable.cache import ResultCache
+        from fundtable.watch import Watcher
+
+        try:
+            # 界面进程有多个线程，子进程用 spawn 启动，不能 fork
+            watcher = Watcher(self.input_folder, self.output_folder, cache=ResultCache(),
+                              on_status=self.statusChanged.emit, mp_context=multiprocessing.get_context('spawn'))
+            watcher.run(self.isInterruptionRequested)
+        except Exception as e:
+            self.watchFailed.emit(str(e))
 
 
 class SettingAppInterface(SingleDirectionScrollArea):
+
+    extractStarted = Signal()
+    recordsExtracted = Signal(list)
+    extractStopped = Signal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
-        # self.input_folder = 
-        # self.output_folder = 
+        self.input_folder = None
+        self.output_folder = None
 
         self.view = QWidget(self)
 
@@ -257,15 +603,37 @@ class SettingAppInterface(SingleDirectionScrollArea):
         self.selectOutputFolderButton.clicked.connect(self.show_output_folder_dialog)
         self.horizontalLayout.addWidget(self.selectOutputFolderButton)
 
+        # 选好两个文件夹后可以开始监视，持续提取放入输入文件夹的 PDF
+        self.watchButton = PushButton("监视文件夹", self, FluentIcon.SYNC)
+        self.watchButton.clicked.connect(self.toggle_watch)
+        self.watchButton.setEnabled(False)
+        self.horizontalLayout.addWidget(self.watchButton)
+
         # 将水平布局添加到垂直布局中
         self.vBoxLayout.addLayout(self.horizontalLayout)
+        self.folderLabel = CaptionLabel('尚未选择输入和输出文件夹', self)
+        self.vBoxLayout.addWidget(self.folderLabel)
 
         # 添加“开始运行”按钮
         self.startButton = PrimaryPushButton("提取表格", self, FluentIcon.PLAY)
         self.startButton.clicked.connect(self.start_execution)
         self.vBoxLayout.addWidget(self.startButton)
 
+        # 提取进度：进度条、速度与剩余时间、取消按钮
+        self.progressLayout = QHBoxLayout()
+        self.progressBar = ProgressBar(self)
+        self.progressLabel = CaptionLabel('', self)
+        self.cancelButton = PushButton("取消", self, FluentIcon.CANCEL)
+        self.cancelButton.clicked.connect(self.cancel_execution)
+        self.cancelButton.setEnabled(False)
+        self.progressLayout.addWidget(self.progressBar, 1)
+        self.progressLayout.addWidget(self.progressLabel)
+        self.progressLayout.addWidget(self.cancelButton)
+        self.vBoxLayout.addLayout(self.progressLayout)
+
         self.stateTooltip = None
+        self.worker = None
+        self.watchWorker = None
        
 
         self.setWidget(self.view)
@@ -280,197 +648,136 @@ class SettingAppInterface(SingleDirectionScrollArea):
         self.view.setStyleSheet('QWidget {background:transparent}')
 
     def show_input_folder_dialog(self):
-        folder_paths = []  # 输入文件夹路径列表
+        folder_paths = [self.input_folder] if self.input_folder else []  # 输入文件夹路径列表
         title = "请选择PDF文件"
         content = "请选择输入文件所在的文件夹"
         dialog = FolderListDialog(folder_paths, title, content, parent=self)
-        if dialog.exec_():
-            self.input_folder = dialog.selected_folder
-            self.start_execution(self.input_folder, self.output_folder)
-        #dialog.exec_()
+        # 列表中最后添加的文件夹生效
+        dialog.folderChanged.connect(lambda folders: self.set_folders(folders[-1] if folders else None,
+                                                                      self.output_folder))
+        dialog.exec_()
 
     def show_output_folder_dialog(self):
-        default_output_folder = "~/Desktop"  # 默认输出文件夹为桌面
+        default_output_folder = os.path.expanduser("~/Desktop")  # 默认输出文件夹为桌面
         title = "选择输出文件夹位置"
         content = "请选择输出文件的保存文件夹"
-        dialog = FolderListDialog([default_output_folder], title, content, parent=self)
-        if dialog.exec_():
-            self.output_folder = dialog.selected_folder
-            self.start_execution(self.input_folder, self.output_folder)
-        #dialog.exec_()
-    
-    def complete_training(self):
-        if self.stateTooltip:
-            self.stateTooltip.setContent('表格提取完成啦 😆')
-            self.stateTooltip.setState(True)
-            self.stateTooltip = None
-        self.timer.stop()
+        dialog = FolderListDialog([self.output_folder or default_output_folder], title, content, parent=self)
+        dialog.folderChanged.connect(lambda folders: self.set_folders(self.input_folder,
+                                                                      folders[-1] if folders else None))
+        dialog.exec_()
+
+    def set_folders(self, input_folder, output_folder):
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.folderLabel.setText(f'输入：{input_folder or "未选择"}    输出：{output_folder or "未选择"}')
+        self.watchButton.setEnabled(bool(input_folder and output_folder) or self.watchWorker is not None)
+
+    def toggle_watch(self):
+        if self.watchWorker is not None:
+            self.watchWorker.requestInterruption()
+            self.watchButton.setEnabled(False)
+            self.progressLabel.setText('正在停止监视，等待进行中的文件完成…')
+            return
+        self.watchWorker = WatchWorker(self.input_folder, self.output_folder, self)
+        self.watchWorker.statusChanged.connect(self.on_watch_status)
+        self.watchWorker.watchFailed.connect(lambda message: self.progressLabel.setText(f'监视失败：{message}'))
+        self.watchWorker.finished.connect(self.on_watch_finished)
+        self.watchButton.setText('停止监视')
+        self.progressLabel.setText(f'正在监视 {self.input_folder}')
+        self.watchWorker.start()
+
+    def on_watch_status(self, stats):
+        self.progressLabel.setText(
+            f'已处理 {stats["processed"]} 个（重复 {stats["duplicates"]}，失败 {stats["failed"]}）  '
+            f'积压 {stats["backlog"]} 个  {stats["files_per_min"]:.1f} 个/分钟  {stats["pages_per_s"]:.1f} 页/秒')
+
+    def on_watch_finished(self):
+        self.watchWorker.deleteLater()
+        self.watchWorker = None
+        self.watchButton.setText('监视文件夹')
+        self.set_folders(self.input_folder, self.output_folder)
     
     def start_execution(self):
-    #def start_execution(self, input_folder, output_folder):
         # 当点击“开始运行”按钮时执行的内容
-        #default_input_folder = "~/Desktop/服务外包/interface"
-
-        # self.progress_bar = IndeterminateProgressBar(self)
-        # self.vBoxLayout.addWidget(self.progress_bar)
+        if self.worker is not None:
+            return
 
-
-
-        default_output_folder = "C:/princ/Desktop/服务外包/interface"
-
-
-
-        #path = os.path.join(default_input_folder, "in.pdf")
         #输入路径
-        path = "C:/princ/Desktop/服务外包/interface/in.pdf"
-
-        def has_none_value(matrix):
-            for row in matrix:
-                for element in row:
-                    if element is None:
-                        return True
-            return False
-
-        def count_consecutive_none(matrix):
-            count = 0
-            for row in matrix:
-                if row[0] is None:
-                    count += 1
-            return count
-
-        def fill_empty_with_previous(lst):
-            for i in range(1, len(lst)):
-                if lst[i] is None:
-                    lst[i] = lst[i-1]
-            return lst
-
-        def process_table(table, table_head, keywords):
-            result = []
-            for row in table[1:]:
-                row_data = {}
-                for i, keyword in enumerate(keywords):
-                    if keyword in row[0]:
-                        row[0] = row[0].replace("\n", " ")
-                        temp = {}
-                        for j, value in enumerate(row[1:]):
-                            if value:
-                                value = value.replace("\n", " ")
-                            temp[table_head[j]] = str(value)
-                        row_data[row[0]] = temp if len(temp) > 1 else temp[table_head[0]]
-                if row_data:
-                    result.append(row_data)
-            return result
-
-        keywords = ['申购', '赎回', '认购', '管理']
-        result = []
-        T1 = time.time()
         path = r"in.pdf"
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                for table in tables:
-                    if table:
-                        if has_none_value(table):
-                            # 复杂表格
-                            deepth = count_consecutive_none(table) + 1
-                            for index in range(1, len(table)):
-                                if (table[index][0] == None):
-                                    table[index][0] = table[index - 1][0] 
-                            if deepth == 2:
-                                table[0][1:] = fill_empty_with_previous(table[0][1:])
-                                table[1][1:] = fill_empty_with_previous(table[1][1:])
-                                table_head = []
-                                for i in range(len(table[0][1:])):
-                                    table_head.append(table[0][1:][i] + table[1][1:][i])
-                                print(table_head)
-                                for row in table[deepth:]:
-                                    row_data = {}
-                                    for i, keyword in enumerate(keywords):
-                                        if keyword in row[0]:
-                                            row[0] = row[0].replace("\n", " ")
-                                            temp = {}
-                                            for j, value in enumerate(row[1:]):
-                                                if value:
-                                                    value = value.replace("\n", " ")
-                                                table_head[j] = table_head[j].replace("\n", " ")
-                                                temp[table_head[j]] = str(value)
-                                            row_data[row[0]] = temp if len(temp) > 1 else temp
-                                            # [table_head[0]] 这个代码接到上一行可以实现赛题示例的那个效果
-                                    if row_data:
-                                        result.append(row_data)
-                            if deepth == 3:
-                                    table[0][1:] = fill_empty_with_previous(table[0][1:])
-                                    table[1][1:] = fill_empty_with_previous(table[1][1:])
-                                    table[2][1:] = fill_empty_with_previous(table[2][1:])
-                                    table_head = []
-                                    for i in range(len(table[0][1:])):
-                                        table_head.append(table[0][1:][i] + table[1][1:][i])
-                                    print(table_head)
-                                    for row in table[deepth - 1:]:
-                                        row_data = {}
-                                        for i, keyword in enumerate(keywords):
-                                            if keyword in row[0]:
-                                                row[0] = row[0].replace("\n", " ")
-                                                temp = {}
-                                                for j, value in enumerate(row[1:]):
-                                                    if value:
-                                                        value = value.replace("\n", " ")
-                                                    table_head[j] = table_head[j].replace("\n", " ")
-                                                    temp[table_head[j]] = str(value)
-                                                row_data[row[0]] = temp if len(temp) > 1 else temp
-                                                # [table_head[0]] 这个代码接到上一行可以实现赛题示例的那个效果
-                                        if row_data:
-                                            result.append(row_data)
-                        else:
-                            # 简单表格
-                            table_head = table[0][1:]
-                            for row in table[1:]:
-                                row_data = {}
-                                for i, keyword in enumerate(keywords):
-                                    if keyword in row[0]:
-                                        row[0] = row[0].replace("\n", " ")
-                                        temp = {}
-                                        for j, value in enumerate(row[1:]):
-                                            if value:
-                                                value = value.replace("\n", " ")
-                                            table_head[j] = table_head[j].replace("\n", " ")
-                                            temp[table_head[j]] = str(value)
-                                        row_data[row[0]] = temp if len(temp) > 1 else temp
-                                        # [table_head[0]] 这个代码接到上一行可以实现赛题示例的那个效果
-                                if row_data:
-                                    result.append(row_data)
-
-        T2 = time.time()
-        result_json = json.dumps(result, ensure_ascii=False, indent=2)
-        print((T2-T1)*1000)
-        #输出
-        with open('output.json', 'w', encoding='utf-8') as f:
-            f.write(result_json)
+
+        self.worker = ExtractWorker(path, 'output.json', self)
+        self.worker.pageExtracted.connect(self.on_page_extracted)
+        self.worker.extractFinished.connect(self.on_extract_finished)
+        self.worker.extractFailed.connect(self.on_extract_failed)
+        self.worker.finished.connect(self.on_worker_finished)
+
+        self.progressBar.setValue(0)
+        self.progressLabel.setText('正在打开PDF…')
+        self.startButton.setEnabled(False)
+        self.cancelButton.setEnabled(True)
 
         self.stateTooltip = StateToolTip('正在提取表格', '客官请耐心等待哦~~', self)
         self.stateTooltip.move(510, 30)
         self.stateTooltip.show()
 
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.complete_training)
-        self.timer.start(2000)  # 10秒后触发 timeout 信号
-        
-
-        
-
-        
-
+        self.T1 = time.time()
+        self.extractStarted.emit()
+        self.worker.start()
+
+    def cancel_execution(self):
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            self.cancelButton.setEnabled(False)
+            self.progressLabel.setText('正在取消…')
+
+    def on_page_extracted(self, index, total, records):
+        done = index + 1
+        elapsed = time.time() - self.T1
+        speed = done / elapsed if elapsed > 0 else 0
+        eta = (total - done) / speed if speed else 0
+        self.progressBar.setMaximum(total)
+        self.progressBar.setValue(done)
+        self.progressLabel.setText(f'{done} / {total} 页  {speed:.1f} 页/秒  剩余 {eta:.0f} 秒')
+        if records:
+            self.recordsExtracted.emit(records)
+
+    def on_extract_finished(self, count, stats):
+        self.progressLabel.setText(f'{count} 条记录  {stats}')
+        self.close_state_tooltip('表格提取完成啦 😆', True)
+
+    def on_extract_failed(self, message):
+        self.close_state_tooltip(f'提取失败：{message}', False)
+
+    def on_worker_finished(self):
+        if self.worker.isInterruptionRequested():
+            self.close_state_tooltip('已取消提取', False)
+            self.progressLabel.setText('已取消')
+        self.worker.deleteLater()
+        self.worker = None
+        self.startButton.setEnabled(True)
+        self.cancelButton.setEnabled(False)
+        self.extractStopped.emit()
+
+    def close_state_tooltip(self, content, state):
+        if self.stateTooltip:
+            self.stateTooltip.setContent(content)
+            self.stateTooltip.setState(state)
+            self.stateTooltip = None
 
 
 class MainWindow(FluentWindow):
 
+    firstPainted = Signal(float)  # 从启动到第一次绘制的秒数
+
     def __init__(self):
         super().__init__()
         #self.initWindow()
-        #创建子页面
-        self.viewAppInterface = ViewAppInterface(self)
+        #创建子页面，“查看结果”页要读取结果文件和解码图片，第一次切换过去时才创建
+        self.viewAppInterface = LazyInterface(ViewAppInterface, "viewAppInterface", self)
         self.settingAppInterface = SettingAppInterface(self)
         self.navigationInterface.setAcrylicEnabled(True)
+        self.viewAppInterface.built.connect(self.on_view_built)
+        self.firstPaint = None
 
         self.addSubInterface(self.settingAppInterface,FluentIcon.SETTING, "设置参数", FluentIcon.LIBRARY_FILL, isTransparent=False)
         self.addSubInterface(self.viewAppInterface,FluentIcon.EDIT, "查看结果", FluentIcon.LABEL, isTransparent=False)
@@ -482,6 +789,30 @@ class MainWindow(FluentWindow):
 
         self.titleBar.raise_()
 
+    def on_view_built(self, view):
+        # 提取过程中把结果实时推送到“查看结果”页
+        self.settingAppInterface.extractStarted.connect(view.lineEdit.startRecords)
+        self.settingAppInterface.recordsExtracted.connect(view.lineEdit.appendRecords)
+        self.settingAppInterface.extractStopped.connect(view.lineEdit.finishRecords)
+        if self.settingAppInterface.worker is not None:
+            # 提取进行中才打开该页，之后的记录从这里开始实时显示
+            view.lineEdit.startRecords()
+
+    def paintEvent(self, e):
+        super().paintEvent(e)
+        if self.firstPaint is None:
+            self.firstPaint = time.perf_counter() - STARTUP_T0
+            self.firstPainted.emit(self.firstPaint)
+
+
+def check_startup(seconds):
+    """ 首屏绘制超出预算时在终端提示，返回是否在预算内 """
+    if seconds > STARTUP_BUDGET:
+        print(f'首屏绘制用时 {seconds * 1000:.0f}ms，超出预算 {STARTUP_BUDGET * 1000:.0f}ms', file=sys.stderr)
+        return False
+    return True
+
+
 if __name__ == '__main__':
     # enable dpi scale
     QApplication.setHighDpiScaleFactorRoundingPolicy(
@@ -494,5 +825,10 @@ if __name__ == '__main__':
 
     app = QApplication(sys.argv)
     w3 = MainWindow()
+    if '--startup-check' in sys.argv:
+        # 只测启动耗时：第一次绘制后退出，超出预算时返回 1
+        w3.firstPainted.connect(lambda seconds: app.exit(0 if check_startup(seconds) else 1))
+    else:
+        w3.firstPainted.connect(check_startup)
     w3.show()
-    app.exec_()
\ No newline at end of file
+    sys.exit(app.exec_())
\ No newline at end of file
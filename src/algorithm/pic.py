@@ -1,36 +1,20 @@
-from PIL import Image, ImageOps
+import sys
+from pathlib import Path
 
-# 打开四张图片
-image1 = Image.open('1.png')
-image2 = Image.open('2.png')
-image3 = Image.open('3.png')
-image4 = Image.open('4.png')
+from PIL import Image
 
-# 创建一个新的正方形画布
-size = (2295, 1458)
-square_image1 = Image.new('RGBA', size, (0, 0, 0, 0))
-square_image2 = Image.new('RGBA', size, (0, 0, 0, 0))
-square_image3 = Image.new('RGBA', size, (0, 0, 0, 0))
-square_image4 = Image.new('RGBA', size, (0, 0, 0, 0))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-# 计算每张图片需要放置的位置
-left1 = (size[0] - image1.width) // 2
-top1 = (size[1] - image1.height) // 2
-left2 = (size[0] - image2.width) // 2
-top2 = (size[1] - image2.height) // 2
-left3 = (size[0] - image3.width) // 2
-top3 = (size[1] - image3.height) // 2
-left4 = (size[0] - image4.width) // 2
-top4 = (size[1] - image4.height) // 2
+from fundtable.images import canvas_size, letterbox
 
-# 将图片放置在正方形画布中央
-square_image1.paste(image1, (left1, top1))
-square_image2.paste(image2, (left2, top2))
-square_image3.paste(image3, (left3, top3))
-square_image4.paste(image4, (left4, top4))
+# 打开当前文件夹下的 1.png、2.png ...，数量不限
+paths = sorted((p for p in Path('.').glob('*.png') if p.stem.isdigit()), key=lambda p: int(p.stem))
+images = [Image.open(p) for p in paths]
+
+# 画布取这一批图片的最大宽高，图片居中放置
+size = canvas_size(image.size for image in images)
 
 # 保存处理后的图片
-square_image1.save('1_square.png')
-square_image2.save('2_square.png')
-square_image3.save('3_square.png')
-square_image4.save('4_square.png')
+# 导出表格图片时可以直接用 python -m fundtable images --letterbox 在内存中完成这一步
+for path, image in zip(paths, images):
+    letterbox(image, size).save(f'{path.stem}_square.png')
@@ -0,0 +1,27 @@
+# coding:utf-8
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from benchmarks import corpus  # noqa: E402
+
+
+# 与基准语料相同的几类文档，页数减少以缩短测试时间
+SMALL_CORPUS = {
+    'simple': ('simple', 3),
+    'header2': ('header2', 3),
+    'header3': ('header3', 3),
+    'wide': ('wide', 2),
+    'narrative': ('narrative', 2),
+    'long': ('long', 6),
+}
+
+
+@pytest.fixture(scope='session')
+def corpus_pdfs(tmp_path_factory):
+    """ 生成一次合成语料，返回 PDF 路径列表 """
+    return corpus.generate(str(tmp_path_factory.mktemp('corpus')), SMALL_CORPUS)
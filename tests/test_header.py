@@ -0,0 +1,60 @@
+# coding:utf-8
+import pytest
+
+from benchmarks.header import legacy_process
+from fundtable import engine
+from fundtable.header import header_depth, resolve_header
+
+
+def test_horizontal_merges():
+    table = [
+        ['类别', 'A类', None, 'B类', None],
+        [None, '前端', '后端', '前端', '后端'],
+        ['申购费', '1.5%', '0.5%', '1.2%', '0%'],
+    ]
+    assert resolve_header(table) == (['A类前端', 'A类后端', 'B类前端', 'B类后端'], 2)
+
+
+def test_merged_block():
+    # "费率" 横跨两列、纵跨两层，"备注" 下面还有一层
+    table = [
+        ['类别', '费率', None, '备注'],
+        [None, None, None, '说明'],
+        ['管理费', '1.5%', '1.2%', '按日计提'],
+    ]
+    assert resolve_header(table) == (['费率', '费率', '备注说明'], 2)
+
+
+def test_vertical_merge_at_level_one():
+    table = [
+        ['类别', '管理费', 'A类'],
+        [None, None, '前端'],
+        ['申购费', '1.2%', '1.5%'],
+    ]
+    assert resolve_header(table) == (['管理费', 'A类前端'], 2)
+
+
+def test_vertical_merge_crashed_legacy_branch():
+    # 原来的 deepth == 2 分支直接拼接两层文字，第一列的纵向合并没有左边的值可填，会拼接 None
+    table = [
+        ['类别', '管理费', 'A类'],
+        [None, None, '前端'],
+        ['申购费', '1.2%', '1.5%'],
+    ]
+    with pytest.raises(TypeError):
+        legacy_process(table, engine.KEYWORDS)
+
+
+def test_three_levels_and_row_names():
+    table = [
+        ['类别', '申购', None, None, None],
+        [None, 'A类', None, 'B类', None],
+        [None, '前端', '后端', '前端', '后端'],
+        ['申购费\n(上限)', '1.5%', '0.5%', '1.2%', '0%'],
+        [None, '1.0%', '0.3%', '0.8%', '0%'],
+    ]
+    assert header_depth(table) == 3
+    assert engine.process_tables([table]) == [
+        {'申购费 (上限)': {'申购A类前端': '1.5%', '申购A类后端': '0.5%', '申购B类前端': '1.2%', '申购B类后端': '0%'}},
+        {'申购费 (上限)': {'申购A类前端': '1.0%', '申购A类后端': '0.3%', '申购B类前端': '0.8%', '申购B类后端': '0%'}},
+    ]
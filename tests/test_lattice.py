@@ -0,0 +1,18 @@
+# coding:utf-8
+import pdfplumber
+
+from fundtable import lattice
+
+
+def test_same_as_extract_tables(corpus_pdfs):
+    for path in corpus_pdfs:
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                assert lattice.extract_tables(page) == page.extract_tables(), (path, page.page_number)
+
+
+def test_custom_settings(corpus_pdfs):
+    settings = {'snap_tolerance': 1, 'intersection_tolerance': 5}
+    with pdfplumber.open(corpus_pdfs[0]) as pdf:
+        page = pdf.pages[0]
+        assert lattice.extract_tables(page, settings) == page.extract_tables(settings)
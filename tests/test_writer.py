@@ -0,0 +1,82 @@
+# coding:utf-8
+import json
+
+from fundtable import engine
+from fundtable.writer import StreamWriter
+
+PAGES = [
+    [{'申购费': {'A类': '1.5%', 'B类': '0%'}}],
+    [],
+    [{'赎回费': {'A类': '0.5%', 'B类': 'None'}}, {'管理费': {'A类': '1.2% 1.0%'}}],
+    [{'认购费': {}}],
+]
+
+
+def write_pages(path, pages, source, format='json', config='a', resume=True):
+    with StreamWriter(path, format, source=source, resume=resume, config=config) as writer:
+        for index in range(writer.next_page, len(pages)):
+            writer.write_page(index, pages[index])
+
+
+def interrupt(path, source, format='json', config='a', pages=2):
+    """ 写完前几页后模拟进程退出，最后一页只写了一半 """
+    writer = StreamWriter(path, format, source=source, resume=True, config=config)
+    for index in range(pages):
+        writer.write_page(index, PAGES[index])
+    writer.file.write(b'\n  {"half')
+    writer.abort()
+
+
+def test_json_matches_engine_save(tmp_path):
+    source = tmp_path / 'a.pdf'
+    source.write_bytes(b'%PDF')
+    write_pages(tmp_path / 'out.json', PAGES, source)
+    engine.save([record for records in PAGES for record in records], tmp_path / 'expected.json')
+    assert (tmp_path / 'out.json').read_bytes() == (tmp_path / 'expected.json').read_bytes()
+
+
+def test_resume_from_checkpoint(tmp_path):
+    source = tmp_path / 'a.pdf'
+    source.write_bytes(b'%PDF')
+    out = tmp_path / 'out.json'
+    interrupt(out, source)
+    assert json.loads((tmp_path / 'out.json.part').read_text(encoding='utf-8'))['page'] == 1
+
+    writer = StreamWriter(out, source=source, resume=True, config='a')
+    assert (writer.next_page, writer.records) == (2, 1)
+    writer.abort()
+
+    write_pages(out, PAGES, source)
+    assert not (tmp_path / 'out.json.part').exists()
+    assert json.loads(out.read_text(encoding='utf-8')) == [record for records in PAGES for record in records]
+
+
+def test_resume_ndjson(tmp_path):
+    source = tmp_path / 'a.pdf'
+    source.write_bytes(b'%PDF')
+    out = tmp_path / 'out.ndjson'
+    interrupt(out, source, 'ndjson', pages=3)
+    write_pages(out, PAGES, source, 'ndjson')
+    lines = out.read_text(encoding='utf-8').split('\n')
+    assert [json.loads(line) for line in lines if line] == [record for records in PAGES for record in records]
+
+
+def test_changed_config_starts_over(tmp_path):
+    source = tmp_path / 'a.pdf'
+    source.write_bytes(b'%PDF')
+    out = tmp_path / 'out.json'
+    interrupt(out, source)
+    writer = StreamWriter(out, source=source, resume=True, config='b')
+    assert (writer.next_page, writer.records) == (0, 0)
+    writer.abort()
+
+
+def test_changed_source_starts_over(tmp_path):
+    source = tmp_path / 'a.pdf'
+    source.write_bytes(b'%PDF')
+    out = tmp_path / 'out.json'
+    interrupt(out, source)
+    source.write_bytes(b'%PDF-1.7')
+    writer = StreamWriter(out, source=source, resume=True, config='a')
+    assert writer.next_page == 0
+    writer.abort()